@@ -0,0 +1,76 @@
+import json
+
+from django.contrib import admin
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.html import format_html, format_html_join
+from .models import ChangeRecord, MediaAccessLog
+
+@admin.register(MediaAccessLog)
+class MediaAccessLogAdmin(admin.ModelAdmin):
+    """媒體訪問紀錄（唯讀，供安全稽核查詢）"""
+    list_display = ('accessed_at', 'username', 'path', 'outcome', 'ip_address')
+    list_filter = ('outcome', 'accessed_at')
+    # 前綴搜尋可使用 (path, accessed_at) / (username, accessed_at) 索引
+    search_fields = ('^path', '^username')
+    date_hierarchy = 'accessed_at'
+    list_per_page = 50
+    show_full_result_count = False
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        """只有超級用戶可以刪除稽核紀錄"""
+        return request.user.is_superuser
+
+
+@admin.register(ChangeRecord)
+class ChangeRecordAdmin(admin.ModelAdmin):
+    """客戶 / KYC 變更紀錄（唯讀）"""
+    list_display = ('changed_at', 'model', 'object_id', 'object_repr', 'action', 'username', 'get_changed_fields')
+    list_filter = ('model', 'action', 'changed_at')
+    # 以資料 ID 精確搜尋可使用 (model, object_id, changed_at) 索引
+    search_fields = ('=object_id', '^username')
+    date_hierarchy = 'changed_at'
+    readonly_fields = ('get_changes_display',)
+    fields = ('changed_at', 'model', 'object_id', 'object_repr', 'action', 'username', 'get_changes_display')
+    list_per_page = 50
+    show_full_result_count = False
+    
+    def get_changed_fields(self, obj):
+        return '、'.join(obj.changes.keys())
+    get_changed_fields.short_description = '變更欄位'
+    
+    def get_changes_display(self, obj):
+        """逐欄顯示舊值與新值"""
+        rows = []
+        for field, diff in obj.changes.items():
+            if isinstance(diff, dict) and set(diff) <= {'removed', 'added'}:
+                old = '\n'.join(f'- {line}' for line in diff.get('removed', []))
+                new = '\n'.join(f'+ {line}' for line in diff.get('added', []))
+            elif isinstance(diff, list) and len(diff) == 2 and not any(isinstance(value, dict) for value in diff):
+                old, new = diff
+            else:
+                # 舊版合併紀錄等非 [舊值, 新值] 格式的內容
+                old, new = None, json.dumps(diff, ensure_ascii=False, cls=DjangoJSONEncoder)
+            rows.append((field, '' if old is None else old, '' if new is None else new))
+        return format_html(
+            '<table><tr><th>欄位</th><th>舊值</th><th>新值</th></tr>{}</table>',
+            format_html_join(
+                '', '<tr><td>{}</td><td style="white-space: pre-wrap;">{}</td>'
+                '<td style="white-space: pre-wrap;">{}</td></tr>', rows
+            )
+        )
+    get_changes_display.short_description = '變更內容'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,118 @@
+"""
+欄位層級變更紀錄
+從 Admin 的 ModelForm / inline formset 取得差異，寫入 ChangeRecord
+"""
+
+import logging
+
+from django import forms
+from django.core.files import File
+from django.db import models, transaction
+from django.db.models.fields.files import FieldFile
+
+from .models import ChangeRecord
+
+logger = logging.getLogger(__name__)
+
+# 超過此長度或含換行的文字只記錄增刪的行，避免重複儲存整段備註
+LINE_DIFF_MIN_LENGTH = 200
+
+
+def _compact_value(value):
+    """轉為可 JSON 序列化的精簡值"""
+    if isinstance(value, models.Model):
+        return value.pk
+    if isinstance(value, (FieldFile, File)):
+        return value.name or None
+    if value == '':
+        return None
+    return value
+
+
+def _text_diff(old, new):
+    old_lines = [line for line in (old or '').splitlines() if line.strip()]
+    new_lines = [line for line in (new or '').splitlines() if line.strip()]
+    return {
+        'removed': [line for line in old_lines if line not in new_lines],
+        'added': [line for line in new_lines if line not in old_lines],
+    }
+
+
+def diff_values(old, new):
+    """單一欄位的精簡差異"""
+    old, new = _compact_value(old), _compact_value(new)
+    if isinstance(old, str) or isinstance(new, str):
+        longest = max(len(old or ''), len(new or ''))
+        if longest > LINE_DIFF_MIN_LENGTH or '\n' in (old or '') or '\n' in (new or ''):
+            return _text_diff(old, new)
+    return [old, new]
+
+
+def form_changes(form):
+    """取得 ModelForm 中有變動欄位的差異（需在 form.is_valid() 之後呼叫）"""
+    changes = {}
+    for name in form.changed_data:
+        if name not in form.cleaned_data:
+            continue
+        new = form.cleaned_data[name]
+        if new is False and isinstance(form.fields[name], forms.FileField):
+            # 勾選「清除」檔案
+            new = None
+        changes[name] = diff_values(form.initial.get(name), new)
+    return changes
+
+
+def snapshot_changes(form):
+    """刪除前的欄位快照：{"欄位": [舊值, None]}"""
+    changes = {}
+    for name in form.fields:
+        value = _compact_value(form.initial.get(name))
+        if value not in (None, '') and name != 'DELETE':
+            changes[name] = [value, None]
+    return changes
+
+
+def record_change(user, obj, action, changes=None, object_id=None, object_repr=None):
+    """寫入一筆變更紀錄；失敗時只記錄錯誤，不影響資料儲存"""
+    if action == 'update' and not changes:
+        return None
+    object_id = object_id if object_id is not None else obj.pk
+    try:
+        # 使用 savepoint，寫入失敗不會中斷 Admin 的交易
+        with transaction.atomic():
+            return ChangeRecord.objects.create(
+                model=obj._meta.label_lower,
+                object_id=object_id,
+                object_repr=(object_repr or str(obj))[:200],
+                action=action,
+                changes=changes or {},
+                user=user,
+                username=user.get_username() if user else '',
+            )
+    except Exception:
+        logger.exception('寫入變更紀錄失敗: %s#%s', obj._meta.label_lower, object_id)
+        return None
+
+
+def pending_formset_changes(formset):
+    """
+    在 formset 儲存前取得每個表單的差異（刪除的表單先記下 ID 和名稱）
+    儲存完成後交給 record_formset_changes 寫入
+    """
+    pending = []
+    deleted_forms = set(formset.deleted_forms) if formset.can_delete else set()
+    for form in formset.forms:
+        instance = form.instance
+        if form in deleted_forms:
+            if instance.pk:
+                pending.append((instance, 'delete', snapshot_changes(form), instance.pk, str(instance)))
+        elif form.has_changed():
+            action = 'update' if instance.pk else 'create'
+            pending.append((instance, action, form_changes(form), None, None))
+    return pending
+
+
+def record_formset_changes(user, pending):
+    """寫入 pending_formset_changes 取得的差異"""
+    for instance, action, changes, object_id, object_repr in pending:
+        record_change(user, instance, action, changes, object_id=object_id, object_repr=object_repr)
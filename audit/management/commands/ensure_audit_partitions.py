@@ -0,0 +1,28 @@
+"""
+預先建立 ChangeRecord 的月份分區（Postgres）
+建議每天或每月排程執行一次
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from audit.models import ChangeRecord
+from nbcrm.utils.partitions import ensure_monthly_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = '預先建立變更紀錄資料表未來月份的分區'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3, help='往後建立幾個月的分區（預設 3）')
+
+    def handle(self, *args, **options):
+        table = ChangeRecord._meta.db_table
+        if not is_partitioned(connection, table):
+            self.stdout.write(self.style.WARNING(f'{table} 不是分區表（僅 Postgres 支援），略過'))
+            return
+
+        created = ensure_monthly_partitions(connection, table, months_ahead=options['months_ahead'])
+        for name in created:
+            self.stdout.write(f'已建立分區 {name}')
+        self.stdout.write(self.style.SUCCESS(f'完成，新增 {len(created)} 個分區'))
@@ -0,0 +1,145 @@
+"""
+媒體訪問稽核紀錄的非同步批次寫入
+請求只把紀錄放入有上限的佇列，由背景執行緒批次寫入資料庫
+"""
+
+import atexit
+import ipaddress
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from nbcrm.metrics import record_media_request
+
+logger = logging.getLogger('nbcrm.media')
+
+
+def _valid_ip(value):
+    try:
+        return str(ipaddress.ip_address((value or '').strip()))
+    except ValueError:
+        return None
+
+
+def get_client_ip(request):
+    """
+    取得用戶端 IP（Render 等反向代理會在 X-Forwarded-For 最後加上連線來源）
+    左側的值可由用戶端偽造，只採用可信任代理（TRUSTED_PROXY_COUNT 層）加上的位址；
+    不是合法 IP 時改用 REMOTE_ADDR，仍不合法時為 None
+    """
+    proxies = settings.TRUSTED_PROXY_COUNT
+    forwarded = [value.strip() for value in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+    if proxies > 0 and len(forwarded) >= proxies:
+        ip_address = _valid_ip(forwarded[-proxies])
+        if ip_address:
+            return ip_address
+    return _valid_ip(request.META.get('REMOTE_ADDR'))
+
+
+class MediaAccessLogWriter:
+    """有上限佇列 + 背景執行緒批次寫入 MediaAccessLog"""
+
+    def __init__(self, max_queue_size, batch_size, flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def log(self, path, outcome, user=None, ip_address=None):
+        """放入一筆紀錄，不會阻塞請求；佇列滿時丟棄並計數"""
+        self._ensure_started()
+        entry = {
+            'user_id': user.pk if user is not None else None,
+            'username': user.get_username() if user is not None else '',
+            'path': path[:500],
+            'outcome': outcome,
+            'ip_address': ip_address,
+            'accessed_at': timezone.now(),
+        }
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning('媒體訪問紀錄佇列已滿，已丟棄 %d 筆', self.dropped)
+
+    def flush(self):
+        """立即寫入佇列中所有紀錄（程序結束時呼叫）"""
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def _ensure_started(self):
+        # gunicorn preload 後會 fork，每個 worker 程序都需要自己的背景執行緒
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='media-access-log', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                pass
+            self._write(batch)
+
+    def _write(self, batch):
+        from .models import MediaAccessLog
+
+        close_old_connections()
+        try:
+            MediaAccessLog.objects.bulk_create([MediaAccessLog(**entry) for entry in batch])
+            return
+        except Exception:
+            logger.exception('批次寫入媒體訪問紀錄失敗（%d 筆），改為逐筆寫入', len(batch))
+            connection.close()
+        # 逐筆寫入，一筆有問題的紀錄不會讓同批其他紀錄遺失
+        failed = 0
+        for entry in batch:
+            try:
+                MediaAccessLog.objects.create(**entry)
+            except Exception:
+                failed += 1
+                logger.exception('寫入媒體訪問紀錄失敗: %s %s', entry['username'], entry['path'])
+                connection.close()
+        if failed:
+            logger.error('媒體訪問紀錄有 %d 筆無法寫入', failed)
+
+
+media_access_log = MediaAccessLogWriter(
+    max_queue_size=settings.MEDIA_ACCESS_LOG_QUEUE_SIZE,
+    batch_size=settings.MEDIA_ACCESS_LOG_BATCH_SIZE,
+    flush_interval=settings.MEDIA_ACCESS_LOG_FLUSH_INTERVAL,
+)
+atexit.register(media_access_log.flush)
+
+
+def record_media_access(request, path, outcome, user):
+    """記錄一次媒體文件訪問（MEDIA_ACCESS_LOG 關閉時不記錄）；未登入時 user 為 None"""
+    record_media_request(outcome)
+    if not settings.MEDIA_ACCESS_LOG:
+        return
+    media_access_log.log(path, outcome, user=user, ip_address=get_client_ip(request))
@@ -0,0 +1,46 @@
+# Generated by Django 4.2 on 2026-10-19 18:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaAccessLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(blank=True, max_length=150, verbose_name='使用者名稱')),
+                ('path', models.CharField(max_length=500, verbose_name='檔案路徑')),
+                ('outcome', models.CharField(choices=[('served', '成功'), ('denied', '拒絕'), ('missing', '不存在'), ('error', '錯誤')], max_length=10, verbose_name='結果')),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True, verbose_name='IP 位址')),
+                ('accessed_at', models.DateTimeField(verbose_name='訪問時間')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='media_access_logs', to=settings.AUTH_USER_MODEL, verbose_name='使用者')),
+            ],
+            options={
+                'verbose_name': '媒體訪問紀錄',
+                'verbose_name_plural': '媒體訪問紀錄',
+                'ordering': ['-accessed_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='mediaaccesslog',
+            index=models.Index(fields=['accessed_at'], name='audit_media_accessed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediaaccesslog',
+            index=models.Index(fields=['path', 'accessed_at'], name='audit_media_path_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediaaccesslog',
+            index=models.Index(fields=['username', 'accessed_at'], name='audit_media_user_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.2 on 2026-10-19 18:55
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+from nbcrm.utils.partitions import create_default_partition, ensure_monthly_partitions
+
+TABLE = 'audit_changerecord'
+
+
+def partition_on_postgres(apps, schema_editor):
+    """Postgres：以相同結構重建為按月分區表（此時資料表為空）"""
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    # user_id 的索引由 CreateModel 延後執行的 SQL 在遷移結束時建立，這裡不重複建立
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE {TABLE}')
+        cursor.execute(f"""
+            CREATE TABLE {TABLE} (
+                id bigint GENERATED BY DEFAULT AS IDENTITY,
+                model varchar(100) NOT NULL,
+                object_id bigint NOT NULL,
+                object_repr varchar(200) NOT NULL,
+                action varchar(10) NOT NULL,
+                changes jsonb NOT NULL,
+                username varchar(150) NOT NULL,
+                changed_at timestamp with time zone NOT NULL,
+                user_id bigint NULL,
+                PRIMARY KEY (id, changed_at)
+            ) PARTITION BY RANGE (changed_at)
+        """)
+        cursor.execute(f'CREATE INDEX audit_change_lookup_idx ON {TABLE} (model, object_id, changed_at)')
+        cursor.execute(f'CREATE INDEX audit_change_time_idx ON {TABLE} (changed_at)')
+    create_default_partition(connection, TABLE)
+    ensure_monthly_partitions(connection, TABLE, months_ahead=3)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('audit', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='資料類型')),
+                ('object_id', models.BigIntegerField(verbose_name='資料 ID')),
+                ('object_repr', models.CharField(max_length=200, verbose_name='資料')),
+                ('action', models.CharField(choices=[('create', '新增'), ('update', '修改'), ('delete', '刪除')], max_length=10, verbose_name='動作')),
+                ('changes', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='變更內容')),
+                ('username', models.CharField(blank=True, max_length=150, verbose_name='操作人員帳號')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='變更時間')),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='操作人員')),
+            ],
+            options={
+                'verbose_name': '變更紀錄',
+                'verbose_name_plural': '變更紀錄',
+                'ordering': ['-changed_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='changerecord',
+            index=models.Index(fields=['model', 'object_id', 'changed_at'], name='audit_change_lookup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changerecord',
+            index=models.Index(fields=['changed_at'], name='audit_change_time_idx'),
+        ),
+        migrations.RunPython(partition_on_postgres, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0002_changerecord'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='changerecord',
+            name='action',
+            field=models.CharField(choices=[('create', '新增'), ('update', '修改'), ('delete', '刪除'), ('merge', '合併')], max_length=10, verbose_name='動作'),
+        ),
+    ]
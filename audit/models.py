@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+class MediaAccessLog(models.Model):
+    """媒體文件訪問稽核紀錄（由背景執行緒批次寫入）"""
+    OUTCOME_CHOICES = [
+        ('served', '成功'),
+        ('denied', '拒絕'),
+        ('missing', '不存在'),
+        ('error', '錯誤'),
+    ]
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='media_access_logs',
+        verbose_name='使用者'
+    )
+    username = models.CharField(max_length=150, blank=True, verbose_name='使用者名稱')
+    path = models.CharField(max_length=500, verbose_name='檔案路徑')
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES, verbose_name='結果')
+    ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name='IP 位址')
+    accessed_at = models.DateTimeField(verbose_name='訪問時間')
+    
+    class Meta:
+        verbose_name = '媒體訪問紀錄'
+        verbose_name_plural = '媒體訪問紀錄'
+        ordering = ['-accessed_at']
+        indexes = [
+            models.Index(fields=['accessed_at'], name='audit_media_accessed_idx'),
+            models.Index(fields=['path', 'accessed_at'], name='audit_media_path_idx'),
+            models.Index(fields=['username', 'accessed_at'], name='audit_media_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.username or '未登入'} - {self.path} ({self.get_outcome_display()})"
+
+class ChangeRecord(models.Model):
+    """
+    客戶 / KYC 欄位層級的變更紀錄
+    changes 只存有變動的欄位：{"欄位": [舊值, 新值]}，多行文字存 {"removed": [...], "added": [...]}
+    Postgres 上此表按 changed_at 月份分區
+    """
+    ACTION_CHOICES = [
+        ('create', '新增'),
+        ('update', '修改'),
+        ('delete', '刪除'),
+        ('merge', '合併'),
+    ]
+    
+    model = models.CharField(max_length=100, verbose_name='資料類型')
+    object_id = models.BigIntegerField(verbose_name='資料 ID')
+    object_repr = models.CharField(max_length=200, verbose_name='資料')
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name='動作')
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name='變更內容')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        related_name='+',
+        verbose_name='操作人員'
+    )
+    username = models.CharField(max_length=150, blank=True, verbose_name='操作人員帳號')
+    changed_at = models.DateTimeField(default=timezone.now, verbose_name='變更時間')
+    
+    class Meta:
+        verbose_name = '變更紀錄'
+        verbose_name_plural = '變更紀錄'
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['model', 'object_id', 'changed_at'], name='audit_change_lookup_idx'),
+            models.Index(fields=['changed_at'], name='audit_change_time_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.model}#{self.object_id} {self.get_action_display()} ({self.username})"
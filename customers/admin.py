@@ -1,7 +1,18 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from django.urls import path, reverse
+from django.utils import timezone
 from django.utils.html import format_html
 from django import forms
-from .models import Customer
+from .models import Customer, DuplicateSuggestion, VerifiedAccount
+from .bank_accounts import account_conflict_message, parse_account_search, sync_customer_accounts
+from .merge import merge_customers
+from kyc.bundle import iter_kyc_zip, kyc_bundle_records
+from kyc.services import enqueue_file_processing
+from audit.media_log import record_media_access
+from audit.changes import form_changes, pending_formset_changes, record_change, record_formset_changes
+from nbcrm.metrics import record_kyc_upload
 import os
 
 class CustomerAdminForm(forms.ModelForm):
@@ -65,7 +76,7 @@ class KYCRecordInline(admin.TabularInline):
                     '<i style="font-size: 20px;">🎥</i><br>'
                     '<small><a href="{}" target="_blank">{}</a></small>'
                     '</div>',
-                    file_url, file_name[:20] + "..." if len(file_name) > 20 else file_name
+                    obj.get_playback_file().url, file_name[:20] + "..." if len(file_name) > 20 else file_name
                 )
             else:
                 return format_html(
@@ -115,10 +126,12 @@ class CustomerAdmin(admin.ModelAdmin):
     list_display = ('get_display_name', 'line_nickname', 'n8_phone', 'n8_email', 'get_kyc_count', 'created_at', 'updated_at')
     list_filter = ('created_at', 'updated_at')
     search_fields = ('name', 'n8_nickname', 'line_nickname', 'n8_phone', 'n8_email', 'notes', 'verified_accounts')
-    readonly_fields = ('created_at', 'updated_at')
+    search_help_text = '輸入「帳號:822-1234567」可直接以銀行帳號反查客戶'
+    readonly_fields = ('created_at', 'updated_at', 'get_kyc_download_link')
     
     # 添加 KYC 記錄內聯
     inlines = [KYCRecordInline]
+    actions = ['merge_selected_customers', 'download_kyc_files']
     
     # 調整版面配置的 fieldsets
     fieldsets = (
@@ -128,6 +141,7 @@ class CustomerAdmin(admin.ModelAdmin):
                 ('n8_email', 'n8_phone'),
                 ('notes', 'verified_accounts'),
                 ('created_at', 'updated_at'),
+                'get_kyc_download_link',
             ),
             'classes': ('horizontal-tight-form',),  # 新增這行
         }),
@@ -152,8 +166,82 @@ class CustomerAdmin(admin.ModelAdmin):
             )
     get_kyc_count.short_description = 'KYC 記錄'
     
+    def get_urls(self):
+        urls = [
+            path(
+                'download-kyc/',
+                self.admin_site.admin_view(self.download_kyc_view),
+                name='customers_customer_download_kyc',
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def download_kyc_view(self, request):
+        """串流下載客戶的所有 KYC 檔案（ZIP，內含 manifest.csv），?ids=1,2,3"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        customer_ids = [int(value) for value in request.GET.get('ids', '').split(',') if value.strip().isdigit()]
+        if not customer_ids:
+            self.message_user(request, '請選擇要下載的客戶', level=messages.WARNING)
+            return HttpResponseRedirect(reverse('admin:customers_customer_changelist'))
+        
+        # 每個檔案都寫入媒體訪問紀錄，與逐一開啟檔案相同
+        def log_file(record, status):
+            outcome = 'served' if status == 'ok' else ('missing' if status == 'missing' else 'error')
+            record_media_access(request, record.file.name, outcome, request.user)
+        
+        filename = f'kyc_{timezone.localtime():%Y%m%d_%H%M%S}.zip'
+        response = StreamingHttpResponse(
+            iter_kyc_zip(kyc_bundle_records(customer_ids), on_file=log_file),
+            content_type='application/zip',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['Cache-Control'] = 'private, no-store'
+        response['X-Content-Type-Options'] = 'nosniff'
+        return response
+    
+    def get_kyc_download_link(self, obj):
+        """客戶頁面上的「下載全部 KYC 檔案」連結"""
+        if not obj or not obj.pk:
+            return "-"
+        count = obj.kyc_records.exclude(file='').exclude(file__isnull=True).count()
+        if not count:
+            return "無 KYC 檔案"
+        url = reverse('admin:customers_customer_download_kyc') + f'?ids={obj.pk}'
+        return format_html('<a class="button" href="{}">📦 下載全部 KYC 檔案（{} 個，ZIP）</a>', url, count)
+    get_kyc_download_link.short_description = 'KYC 檔案'
+    
+    @admin.action(description='下載選取客戶的 KYC 檔案（ZIP）')
+    def download_kyc_files(self, request, queryset):
+        ids = ','.join(str(pk) for pk in queryset.values_list('pk', flat=True))
+        return HttpResponseRedirect(reverse('admin:customers_customer_download_kyc') + f'?ids={ids}')
+    
+    @admin.action(description='合併選取的客戶（保留最早建立的客戶）', permissions=['delete'])
+    def merge_selected_customers(self, request, queryset):
+        customers = list(queryset.order_by('created_at', 'pk'))
+        if len(customers) < 2:
+            self.message_user(request, '請至少選取兩位客戶', level=messages.WARNING)
+            return
+        target = customers[0]
+        result = merge_customers(target, customers[1:], user=request.user)
+        self.message_user(
+            request,
+            f"已將 {result['customers']} 位客戶合併到 {target.get_display_name()}，"
+            f"移動 KYC 記錄 {result['kyc_records']} 筆、交易 {result['transactions']} 筆",
+            level=messages.SUCCESS,
+        )
+    
+    def save_model(self, request, obj, form, change):
+        """保存客戶並記錄欄位變更"""
+        changes = form_changes(form)
+        super().save_model(request, obj, form, change)
+        record_change(request.user, obj, 'update' if change else 'create', changes)
+    
     def save_formset(self, request, form, formset, change):
         """保存表單集時設置上傳者 - 修復版本"""
+        # 儲存前先取得各筆 KYC 記錄的欄位差異
+        pending_changes = pending_formset_changes(formset)
+        
         # 先保存表單集，但不提交到資料庫
         instances = formset.save(commit=False)
         
@@ -168,6 +256,14 @@ class CustomerAdmin(admin.ModelAdmin):
             
             # 保存實例
             instance.save()
+            
+            # 帳戶已驗證於其他客戶時提示（詐騙警示）
+            if instance.verification_account:
+                warning = account_conflict_message(
+                    instance.bank_code, instance.verification_account, instance.customer_id
+                )
+                if warning:
+                    messages.warning(request, warning)
         
         # 處理標記為刪除的實例
         for obj in formset.deleted_objects:
@@ -175,11 +271,38 @@ class CustomerAdmin(admin.ModelAdmin):
         
         # 保存多對多關係
         formset.save_m2m()
+        
+        # 新上傳或更換的 KYC 檔案排入背景處理
+        deleted_forms = formset.deleted_forms if formset.can_delete else []
+        for inline_form in formset.forms:
+            if 'file' in inline_form.changed_data and inline_form not in deleted_forms and inline_form.instance.pk:
+                enqueue_file_processing(inline_form.instance)
+                if inline_form.instance.file:
+                    record_kyc_upload(inline_form.instance, request.user)
+        
+        # 記錄 KYC 記錄的變更
+        record_formset_changes(request.user, pending_changes)
+    
+    def save_related(self, request, form, formsets, change):
+        """KYC 記錄儲存後，同步客戶的驗證帳戶索引"""
+        super().save_related(request, form, formsets, change)
+        sync_customer_accounts(form.instance)
+    
+    def get_search_results(self, request, queryset, search_term):
+        """帳號搜尋模式走驗證帳戶索引，不掃描所有客戶的文字欄位"""
+        account = parse_account_search(search_term)
+        if account is None:
+            return super().get_search_results(request, queryset, search_term)
+        bank_code, account_number = account
+        if not account_number:
+            return queryset.none(), False
+        owners = VerifiedAccount.objects.lookup(account_number, bank_code).values('customer_id')
+        return queryset.filter(pk__in=owners), False
     
     def get_readonly_fields(self, request, obj=None):
         if obj:  # 編輯時
             return self.readonly_fields
-        return ('created_at', 'updated_at')
+        return ('created_at', 'updated_at', 'get_kyc_download_link')
     
     def has_delete_permission(self, request, obj=None):
         """允許刪除客戶"""
@@ -189,4 +312,93 @@ class CustomerAdmin(admin.ModelAdmin):
         css = {
             'all': ('admin/css/custom_customer_layout.css',)
         }
-        js = ('admin/js/kyc_inline.js',)
\ No newline at end of file
+        js = ('admin/js/kyc_inline.js', 'admin/js/kyc_account_check.js')
+
+
+@admin.register(VerifiedAccount)
+class VerifiedAccountAdmin(admin.ModelAdmin):
+    """驗證帳戶索引（由客戶的驗證過的帳戶與 KYC 記錄自動同步，唯讀）"""
+    list_display = ('bank_code', 'account_number', 'get_customer_display', 'source', 'created_at')
+    list_filter = ('source', 'bank_code')
+    search_fields = ('=account_number',)
+    search_help_text = '輸入完整帳號查詢'
+    list_select_related = ('customer',)
+    
+    def get_customer_display(self, obj):
+        return obj.customer.get_display_name()
+    get_customer_display.short_description = '客戶'
+    get_customer_display.admin_order_field = 'customer__name'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DuplicateSuggestion)
+class DuplicateSuggestionAdmin(admin.ModelAdmin):
+    """重複客戶建議（依分數排序）"""
+    list_display = ('get_score_display', 'get_customer_link', 'get_duplicate_link', 'get_reasons_display', 'status', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('customer__name', 'duplicate__name')
+    list_select_related = ('customer', 'duplicate')
+    actions = ['merge_suggested', 'mark_dismissed']
+    list_per_page = 50
+    
+    def _customer_link(self, customer):
+        url = reverse('admin:customers_customer_change', args=[customer.pk])
+        return format_html('<a href="{}" target="_blank">{}</a> <small>#{}</small>', url, customer.get_display_name(), customer.pk)
+    
+    def get_score_display(self, obj):
+        return f"{obj.score:.0%}"
+    get_score_display.short_description = '相似分數'
+    get_score_display.admin_order_field = 'score'
+    
+    def get_customer_link(self, obj):
+        return self._customer_link(obj.customer)
+    get_customer_link.short_description = '客戶'
+    
+    def get_duplicate_link(self, obj):
+        return self._customer_link(obj.duplicate)
+    get_duplicate_link.short_description = '疑似重複客戶'
+    
+    def get_reasons_display(self, obj):
+        return '、'.join(obj.reasons)
+    get_reasons_display.short_description = '相符原因'
+    
+    @admin.action(description='合併選取的建議（保留較早建立的客戶）', permissions=['delete'])
+    def merge_suggested(self, request, queryset):
+        merged = kyc_records = transactions = 0
+        for suggestion in list(queryset.select_related('customer', 'duplicate')):
+            # 同一批次中前面的合併可能已刪除此客戶
+            pair = list(Customer.objects.filter(pk__in=[suggestion.customer_id, suggestion.duplicate_id]).order_by('created_at', 'pk'))
+            if len(pair) < 2:
+                continue
+            result = merge_customers(pair[0], pair[1:], user=request.user)
+            merged += result['customers']
+            kyc_records += result['kyc_records']
+            transactions += result['transactions']
+        self.message_user(
+            request,
+            f'已合併 {merged} 位重複客戶，移動 KYC 記錄 {kyc_records} 筆、交易 {transactions} 筆',
+            level=messages.SUCCESS,
+        )
+    
+    def has_delete_permission(self, request, obj=None):
+        """合併權限與刪除客戶相同"""
+        return request.user.has_perm('customers.delete_customer')
+    
+    @admin.action(description='標記為非重複（不再提示）')
+    def mark_dismissed(self, request, queryset):
+        updated = queryset.update(status='dismissed')
+        self.message_user(request, f'已將 {updated} 組標記為非重複')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
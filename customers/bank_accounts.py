@@ -0,0 +1,136 @@
+"""
+驗證過的銀行帳戶正規化
+把 Customer.verified_accounts 自由文字與 KYC 記錄的銀行帳戶，
+整理成 (bank_code, account_number) -> 客戶 的索引表
+"""
+
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# 「822-1234567」「(822) 1234567」「822：1234567」或只有帳號「1234567890」
+ACCOUNT_PATTERN = re.compile(
+    r'(?<!\d)(?:[(（]?(?P<bank>\d{3})[)）]?\s*[-－:：/\s]\s*|[(（](?P<bank2>\d{3})[)）]\s*)?'
+    r'(?P<account>\d{6,20})(?!\d)'
+)
+
+# Admin 搜尋的帳號模式前綴
+ACCOUNT_SEARCH_PREFIXES = ('帳號:', '帳號：', '帳戶:', '帳戶：', 'acct:')
+
+
+def normalize_account(bank_code, account_number):
+    """去除空白與分隔符號，回傳 (bank_code, account_number)；帳號無效時回傳 None"""
+    account_number = re.sub(r'[\s-]', '', account_number or '')
+    bank_code = (bank_code or '').strip()
+    if not account_number.isdigit():
+        return None
+    if bank_code and not re.fullmatch(r'\d{3}', bank_code):
+        bank_code = ''
+    return bank_code, account_number
+
+
+def parse_verified_accounts(text):
+    """從驗證過的帳戶文字中解析出 [(bank_code, account_number)]，保留出現順序並去除重複"""
+    accounts = []
+    text = text or ''
+    for match in ACCOUNT_PATTERN.finditer(text):
+        bank_code = match.group('bank') or match.group('bank2') or ''
+        start = match.start('account')
+        if not bank_code and start > 0 and text[start - 1] in '-－':
+            # 「0912-345678」這類其他號碼的後半段
+            continue
+        account = normalize_account(bank_code, match.group('account'))
+        if account and account not in accounts:
+            accounts.append(account)
+    return accounts
+
+
+def parse_account_search(term):
+    """
+    解析 Admin 搜尋字串，「帳號:822-1234567」格式回傳 (bank_code, account_number)
+    非帳號搜尋模式回傳 None
+    """
+    term = term.strip()
+    for prefix in ACCOUNT_SEARCH_PREFIXES:
+        if term.lower().startswith(prefix):
+            accounts = parse_verified_accounts(term[len(prefix):])
+            return accounts[0] if accounts else ('', '')
+    return None
+
+
+def desired_customer_accounts(customer):
+    """客戶應有的帳戶索引：{(bank_code, account_number): 來源}，KYC 記錄優先於驗證過的帳戶文字"""
+    from kyc.models import KYCRecord
+
+    desired = {}
+    for account in parse_verified_accounts(customer.verified_accounts):
+        desired[account] = 'notes'
+    kyc_accounts = KYCRecord.objects.filter(
+        customer=customer, verification_account__isnull=False
+    ).exclude(verification_account='').values_list('bank_code', 'verification_account')
+    for bank_code, account_number in kyc_accounts:
+        account = normalize_account(bank_code, account_number)
+        if account:
+            desired[account] = 'kyc'
+    return desired
+
+
+def sync_customer_accounts(customer):
+    """
+    依客戶目前的 verified_accounts 文字與 KYC 記錄，同步該客戶的帳戶索引
+    已屬於其他客戶的帳戶不會被搶走，只記錄警告
+    """
+    from .models import VerifiedAccount
+
+    desired = desired_customer_accounts(customer)
+    existing = {
+        (row.bank_code, row.account_number): row
+        for row in VerifiedAccount.objects.filter(customer=customer)
+    }
+    stale_ids = [row.pk for key, row in existing.items() if key not in desired]
+    if stale_ids:
+        VerifiedAccount.objects.filter(pk__in=stale_ids).delete()
+
+    new_rows = [
+        VerifiedAccount(customer=customer, bank_code=bank_code, account_number=account_number, source=source)
+        for (bank_code, account_number), source in desired.items()
+        if (bank_code, account_number) not in existing
+    ]
+    if new_rows:
+        VerifiedAccount.objects.bulk_create(new_rows, ignore_conflicts=True)
+        owned = set(
+            VerifiedAccount.objects.filter(customer=customer).values_list('bank_code', 'account_number')
+        )
+        for row in new_rows:
+            if (row.bank_code, row.account_number) not in owned:
+                logger.warning(
+                    '帳戶 %s-%s 已屬於其他客戶，未加入客戶 #%s',
+                    row.bank_code or '???', row.account_number, customer.pk
+                )
+
+
+def find_other_account_owners(bank_code, account_number, customer_id=None):
+    """
+    帳戶是否已驗證於其他客戶（詐騙警示）
+    只查驗證帳戶索引（單次索引查詢），不掃描 KYC 記錄
+    """
+    from .models import Customer, VerifiedAccount
+
+    account = normalize_account(bank_code, account_number)
+    if not account or len(account[1]) < 6:
+        return Customer.objects.none()
+    owner_ids = VerifiedAccount.objects.lookup(account[1], account[0]).values('customer_id')
+    owners = Customer.objects.filter(pk__in=owner_ids)
+    if customer_id:
+        owners = owners.exclude(pk=customer_id)
+    return owners
+
+
+def account_conflict_message(bank_code, account_number, customer_id):
+    """帳戶已屬於其他客戶時回傳警示訊息，否則回傳 None"""
+    owners = list(find_other_account_owners(bank_code, account_number, customer_id)[:5])
+    if not owners:
+        return None
+    names = '、'.join(f'{owner.get_display_name()} (#{owner.pk})' for owner in owners)
+    return f'⚠️ 帳戶 {bank_code or "???"}-{account_number} 已驗證於其他客戶：{names}'
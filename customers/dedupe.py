@@ -0,0 +1,276 @@
+"""
+重複客戶偵測
+以封鎖鍵（電話、信箱、銀行帳戶、姓名 n-gram / 拼音鍵）分組，只比對同組內的客戶，
+避免 1M 客戶時 O(n²) 的兩兩比對；常見姓名的分組過大時再依電話前綴、信箱前綴細分
+"""
+
+import difflib
+import logging
+import re
+import sys
+import unicodedata
+from collections import defaultdict
+from itertools import combinations
+
+from django.db import transaction
+
+from nbcrm.db_router import replica_reads
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 5000
+SAVE_BATCH_SIZE = 2000
+# 細分過大姓名分組時取電話（正規化後）與信箱帳號的前幾碼
+PHONE_PREFIX_LENGTH = 4
+EMAIL_PREFIX_LENGTH = 4
+# 記錄中列出的過大分組數
+SKIPPED_BLOCK_EXAMPLES = 5
+
+# 各類相符條件的分數
+PHONE_SCORE = 0.5
+EMAIL_SCORE = 0.5
+ACCOUNT_SCORE = 0.6
+NAME_WEIGHT = 0.4
+NICKNAME_SCORE = 0.2
+# 只靠姓名相似被分在同組時，相似度至少要達到此值才列入
+NAME_ONLY_MIN_SIMILARITY = 0.85
+
+SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'), **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'), 'l': '4', **dict.fromkeys('mn', '5'), 'r': '6',
+}
+
+
+def normalize_text(value):
+    """全形轉半形、小寫、去除空白與標點"""
+    value = unicodedata.normalize('NFKC', value or '').lower()
+    return ''.join(ch for ch in value if ch.isalnum())
+
+
+def normalize_phone(phone):
+    """台灣電話號碼取末 9 碼（+886 / 0 開頭皆視為相同）"""
+    digits = re.sub(r'\D', '', phone or '')
+    if len(digits) < 8:
+        return ''
+    return digits[-9:]
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def soundex(word):
+    """英文拼音鍵（中文姓名改用字元 n-gram）"""
+    word = ''.join(ch for ch in word.lower() if 'a' <= ch <= 'z')
+    if not word:
+        return ''
+    code = word[0]
+    previous = SOUNDEX_CODES.get(word[0], '')
+    for ch in word[1:]:
+        digit = SOUNDEX_CODES.get(ch, '')
+        if digit and digit != previous:
+            code += digit
+        if ch not in 'hw':
+            previous = digit
+    return (code + '000')[:4]
+
+
+def name_blocking_keys(*names):
+    """姓名 / 暱稱的封鎖鍵：完整名稱、字元雙連字（bigram）、英文 soundex"""
+    keys = set()
+    for name in names:
+        normalized = normalize_text(name)
+        if not normalized:
+            continue
+        keys.add('n:' + normalized)
+        if normalized.isascii():
+            for token in re.findall(r'[a-z]+', unicodedata.normalize('NFKC', name).lower()):
+                if len(token) > 1:
+                    keys.add('s:' + soundex(token))
+        elif len(normalized) >= 2:
+            for i in range(len(normalized) - 1):
+                keys.add('g:' + normalized[i:i + 2])
+    return keys
+
+
+def sub_blocking_keys(phone, email):
+    """過大姓名分組的細分鍵：正規化電話的前綴、信箱帳號的前綴（字串 intern，1M 客戶時共用記憶體）"""
+    keys = []
+    if phone:
+        keys.append(sys.intern('p:' + phone[:PHONE_PREFIX_LENGTH]))
+    local_part = normalize_text(email.partition('@')[0]) if email else ''
+    if local_part:
+        keys.append(sys.intern('e:' + local_part[:EMAIL_PREFIX_LENGTH]))
+    return tuple(keys)
+
+
+def name_similarity(a, b):
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+class DuplicateFinder:
+    """
+    建立封鎖鍵並找出候選重複客戶
+    每一類封鎖鍵各掃描一次資料表，掃描完即釋放該類的分組，控制記憶體用量
+    超過 max_block_size 的姓名分組依細分鍵再分組；電話、信箱、帳戶或細分後仍過大的分組略過並計數
+    """
+
+    def __init__(self, max_block_size=50, threshold=0.6):
+        self.max_block_size = max_block_size
+        self.threshold = threshold
+        # 候選配對 (小 id, 大 id) -> 相符原因集合
+        self.pairs = defaultdict(set)
+        # 客戶 id -> (正規化姓名, 正規化暱稱集合)
+        self.names = {}
+        # 客戶 id -> 細分鍵（只用於過大的姓名分組）
+        self.sub_keys = {}
+        self.split_blocks = 0
+        self.skipped_blocks = 0
+        self.skipped_customers = 0
+        self.largest_skipped = []
+
+    def _skip_block(self, key, size):
+        self.skipped_blocks += 1
+        self.skipped_customers += size
+        self.largest_skipped.append((size, key))
+        if len(self.largest_skipped) > SKIPPED_BLOCK_EXAMPLES * 20:
+            self.largest_skipped = sorted(self.largest_skipped, reverse=True)[:SKIPPED_BLOCK_EXAMPLES]
+
+    def skipped_examples(self):
+        """略過的分組中最大的幾個：[(封鎖鍵, 客戶數)]"""
+        return [(key, size) for size, key in sorted(self.largest_skipped, reverse=True)[:SKIPPED_BLOCK_EXAMPLES]]
+
+    def _add_blocks(self, blocks, reason, sub_keys=None):
+        for key, ids in blocks.items():
+            if len(ids) < 2:
+                continue
+            if len(ids) > self.max_block_size:
+                if sub_keys is None:
+                    self._skip_block(key, len(ids))
+                    continue
+                self.split_blocks += 1
+                sub_blocks = defaultdict(list)
+                for pk in ids:
+                    for sub_key in sub_keys.get(pk, ()):
+                        sub_blocks[f'{key}|{sub_key}'].append(pk)
+                self._add_blocks(sub_blocks, reason)
+                continue
+            for a, b in combinations(sorted(set(ids)), 2):
+                self.pairs[(a, b)].add(reason)
+
+    def collect(self):
+        from kyc.models import KYCRecord
+        from .models import Customer, VerifiedAccount
+
+        with replica_reads():
+            customers = Customer.objects.values_list(
+                'id', 'name', 'n8_nickname', 'line_nickname', 'n8_phone', 'n8_email'
+            ).order_by()
+
+            phone_blocks, email_blocks, name_blocks = defaultdict(list), defaultdict(list), defaultdict(list)
+            for pk, name, n8_nickname, line_nickname, phone, email in customers.iterator(chunk_size=STREAM_CHUNK_SIZE):
+                nicknames = frozenset(filter(None, (normalize_text(n8_nickname), normalize_text(line_nickname))))
+                self.names[pk] = (normalize_text(name), nicknames)
+                phone = normalize_phone(phone)
+                if phone:
+                    phone_blocks[phone].append(pk)
+                email = normalize_email(email)
+                if email:
+                    email_blocks[email].append(pk)
+                for key in name_blocking_keys(name, n8_nickname, line_nickname):
+                    name_blocks[key].append(pk)
+                keys = sub_blocking_keys(phone, email)
+                if keys:
+                    self.sub_keys[pk] = keys
+            self._add_blocks(phone_blocks, 'phone')
+            self._add_blocks(email_blocks, 'email')
+            del phone_blocks, email_blocks
+            self._add_blocks(name_blocks, 'name', sub_keys=self.sub_keys)
+            del name_blocks
+            self.sub_keys = {}
+
+            account_blocks = defaultdict(list)
+            kyc_accounts = KYCRecord.objects.exclude(verification_account__isnull=True).exclude(
+                verification_account=''
+            ).values_list('customer_id', 'bank_code', 'verification_account').order_by()
+            for pk, bank_code, account_number in kyc_accounts.iterator(chunk_size=STREAM_CHUNK_SIZE):
+                account_blocks[f'{bank_code or ""}-{account_number}'].append(pk)
+            verified = VerifiedAccount.objects.values_list('customer_id', 'bank_code', 'account_number').order_by()
+            for pk, bank_code, account_number in verified.iterator(chunk_size=STREAM_CHUNK_SIZE):
+                account_blocks[f'{bank_code}-{account_number}'].append(pk)
+            self._add_blocks(account_blocks, 'account')
+
+        logger.info(
+            '重複客戶候選配對 %d 組，細分過大的姓名分組 %d 個', len(self.pairs), self.split_blocks
+        )
+        if self.skipped_blocks:
+            examples = '、'.join(f'{key}（{size} 位）' for key, size in self.skipped_examples())
+            logger.warning(
+                '略過過大的分組 %d 個（共 %d 位客戶次），這些分組內的客戶不會互相比對，最大的分組：%s',
+                self.skipped_blocks, self.skipped_customers, examples,
+            )
+
+    def score(self, a, b, reasons):
+        """計算配對分數（0~1）與顯示用原因"""
+        name_a, nicknames_a = self.names.get(a, ('', frozenset()))
+        name_b, nicknames_b = self.names.get(b, ('', frozenset()))
+        similarity = name_similarity(name_a, name_b)
+        score = 0.0
+        labels = []
+        if 'phone' in reasons:
+            score += PHONE_SCORE
+            labels.append('電話相同')
+        if 'email' in reasons:
+            score += EMAIL_SCORE
+            labels.append('信箱相同')
+        if 'account' in reasons:
+            score += ACCOUNT_SCORE
+            labels.append('銀行帳戶相同')
+        if reasons == {'name'} and similarity < NAME_ONLY_MIN_SIMILARITY:
+            return 0.0, labels
+        if nicknames_a & nicknames_b:
+            score += NICKNAME_SCORE
+            labels.append('暱稱相同')
+        score += NAME_WEIGHT * similarity
+        labels.append(f'姓名相似度 {similarity:.0%}')
+        return min(score, 1.0), labels
+
+    def suggestions(self):
+        """依分數由高到低回傳 [(a, b, score, labels)]"""
+        results = []
+        for (a, b), reasons in self.pairs.items():
+            score, labels = self.score(a, b, reasons)
+            if score >= self.threshold:
+                results.append((a, b, round(score, 4), labels))
+        results.sort(key=lambda item: item[2], reverse=True)
+        return results
+
+
+def rebuild_duplicate_suggestions(max_block_size=50, threshold=0.6):
+    """重新計算重複客戶建議，保留已標記為「非重複」的配對不再提示；回傳 (建議數, DuplicateFinder)"""
+    from .models import DuplicateSuggestion
+
+    finder = DuplicateFinder(max_block_size=max_block_size, threshold=threshold)
+    finder.collect()
+    results = finder.suggestions()
+
+    dismissed = set(
+        DuplicateSuggestion.objects.filter(status='dismissed').values_list('customer_id', 'duplicate_id')
+    )
+    with transaction.atomic():
+        DuplicateSuggestion.objects.filter(status='pending').delete()
+        batch = []
+        for a, b, score, labels in results:
+            if (a, b) in dismissed:
+                continue
+            batch.append(DuplicateSuggestion(customer_id=a, duplicate_id=b, score=score, reasons=labels))
+            if len(batch) >= SAVE_BATCH_SIZE:
+                DuplicateSuggestion.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            DuplicateSuggestion.objects.bulk_create(batch, ignore_conflicts=True)
+    return len(results), finder
@@ -0,0 +1,36 @@
+"""
+找出疑似重複的客戶，結果顯示在 Admin「重複客戶建議」
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from customers.dedupe import rebuild_duplicate_suggestions
+
+
+class Command(BaseCommand):
+    help = '以電話、信箱、銀行帳戶與姓名封鎖鍵找出疑似重複的客戶'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=0.6, help='列入建議的最低分數（0~1，預設 0.6）')
+        parser.add_argument('--max-block-size', type=int, default=50,
+                            help='單一封鎖鍵最多幾位客戶，姓名分組超過時依電話、信箱前綴細分，其餘略過（預設 50）')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count, finder = rebuild_duplicate_suggestions(
+            max_block_size=options['max_block_size'],
+            threshold=options['threshold'],
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'細分過大的姓名分組：{finder.split_blocks} 個')
+        if finder.skipped_blocks:
+            examples = '、'.join(f'{key}（{size} 位）' for key, size in finder.skipped_examples())
+            self.stdout.write(self.style.WARNING(
+                f'略過過大的分組：{finder.skipped_blocks} 個（共 {finder.skipped_customers} 位客戶次），'
+                f'最大的分組：{examples}'
+            ))
+        else:
+            self.stdout.write('略過過大的分組：0 個')
+        self.stdout.write(self.style.SUCCESS(f'找到 {count} 組疑似重複客戶（{elapsed:.1f} 秒）'))
@@ -0,0 +1,90 @@
+"""
+合併重複客戶
+在單一資料庫交易中以集合式 UPDATE 把 KYC 記錄、交易、驗證帳戶移到保留的客戶，
+交易筆數再多也只需要固定幾個查詢
+"""
+
+from django.db import transaction
+
+from audit.changes import record_change
+
+# 空白時由被合併客戶補上的欄位
+FILL_BLANK_FIELDS = ('line_nickname', 'n8_nickname', 'n8_phone', 'n8_email')
+
+
+def _merge_lines(*texts):
+    """合併多段文字，依出現順序去除重複的行"""
+    lines = []
+    for text in texts:
+        for line in (text or '').splitlines():
+            line = line.rstrip()
+            if line.strip() and line not in lines:
+                lines.append(line)
+    return '\n'.join(lines)
+
+
+def merge_customers(target, duplicates, user=None):
+    """
+    將 duplicates 合併到 target 並刪除 duplicates
+    回傳 {'customers': 合併客戶數, 'kyc_records': 移動筆數, 'transactions': 移動筆數}
+    """
+    from kyc.models import KYCRecord
+    from transactions.models import Transaction
+    from .bank_accounts import sync_customer_accounts
+    from .models import Customer, DuplicateSuggestion, VerifiedAccount
+
+    duplicate_ids = sorted({customer.pk for customer in duplicates} - {target.pk})
+    if not duplicate_ids:
+        return {'customers': 0, 'kyc_records': 0, 'transactions': 0}
+
+    with transaction.atomic():
+        # 鎖定相關客戶，避免合併期間被其他請求修改
+        locked = {
+            customer.pk: customer
+            for customer in Customer.objects.select_for_update().filter(pk__in=[target.pk, *duplicate_ids]).order_by('pk')
+        }
+        target = locked[target.pk]
+        sources = [locked[pk] for pk in duplicate_ids if pk in locked]
+        source_ids = [customer.pk for customer in sources]
+
+        kyc_count = KYCRecord.objects.filter(customer_id__in=source_ids).update(customer=target)
+        transaction_count = Transaction.objects.filter(customer_id__in=source_ids).update(customer=target)
+        VerifiedAccount.objects.filter(customer_id__in=source_ids).update(customer=target)
+        DuplicateSuggestion.objects.filter(customer_id__in=source_ids).delete()
+        DuplicateSuggestion.objects.filter(duplicate_id__in=source_ids).delete()
+
+        changes = {}
+        for field in FILL_BLANK_FIELDS:
+            if not getattr(target, field):
+                value = next((getattr(source, field) for source in sources if getattr(source, field)), '')
+                if value:
+                    changes[field] = [None, value]
+                    setattr(target, field, value)
+
+        merged_notes = _merge_lines(target.notes, *[
+            f'[合併自 #{source.pk} {source.get_display_name()}]\n{source.notes}' if source.notes else ''
+            for source in sources
+        ])
+        merged_accounts = _merge_lines(target.verified_accounts, *[source.verified_accounts for source in sources])
+        for field, value in (('notes', merged_notes), ('verified_accounts', merged_accounts)):
+            if value != getattr(target, field):
+                changes[field] = {'removed': [], 'added': [
+                    line for line in value.splitlines() if line not in getattr(target, field).splitlines()
+                ]}
+                setattr(target, field, value)
+        target.save()
+
+        # 與欄位變更相同的 [舊值, 新值] 格式，稽核紀錄頁面才能顯示
+        changes['merged_customers'] = [
+            '\n'.join(f'#{source.pk} {source.get_display_name()}' for source in sources),
+            f'#{target.pk} {target.get_display_name()}',
+        ]
+        changes['moved'] = [None, f'KYC 記錄 {kyc_count} 筆、交易 {transaction_count} 筆']
+        record_change(user, target, 'merge', changes)
+
+        Customer.objects.filter(pk__in=source_ids).delete()
+
+        # 重新計算衍生資料：驗證帳戶索引
+        sync_customer_accounts(target)
+
+    return {'customers': len(source_ids), 'kyc_records': kyc_count, 'transactions': transaction_count}
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-19 18:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerifiedAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bank_code', models.CharField(blank=True, max_length=3, verbose_name='銀行代碼')),
+                ('account_number', models.CharField(max_length=50, verbose_name='帳號')),
+                ('source', models.CharField(choices=[('notes', '驗證過的帳戶'), ('kyc', 'KYC 記錄')], max_length=10, verbose_name='來源')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bank_accounts', to='customers.customer', verbose_name='客戶')),
+            ],
+            options={
+                'verbose_name': '驗證帳戶',
+                'verbose_name_plural': '驗證帳戶',
+                'ordering': ['bank_code', 'account_number'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='verifiedaccount',
+            constraint=models.UniqueConstraint(fields=('account_number', 'bank_code'), name='customers_unique_verified_account'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# 從現有的 verified_accounts 文字與 KYC 記錄建立帳戶索引
+
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+# 以下為撰寫此 migration 時 customers.bank_accounts 的解析規則副本，
+# 之後修改該模組不會改變這個 migration 的結果
+ACCOUNT_PATTERN = re.compile(
+    r'(?<!\d)(?:[(（]?(?P<bank>\d{3})[)）]?\s*[-－:：/\s]\s*|[(（](?P<bank2>\d{3})[)）]\s*)?'
+    r'(?P<account>\d{6,20})(?!\d)'
+)
+
+
+def normalize_account(bank_code, account_number):
+    account_number = re.sub(r'[\s-]', '', account_number or '')
+    bank_code = (bank_code or '').strip()
+    if not account_number.isdigit():
+        return None
+    if bank_code and not re.fullmatch(r'\d{3}', bank_code):
+        bank_code = ''
+    return bank_code, account_number
+
+
+def parse_verified_accounts(text):
+    accounts = []
+    text = text or ''
+    for match in ACCOUNT_PATTERN.finditer(text):
+        bank_code = match.group('bank') or match.group('bank2') or ''
+        start = match.start('account')
+        if not bank_code and start > 0 and text[start - 1] in '-－':
+            continue
+        account = normalize_account(bank_code, match.group('account'))
+        if account and account not in accounts:
+            accounts.append(account)
+    return accounts
+
+
+def backfill_verified_accounts(apps, schema_editor):
+    Customer = apps.get_model('customers', 'Customer')
+    KYCRecord = apps.get_model('kyc', 'KYCRecord')
+    VerifiedAccount = apps.get_model('customers', 'VerifiedAccount')
+    
+    batch = []
+    
+    def flush():
+        # 同一帳戶出現在多位客戶時保留第一筆
+        VerifiedAccount.objects.bulk_create(batch, ignore_conflicts=True)
+        batch.clear()
+    
+    customers = Customer.objects.exclude(verified_accounts='').values_list('id', 'verified_accounts')
+    for customer_id, text in customers.iterator(chunk_size=BATCH_SIZE):
+        for bank_code, account_number in parse_verified_accounts(text):
+            batch.append(VerifiedAccount(
+                customer_id=customer_id, bank_code=bank_code, account_number=account_number, source='notes'
+            ))
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    
+    records = KYCRecord.objects.exclude(verification_account__isnull=True).exclude(verification_account='')
+    for customer_id, bank_code, account_number in records.values_list(
+        'customer_id', 'bank_code', 'verification_account'
+    ).iterator(chunk_size=BATCH_SIZE):
+        account = normalize_account(bank_code, account_number)
+        if account:
+            batch.append(VerifiedAccount(
+                customer_id=customer_id, bank_code=account[0], account_number=account[1], source='kyc'
+            ))
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    
+    if batch:
+        flush()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_verifiedaccount'),
+        ('kyc', '0005_alter_kycrecord_file_description_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_verified_accounts, migrations.RunPython.noop),
+    ]
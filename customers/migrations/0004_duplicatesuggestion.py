@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-19 18:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_backfill_verifiedaccount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='相似分數')),
+                ('reasons', models.JSONField(default=list, verbose_name='相符原因')),
+                ('status', models.CharField(choices=[('pending', '待處理'), ('dismissed', '非重複')], default='pending', max_length=10, verbose_name='狀態')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='customers.customer', verbose_name='客戶')),
+                ('duplicate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='customers.customer', verbose_name='疑似重複客戶')),
+            ],
+            options={
+                'verbose_name': '重複客戶建議',
+                'verbose_name_plural': '重複客戶建議',
+                'ordering': ['-score'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='duplicatesuggestion',
+            index=models.Index(fields=['status', '-score'], name='customers_dup_status_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='duplicatesuggestion',
+            constraint=models.UniqueConstraint(fields=('customer', 'duplicate'), name='customers_unique_duplicate_pair'),
+        ),
+    ]
@@ -28,4 +28,79 @@ class Customer(models.Model):
         if self.n8_nickname:
             return f"{self.name}({self.n8_nickname})"
         else:
-            return f"{self.name}(無N8暱稱)"
\ No newline at end of file
+            return f"{self.name}(無N8暱稱)"
+
+class VerifiedAccountQuerySet(models.QuerySet):
+    def lookup(self, account_number, bank_code=None):
+        """
+        以帳號（與銀行代碼）反查，走 (account_number, bank_code) 索引
+        從驗證帳戶文字解析、沒有銀行代碼的帳戶（bank_code=''）與任何銀行代碼都視為相符
+        """
+        queryset = self.filter(account_number=account_number)
+        if bank_code:
+            queryset = queryset.filter(bank_code__in=[bank_code, ''])
+        return queryset
+
+
+class VerifiedAccount(models.Model):
+    """正規化的驗證帳戶：(銀行代碼, 帳號) 對應唯一客戶"""
+    SOURCE_CHOICES = [
+        ('notes', '驗證過的帳戶'),
+        ('kyc', 'KYC 記錄'),
+    ]
+    
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='bank_accounts', verbose_name='客戶')
+    bank_code = models.CharField(max_length=3, blank=True, verbose_name='銀行代碼')
+    account_number = models.CharField(max_length=50, verbose_name='帳號')
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, verbose_name='來源')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
+    
+    objects = VerifiedAccountQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = '驗證帳戶'
+        verbose_name_plural = '驗證帳戶'
+        ordering = ['bank_code', 'account_number']
+        constraints = [
+            # 帳號在前，只用帳號查詢時也能使用此索引
+            models.UniqueConstraint(fields=['account_number', 'bank_code'], name='customers_unique_verified_account'),
+        ]
+    
+    def __str__(self):
+        return f"{self.bank_code or '???'}-{self.account_number}"
+
+
+def find_account_owners(account_number, bank_code=None):
+    """帳號反查客戶（單次索引查詢）"""
+    return Customer.objects.filter(
+        pk__in=VerifiedAccount.objects.lookup(account_number, bank_code).values('customer_id')
+    )
+
+
+class DuplicateSuggestion(models.Model):
+    """重複客戶建議（由 find_duplicate_customers 指令產生）"""
+    STATUS_CHOICES = [
+        ('pending', '待處理'),
+        ('dismissed', '非重複'),
+    ]
+    
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='+', verbose_name='客戶')
+    duplicate = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='+', verbose_name='疑似重複客戶')
+    score = models.FloatField(verbose_name='相似分數')
+    reasons = models.JSONField(default=list, verbose_name='相符原因')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='狀態')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
+    
+    class Meta:
+        verbose_name = '重複客戶建議'
+        verbose_name_plural = '重複客戶建議'
+        ordering = ['-score']
+        constraints = [
+            models.UniqueConstraint(fields=['customer', 'duplicate'], name='customers_unique_duplicate_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['status', '-score'], name='customers_dup_status_score_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.customer} ↔ {self.duplicate} ({self.score:.0%})"
@@ -0,0 +1,34 @@
+"""
+客戶資料修復（python manage.py run_repair <名稱>）
+"""
+
+from jobs.repair import Repair, register_repair
+
+from .bank_accounts import desired_customer_accounts, sync_customer_accounts
+from .models import Customer, VerifiedAccount
+
+
+@register_repair
+class ResyncVerifiedAccounts(Repair):
+    """帳戶索引與客戶的驗證帳戶文字、KYC 記錄不一致時重新同步"""
+    name = 'customer_verified_accounts'
+    help = '依驗證過的帳戶文字與 KYC 記錄重建客戶的帳戶索引'
+    batch_size = 500
+
+    def get_queryset(self):
+        return Customer.objects.only('pk', 'verified_accounts')
+
+    def repair_batch(self, rows, dry_run):
+        existing = {}
+        for customer_id, bank_code, account_number in VerifiedAccount.objects.filter(
+            customer_id__in=[row.pk for row in rows]
+        ).values_list('customer_id', 'bank_code', 'account_number'):
+            existing.setdefault(customer_id, set()).add((bank_code, account_number))
+        changed = 0
+        for customer in rows:
+            if set(desired_customer_accounts(customer)) == existing.get(customer.pk, set()):
+                continue
+            changed += 1
+            if not dry_run:
+                sync_customer_accounts(customer)
+        return changed
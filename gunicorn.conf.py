@@ -0,0 +1,81 @@
+"""
+Gunicorn 設定
+預設使用 gthread worker：慢速的 KYC 影片下載只會占用一個執行緒，不會卡住整個 worker
+所有參數都可以用環境變數覆寫（Render 控制台設定）
+"""
+
+import multiprocessing
+import os
+import shutil
+import time
+
+# gunicorn 會把設定檔中的模組層級名稱當作設定項目，config 是其中之一，因此改名匯入
+from decouple import config as env
+
+bind = env('GUNICORN_BIND', default=f"0.0.0.0:{env('PORT', default='8000')}")
+
+# Worker 模型：gthread（預設）或 gevent（需另外安裝 gevent）
+worker_class = env('GUNICORN_WORKER_CLASS', default='gthread')
+workers = env('WEB_CONCURRENCY', default=min(multiprocessing.cpu_count() * 2 + 1, 4), cast=int)
+threads = env('GUNICORN_THREADS', default=8, cast=int)
+# gevent 每個 worker 可同時處理的連線數
+worker_connections = env('GUNICORN_WORKER_CONNECTIONS', default=200, cast=int)
+
+# 定期重啟 worker 以控制記憶體洩漏，加上抖動避免所有 worker 同時重啟
+max_requests = env('GUNICORN_MAX_REQUESTS', default=1000, cast=int)
+max_requests_jitter = env('GUNICORN_MAX_REQUESTS_JITTER', default=100, cast=int)
+
+# 預先載入應用程式，worker 之間共用記憶體並加快啟動
+preload_app = env('GUNICORN_PRELOAD', default=True, cast=bool)
+
+# Worker 心跳逾時：gthread / gevent 的心跳與請求處理分開，
+# 長時間的媒體串流不會觸發逾時，只有真正卡死的 worker 才會被重啟
+timeout = env('GUNICORN_TIMEOUT', default=30, cast=int)
+graceful_timeout = env('GUNICORN_GRACEFUL_TIMEOUT', default=30, cast=int)
+keepalive = env('GUNICORN_KEEPALIVE', default=5, cast=int)
+
+# 慢請求門檻：一般頁面與媒體路由分開計算
+SLOW_REQUEST_SECONDS = env('GUNICORN_SLOW_REQUEST_SECONDS', default=10, cast=float)
+MEDIA_SLOW_REQUEST_SECONDS = env('GUNICORN_MEDIA_SLOW_REQUEST_SECONDS', default=300, cast=float)
+MEDIA_PATH_PREFIX = '/media/'
+
+# Prometheus 多行程模式：各 worker 將指標寫入此目錄，/metrics 讀取時彙總
+PROMETHEUS_MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+accesslog = env('GUNICORN_ACCESS_LOG', default='-')
+errorlog = '-'
+loglevel = env('GUNICORN_LOG_LEVEL', default='info')
+
+
+def pre_request(worker, req):
+    req._started_at = time.monotonic()
+
+
+def post_request(worker, req, environ, resp):
+    started_at = getattr(req, '_started_at', None)
+    if started_at is None:
+        return
+    elapsed = time.monotonic() - started_at
+    if req.path.startswith(MEDIA_PATH_PREFIX):
+        limit = MEDIA_SLOW_REQUEST_SECONDS
+    else:
+        limit = SLOW_REQUEST_SECONDS
+    if elapsed > limit:
+        worker.log.warning('慢請求 %.2fs (門檻 %.0fs): %s %s', elapsed, limit, req.method, req.path)
+
+
+def on_starting(server):
+    # 清除上次執行留下的指標檔案，避免計數器從舊值繼續累加
+    if PROMETHEUS_MULTIPROC_DIR:
+        shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # worker 結束後移除其 livesum 類型的 gauge（處理中的請求數），計數器與直方圖仍保留
+    if PROMETHEUS_MULTIPROC_DIR:
+        try:
+            from prometheus_client import multiprocess
+        except ImportError:
+            return
+        multiprocess.mark_process_dead(worker.pid)
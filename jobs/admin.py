@@ -0,0 +1,39 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job, RepairCheckpoint
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'task', 'status', 'attempts', 'max_attempts', 'object_type', 'object_id', 'run_at', 'finished_at']
+    list_filter = ['status', 'task']
+    search_fields = ['task', 'object_type', 'last_error']
+    readonly_fields = [field.name for field in Job._meta.fields]
+    actions = ['retry_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='重新執行選取的失敗工作')
+    def retry_jobs(self, request, queryset):
+        count = queryset.filter(status='failed').update(
+            status='queued', attempts=0, run_at=timezone.now(), finished_at=None
+        )
+        self.message_user(request, f'已重新排入 {count} 個工作')
+
+
+@admin.register(RepairCheckpoint)
+class RepairCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['repair', 'shard', 'shard_count', 'status', 'processed', 'changed', 'last_pk', 'upper_pk', 'updated_at']
+    list_filter = ['repair', 'status']
+    readonly_fields = [field.name for field in RepairCheckpoint._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
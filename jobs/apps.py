@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs'
+    
+    def ready(self):
+        # 載入各 app 的 tasks.py 與 repairs.py，註冊背景工作與資料修復
+        autodiscover_modules('tasks')
+        autodiscover_modules('repairs')
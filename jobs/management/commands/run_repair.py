@@ -0,0 +1,132 @@
+"""
+執行資料修復（各 app 的 repairs.py 註冊）
+用法: python manage.py run_repair <名稱> [--dry-run] [--workers 4] [--batch-size 1000] [--param key=value]
+      python manage.py run_repair --list
+中斷後以相同指令重新執行會從上次完成的批次繼續；--reset 清除進度重新開始
+"""
+
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import Manager
+
+from django import db
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.models import RepairCheckpoint
+from jobs.repair import (
+    ProgressReporter,
+    _init_worker,
+    get_repair,
+    prepare_checkpoints,
+    registered_repairs,
+    run_shard,
+    run_shard_in_worker,
+)
+
+
+class Command(BaseCommand):
+    help = '分批執行資料修復，支援中斷後繼續、試跑與多程序平行處理'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?', help='修復項目名稱')
+        parser.add_argument('--list', action='store_true', help='列出所有修復項目與進度')
+        parser.add_argument('--dry-run', action='store_true', help='只計算會修改的筆數，不寫入資料與進度')
+        parser.add_argument('--workers', type=int, default=1, help='平行程序數（第一次執行時決定分段數）')
+        parser.add_argument('--batch-size', type=int, default=None, help='每批筆數（預設依修復項目）')
+        parser.add_argument('--param', action='append', default=[], help='修復項目的參數 key=value，可重複指定')
+        parser.add_argument('--reset', action='store_true', help='清除既有進度後從頭開始')
+        parser.add_argument('--progress-interval', type=float, default=5.0, help='進度輸出間隔（秒）')
+
+    def handle(self, *args, **options):
+        if options['list'] or not options['name']:
+            return self._list()
+        try:
+            repair_class = get_repair(options['name'])
+        except KeyError:
+            raise CommandError(f"未知的修復項目: {options['name']}（可用 --list 查看）")
+        params = {}
+        for item in options['param']:
+            key, separator, value = item.partition('=')
+            if not separator:
+                raise CommandError(f'參數格式應為 key=value: {item}')
+            params[key] = value
+        try:
+            repair = repair_class(**params)
+        except (ValueError, ObjectDoesNotExist) as e:
+            raise CommandError(f'{repair_class.name} 參數錯誤: {e}')
+        dry_run = options['dry_run']
+
+        if options['reset'] and not dry_run:
+            RepairCheckpoint.objects.filter(repair=repair.name).delete()
+        checkpoints = prepare_checkpoints(repair, options['workers'], dry_run=dry_run)
+        pending = [c for c in checkpoints if c.status != 'completed']
+        if not pending:
+            self.stdout.write(self.style.SUCCESS(f'{repair.name}：沒有需要處理的資料（或已完成，可用 --reset 重新執行）'))
+            return
+
+        resumed = [c for c in pending if c.last_pk > c.lower_pk]
+        self.stdout.write(
+            f"{'[試跑] ' if dry_run else ''}{repair.name}：{len(pending)} 個分段"
+            + (f'，其中 {len(resumed)} 個從上次中斷處繼續' if resumed else '')
+        )
+        reporter = ProgressReporter(checkpoints, self.stdout.write, options['progress_interval'])
+        started = time.monotonic()
+        try:
+            if options['workers'] > 1 and len(pending) > 1:
+                self._run_parallel(repair, params, pending, dry_run, options, reporter)
+            else:
+                for checkpoint in pending:
+                    run_shard(repair, checkpoint, options['batch_size'], dry_run, progress=reporter)
+        except KeyboardInterrupt:
+            reporter.report()
+            raise CommandError('已中斷；重新執行相同指令即可從上次完成的批次繼續')
+
+        reporter.report()
+        self.stdout.write(self.style.SUCCESS(
+            f"{'[試跑] 會修改' if dry_run else '完成：修改'} {reporter.changed} 筆"
+            f"（檢查 {reporter.processed} 筆，{time.monotonic() - started:.0f} 秒）"
+        ))
+
+    def _run_parallel(self, repair, params, pending, dry_run, options, reporter):
+        # fork 前關閉資料庫連線，子程序不共用父程序的連線
+        db.connections.close_all()
+        with Manager() as manager, ProcessPoolExecutor(
+            max_workers=min(options['workers'], len(pending)), initializer=_init_worker
+        ) as pool:
+            progress_queue = manager.Queue()
+            futures = [
+                pool.submit(
+                    run_shard_in_worker, repair.name, params, checkpoint, options['batch_size'], dry_run, progress_queue
+                )
+                for checkpoint in pending
+            ]
+            while True:
+                try:
+                    reporter(*progress_queue.get(timeout=0.5))
+                    continue
+                except queue.Empty:
+                    pass
+                if all(future.done() for future in futures):
+                    break
+            while not progress_queue.empty():
+                reporter(*progress_queue.get())
+            done, _ = wait(futures)
+            errors = [future.exception() for future in done if future.exception()]
+        if errors:
+            raise CommandError(f'{len(errors)} 個分段失敗（已完成的批次會保留）: {errors[0]}')
+
+    def _list(self):
+        progress = {}
+        for checkpoint in RepairCheckpoint.objects.order_by('repair', 'shard'):
+            progress.setdefault(checkpoint.repair, []).append(checkpoint)
+        for name, repair_class in registered_repairs().items():
+            checkpoints = progress.get(name)
+            if checkpoints:
+                done = sum(c.status == 'completed' for c in checkpoints)
+                changed = sum(c.changed for c in checkpoints)
+                state = f'{done}/{len(checkpoints)} 個分段完成，已修改 {changed} 筆'
+            else:
+                state = '未執行'
+            self.stdout.write(f'{name:<32} {repair_class.help}（{state}）')
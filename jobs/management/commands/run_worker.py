@@ -0,0 +1,78 @@
+"""
+背景工作 worker
+用法: python manage.py run_worker [--concurrency 2] [--poll-interval 2] [--once]
+"""
+
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from jobs.worker import claim_jobs, requeue_stale_jobs, run_job, worker_name
+
+# 每隔多少次輪詢檢查一次中斷的工作
+STALE_CHECK_EVERY = 30
+
+
+class Command(BaseCommand):
+    help = '執行背景工作佇列'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='同時執行的工作數（執行緒數）')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='沒有工作時的輪詢間隔（秒）')
+        parser.add_argument('--once', action='store_true', help='執行完目前到期的工作後結束')
+
+    def handle(self, *args, **options):
+        concurrency = max(options['concurrency'], 1)
+        worker_id = worker_name()
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write('收到停止訊號，等待執行中的工作完成...')
+            stopping.set()
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(f'Worker {worker_id} 啟動，同時執行 {concurrency} 個工作')
+        running = set()
+        lock = threading.Lock()
+
+        def execute(job):
+            try:
+                run_job(job)
+            finally:
+                close_old_connections()
+                connection.close()
+                with lock:
+                    running.discard(job.pk)
+
+        polls = 0
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='job') as executor:
+            while not stopping.is_set():
+                close_old_connections()
+                if polls % STALE_CHECK_EVERY == 0:
+                    requeue_stale_jobs()
+                polls += 1
+
+                with lock:
+                    free = concurrency - len(running)
+                jobs = claim_jobs(worker_id, free)
+                for job in jobs:
+                    with lock:
+                        running.add(job.pk)
+                    executor.submit(execute, job)
+
+                if options['once']:
+                    with lock:
+                        idle = not running
+                    if idle and not jobs:
+                        break
+                if not jobs:
+                    stopping.wait(options['poll_interval'])
+                elif free == len(jobs):
+                    # 執行緒都在忙，稍等再領取
+                    stopping.wait(0.2)
+        self.stdout.write('Worker 已停止')
@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-19 19:04
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(max_length=100, verbose_name='工作')),
+                ('payload', models.JSONField(default=dict, verbose_name='參數')),
+                ('status', models.CharField(choices=[('queued', '排隊中'), ('running', '執行中'), ('succeeded', '完成'), ('failed', '失敗')], default='queued', max_length=10, verbose_name='狀態')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='已執行次數')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='最多執行次數')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='預定執行時間')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='執行者')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='開始執行時間')),
+                ('last_error', models.TextField(blank=True, verbose_name='錯誤訊息')),
+                ('object_type', models.CharField(blank=True, max_length=100, verbose_name='資料類型')),
+                ('object_id', models.BigIntegerField(blank=True, null=True, verbose_name='資料 ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成時間')),
+            ],
+            options={
+                'verbose_name': '背景工作',
+                'verbose_name_plural': '背景工作',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'run_at'], name='jobs_status_run_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['object_type', 'object_id'], name='jobs_object_idx'),
+        ),
+    ]
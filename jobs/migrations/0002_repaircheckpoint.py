@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-19 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepairCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('repair', models.CharField(max_length=100, verbose_name='修復項目')),
+                ('shard', models.PositiveIntegerField(verbose_name='分段')),
+                ('shard_count', models.PositiveIntegerField(verbose_name='分段數')),
+                ('lower_pk', models.BigIntegerField(verbose_name='起始主鍵（不含）')),
+                ('upper_pk', models.BigIntegerField(verbose_name='結束主鍵')),
+                ('last_pk', models.BigIntegerField(verbose_name='已處理到的主鍵')),
+                ('processed', models.BigIntegerField(default=0, verbose_name='已檢查筆數')),
+                ('changed', models.BigIntegerField(default=0, verbose_name='已修復筆數')),
+                ('status', models.CharField(choices=[('pending', '未開始'), ('running', '執行中'), ('completed', '完成'), ('failed', '失敗')], default='pending', max_length=10, verbose_name='狀態')),
+                ('last_error', models.TextField(blank=True, verbose_name='錯誤訊息')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新時間')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成時間')),
+            ],
+            options={
+                'verbose_name': '資料修復進度',
+                'verbose_name_plural': '資料修復進度',
+                'ordering': ['repair', 'shard'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='repaircheckpoint',
+            constraint=models.UniqueConstraint(fields=('repair', 'shard'), name='jobs_unique_repair_shard'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+from django.db import models
+from django.utils import timezone
+
+class Job(models.Model):
+    """資料庫背景工作佇列（由 run_worker 指令執行）"""
+    STATUS_CHOICES = [
+        ('queued', '排隊中'),
+        ('running', '執行中'),
+        ('succeeded', '完成'),
+        ('failed', '失敗'),
+    ]
+    
+    task = models.CharField(max_length=100, verbose_name='工作')
+    payload = models.JSONField(default=dict, verbose_name='參數')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', verbose_name='狀態')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='已執行次數')
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name='最多執行次數')
+    run_at = models.DateTimeField(default=timezone.now, verbose_name='預定執行時間')
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name='執行者')
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name='開始執行時間')
+    last_error = models.TextField(blank=True, verbose_name='錯誤訊息')
+    # 關聯的資料（例如 kyc.kycrecord #12），用於在該資料頁面顯示處理狀態
+    object_type = models.CharField(max_length=100, blank=True, verbose_name='資料類型')
+    object_id = models.BigIntegerField(null=True, blank=True, verbose_name='資料 ID')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成時間')
+    
+    class Meta:
+        verbose_name = '背景工作'
+        verbose_name_plural = '背景工作'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='jobs_status_run_at_idx'),
+            models.Index(fields=['object_type', 'object_id'], name='jobs_object_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.get_status_display()})"
+
+
+class RepairCheckpoint(models.Model):
+    """資料修復（run_repair 指令）各分段的進度，中斷後從 last_pk 之後繼續"""
+    STATUS_CHOICES = [
+        ('pending', '未開始'),
+        ('running', '執行中'),
+        ('completed', '完成'),
+        ('failed', '失敗'),
+    ]
+    
+    repair = models.CharField(max_length=100, verbose_name='修復項目')
+    shard = models.PositiveIntegerField(verbose_name='分段')
+    shard_count = models.PositiveIntegerField(verbose_name='分段數')
+    # 分段的主鍵範圍 (lower_pk, upper_pk]
+    lower_pk = models.BigIntegerField(verbose_name='起始主鍵（不含）')
+    upper_pk = models.BigIntegerField(verbose_name='結束主鍵')
+    last_pk = models.BigIntegerField(verbose_name='已處理到的主鍵')
+    processed = models.BigIntegerField(default=0, verbose_name='已檢查筆數')
+    changed = models.BigIntegerField(default=0, verbose_name='已修復筆數')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name='狀態')
+    last_error = models.TextField(blank=True, verbose_name='錯誤訊息')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新時間')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成時間')
+    
+    class Meta:
+        verbose_name = '資料修復進度'
+        verbose_name_plural = '資料修復進度'
+        ordering = ['repair', 'shard']
+        constraints = [
+            models.UniqueConstraint(fields=['repair', 'shard'], name='jobs_unique_repair_shard'),
+        ]
+    
+    def __str__(self):
+        return f"{self.repair} [{self.shard + 1}/{self.shard_count}] ({self.get_status_display()})"
+    
+    def fraction_done(self):
+        """依主鍵範圍估計的完成比例（不需要 COUNT 整個資料表）"""
+        if self.status == 'completed' or self.upper_pk <= self.lower_pk:
+            return 1.0
+        return min(max((self.last_pk - self.lower_pk) / (self.upper_pk - self.lower_pk), 0.0), 1.0)
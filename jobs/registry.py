@@ -0,0 +1,77 @@
+"""
+背景工作註冊與排入佇列
+各 app 在 tasks.py 以 @task 註冊函式，呼叫 enqueue() 排入佇列，由 run_worker 指令執行
+"""
+
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job
+
+_registry = {}
+
+
+@dataclass(frozen=True)
+class Task:
+    name: str
+    func: object
+    max_attempts: int = 5
+    # 第 n 次失敗後等待 retry_delay * 2^(n-1) 秒再重試
+    retry_delay: int = 30
+    # 同時執行中的上限（所有 worker 合計），None 表示不限制
+    concurrency: int = None
+
+    def backoff(self, attempts):
+        return timedelta(seconds=self.retry_delay * 2 ** max(attempts - 1, 0))
+
+
+def task(name, max_attempts=5, retry_delay=30, concurrency=None):
+    """註冊背景工作，參數必須可序列化為 JSON"""
+    def decorator(func):
+        _registry[name] = Task(name, func, max_attempts, retry_delay, concurrency)
+        return func
+    return decorator
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def registered_tasks():
+    return dict(_registry)
+
+
+def object_label(obj):
+    return f'{obj._meta.app_label}.{obj._meta.model_name}'
+
+
+def enqueue(name, payload=None, obj=None, delay=0):
+    """
+    排入背景工作；obj 為關聯的資料，用於在該資料頁面顯示處理狀態
+    JOBS_RUN_INLINE 開啟時在目前交易提交後直接執行
+    """
+    registered = _registry[name]
+    job = Job.objects.create(
+        task=name,
+        payload=payload or {},
+        max_attempts=registered.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        object_type=object_label(obj) if obj is not None else '',
+        object_id=obj.pk if obj is not None else None,
+    )
+    if settings.JOBS_RUN_INLINE:
+        from .worker import run_inline
+        transaction.on_commit(lambda: run_inline(job.pk))
+    return job
+
+
+def latest_job(obj, name=None):
+    """取得資料最近一次的背景工作"""
+    jobs = Job.objects.filter(object_type=object_label(obj), object_id=obj.pk)
+    if name:
+        jobs = jobs.filter(task=name)
+    return jobs.order_by('-created_at', '-pk').first()
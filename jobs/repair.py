@@ -0,0 +1,194 @@
+"""
+資料修復框架
+各 app 在 repairs.py 以 @register_repair 註冊 Repair 子類別，由 run_repair 指令執行：
+依主鍵分段、每段以主鍵遊標（pk > last_pk）分批讀取，每批在同一個交易中修復並更新進度，
+中斷後重新執行會從上次完成的批次之後繼續；--workers 大於 1 時各分段由不同程序平行處理
+"""
+
+import time
+
+from django.db import connections, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import RepairCheckpoint
+
+_registry = {}
+
+
+class Repair:
+    """
+    資料修復項目
+    子類別實作 get_queryset()（需要檢查的資料）與 repair_batch()（修復一批資料，回傳修改的筆數）
+    repair_batch 在 dry_run 時只回傳會修改的筆數，不可寫入資料庫
+    """
+    name = None
+    help = ''
+    batch_size = 1000
+
+    def __init__(self, **params):
+        self.params = params
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def repair_batch(self, rows, dry_run):
+        raise NotImplementedError
+
+
+def register_repair(cls):
+    """類別裝飾器：以 cls.name 註冊資料修復項目"""
+    if not cls.name:
+        raise ValueError(f'{cls.__name__} 沒有設定 name')
+    _registry[cls.name] = cls
+    return cls
+
+
+def get_repair(name):
+    return _registry[name]
+
+
+def registered_repairs():
+    return dict(sorted(_registry.items()))
+
+
+def plan_shards(repair, shard_count):
+    """依資料的主鍵範圍平均切成 shard_count 段，回傳 [(lower_pk, upper_pk)]，範圍為 (lower, upper]"""
+    bounds = repair.get_queryset().aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    low, high = bounds['low'] - 1, bounds['high']
+    step = max((high - low + shard_count - 1) // shard_count, 1)
+    shards = []
+    lower = low
+    while lower < high and len(shards) < shard_count:
+        upper = high if len(shards) == shard_count - 1 else min(lower + step, high)
+        shards.append((lower, upper))
+        lower = upper
+    return shards
+
+
+def prepare_checkpoints(repair, shard_count, dry_run=False):
+    """
+    取得（或建立）各分段的進度；已有進度時沿用原本的分段
+    dry_run 一律從頭規劃，不讀取也不寫入資料庫，回傳未儲存的進度物件
+    """
+    if not dry_run:
+        existing = list(RepairCheckpoint.objects.filter(repair=repair.name).order_by('shard'))
+        if existing:
+            return existing
+    checkpoints = [
+        RepairCheckpoint(
+            repair=repair.name, shard=index, shard_count=len(shards),
+            lower_pk=lower, upper_pk=upper, last_pk=lower,
+        )
+        for shards in [plan_shards(repair, shard_count)]
+        for index, (lower, upper) in enumerate(shards)
+    ]
+    if not dry_run:
+        RepairCheckpoint.objects.bulk_create(checkpoints)
+        checkpoints = list(RepairCheckpoint.objects.filter(repair=repair.name).order_by('shard'))
+    return checkpoints
+
+
+def run_shard(repair, checkpoint, batch_size=None, dry_run=False, progress=None):
+    """
+    處理單一分段，回傳 (檢查筆數, 修改筆數)
+    每批的修復與進度更新在同一個交易中提交，失敗時該批回滾，進度停在上一批
+    progress(shard, 本批筆數, 本批修改筆數, last_pk) 於每批完成後呼叫
+    """
+    batch_size = batch_size or repair.batch_size
+    queryset = repair.get_queryset()
+    processed = changed = 0
+    if not dry_run:
+        RepairCheckpoint.objects.filter(pk=checkpoint.pk).update(status='running', last_error='')
+    try:
+        while True:
+            batch = queryset.filter(pk__gt=checkpoint.last_pk, pk__lte=checkpoint.upper_pk).order_by('pk')
+            # iterator() 不快取整個 QuerySet，每批只讀取 batch_size 筆
+            rows = list(batch[:batch_size].iterator(chunk_size=batch_size))
+            if not rows:
+                break
+            with transaction.atomic():
+                count = repair.repair_batch(rows, dry_run) or 0
+                checkpoint.last_pk = rows[-1].pk
+                checkpoint.processed += len(rows)
+                checkpoint.changed += count
+                if not dry_run:
+                    RepairCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                        last_pk=checkpoint.last_pk,
+                        processed=checkpoint.processed,
+                        changed=checkpoint.changed,
+                        updated_at=timezone.now(),
+                    )
+            processed += len(rows)
+            changed += count
+            if progress:
+                progress(checkpoint.shard, len(rows), count, checkpoint.last_pk)
+    except BaseException as e:
+        if not dry_run:
+            RepairCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                status='failed', last_error=f'{type(e).__name__}: {e}'[:2000]
+            )
+        raise
+    if not dry_run:
+        RepairCheckpoint.objects.filter(pk=checkpoint.pk).update(status='completed', finished_at=timezone.now())
+    return processed, changed
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def run_shard_in_worker(name, params, checkpoint, batch_size, dry_run, progress_queue):
+    """子程序：處理一個分段，進度透過 queue 回報給主程序"""
+    repair = get_repair(name)(**params)
+    try:
+        return run_shard(
+            repair, checkpoint, batch_size=batch_size, dry_run=dry_run,
+            progress=lambda *event: progress_queue.put(event),
+        )
+    finally:
+        connections.close_all()
+
+
+class ProgressReporter:
+    """彙總各分段的進度，定時輸出處理速度與預估剩餘時間"""
+
+    def __init__(self, checkpoints, write, interval=5.0):
+        self.checkpoints = {checkpoint.shard: checkpoint for checkpoint in checkpoints}
+        self.write = write
+        self.interval = interval
+        self.started = time.monotonic()
+        self.last_report = 0.0
+        self.processed = 0
+        self.changed = 0
+        # 從中斷處繼續時，先前完成的部分不計入本次的速度
+        self.initial_fraction = self.fraction_done()
+
+    def __call__(self, shard, processed, changed, last_pk):
+        checkpoint = self.checkpoints[shard]
+        checkpoint.last_pk = last_pk
+        self.processed += processed
+        self.changed += changed
+        now = time.monotonic()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report()
+
+    def fraction_done(self):
+        spans = [(c.upper_pk - c.lower_pk, c.fraction_done()) for c in self.checkpoints.values()]
+        total = sum(span for span, _ in spans)
+        return sum(span * fraction for span, fraction in spans) / total if total else 1.0
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        rate = self.processed / elapsed
+        fraction = self.fraction_done()
+        progressed = fraction - self.initial_fraction
+        eta = elapsed * (1 - fraction) / progressed if progressed > 0 else None
+        self.write(
+            f'進度 {fraction:.1%}：檢查 {self.processed} 筆，修改 {self.changed} 筆，'
+            f'{rate:.0f} 筆/秒' + (f'，預估剩餘 {eta:.0f} 秒' if eta is not None else '')
+        )
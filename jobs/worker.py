@@ -0,0 +1,174 @@
+"""
+背景工作執行
+以 SELECT ... FOR UPDATE SKIP LOCKED 領取工作，多個 worker 行程可同時執行而不會重複領取
+"""
+
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Job
+from .registry import get_task, registered_tasks
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def requeue_stale_jobs():
+    """
+    超過 JOBS_LOCK_TIMEOUT 沒有心跳的執行中工作（worker 被中斷）重新排隊；
+    已達最多執行次數的標記為失敗，避免每次都讓 worker 中斷的工作（如 ffmpeg 耗盡記憶體）無限重試
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT))
+    exhausted = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', locked_by='', locked_at=None, finished_at=now,
+        last_error='worker 執行期間中斷，已達最多執行次數',
+    )
+    if exhausted:
+        logger.error('%d 個中斷的背景工作已達最多執行次數，標記為失敗', exhausted)
+    count = stale.update(status='queued', locked_by='', locked_at=None, last_error='worker 中斷，重新排隊')
+    if count:
+        logger.warning('%d 個中斷的背景工作已重新排隊', count)
+    return count
+
+
+def _lock_task_limits(names):
+    """
+    Postgres：以 advisory lock 序列化同一工作的領取，計算執行中數量到標記為執行中之間，
+    其他 worker 不能同時領取同一種工作，不會超過同時執行上限（鎖在交易結束時釋放）
+    依名稱排序取得，避免互相等待
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for name in sorted(names):
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [f'jobs.concurrency:{name}'])
+
+
+def _available_slots():
+    """各工作剩餘可同時執行的數量（沒有上限的工作不列入）"""
+    limited = {name: t.concurrency for name, t in registered_tasks().items() if t.concurrency}
+    if not limited:
+        return {}
+    running = dict(
+        Job.objects.filter(status='running', task__in=limited)
+        .values_list('task').annotate(n=Count('id')).values_list('task', 'n')
+    )
+    return {name: limit - running.get(name, 0) for name, limit in limited.items()}
+
+
+def claim_jobs(worker_id, limit):
+    """領取最多 limit 個到期的工作，回傳已標記為執行中的 Job 清單"""
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    with transaction.atomic():
+        _lock_task_limits(name for name, t in registered_tasks().items() if t.concurrency)
+        slots = _available_slots()
+        candidates = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(
+                status='queued', run_at__lte=now, task__in=list(registered_tasks()),
+                attempts__lt=F('max_attempts'),
+            )
+            .exclude(task__in=[name for name, free in slots.items() if free <= 0])
+            .order_by('run_at', 'pk')
+            .values_list('pk', 'task')[:limit * 4]
+        )
+        claimed = []
+        for pk, name in candidates:
+            if name in slots:
+                if slots[name] <= 0:
+                    continue
+                slots[name] -= 1
+            claimed.append(pk)
+            if len(claimed) >= limit:
+                break
+        if not claimed:
+            return []
+        # 條件式更新：不支援 SKIP LOCKED 的資料庫（SQLite）也不會重複領取
+        Job.objects.filter(pk__in=claimed, status='queued', attempts__lt=F('max_attempts')).update(
+            status='running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1
+        )
+    return list(Job.objects.filter(pk__in=claimed, status='running', locked_by=worker_id).order_by('run_at', 'pk'))
+
+
+class Heartbeat:
+    """工作執行期間由背景執行緒定時更新 locked_at，表示 worker 仍在執行"""
+
+    def __init__(self, job, interval=None):
+        self.job = job
+        self.interval = interval or settings.JOBS_HEARTBEAT_INTERVAL
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'job-heartbeat-{job.pk}', daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                Job.objects.filter(pk=self.job.pk, status='running', locked_by=self.job.locked_by).update(
+                    locked_at=timezone.now()
+                )
+        except Exception:
+            logger.exception('背景工作 %s 心跳更新失敗', self.job)
+        finally:
+            # 執行緒有自己的資料庫連線
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+
+def run_job(job):
+    """執行一個已領取的工作；失敗時依指數退避重新排隊，超過次數標記為失敗"""
+    registered = get_task(job.task)
+    try:
+        if registered is None:
+            raise LookupError(f'未註冊的背景工作: {job.task}')
+        with Heartbeat(job):
+            registered.func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if registered is not None and job.attempts < job.max_attempts:
+            job.status = 'queued'
+            job.run_at = timezone.now() + registered.backoff(job.attempts)
+            logger.warning('背景工作 %s 第 %d 次失敗，%s 重試', job, job.attempts, job.run_at)
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            logger.error('背景工作 %s 失敗:\n%s', job, error)
+        job.last_error = error
+    else:
+        job.status = 'succeeded'
+        job.finished_at = timezone.now()
+        job.last_error = ''
+    job.locked_by = ''
+    job.locked_at = None
+    job.save(update_fields=['status', 'run_at', 'finished_at', 'last_error', 'locked_by', 'locked_at'])
+    return job
+
+
+def run_inline(job_id):
+    """JOBS_RUN_INLINE：不經 worker 直接執行（失敗後的重試仍由 worker 處理）"""
+    updated = Job.objects.filter(pk=job_id, status='queued').update(
+        status='running', locked_by='inline', locked_at=timezone.now(), attempts=F('attempts') + 1
+    )
+    if updated:
+        return run_job(Job.objects.get(pk=job_id))
+    return None
@@ -1,8 +1,17 @@
-from django.contrib import admin
-from django.utils.html import format_html
+from django.contrib import admin, messages
+from django.http import JsonResponse
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
 from django import forms
-from .models import KYCRecord
+from .models import ArchivedMedia, KYCRecord
+from .services import enqueue_file_processing, find_similar_images
+from .tasks import PROCESS_MEDIA_TASK, TRANSCODE_VIDEO_TASK
+from .imaging import to_unsigned
 from customers.models import Customer
+from customers.bank_accounts import account_conflict_message, find_other_account_owners, sync_customer_accounts
+from audit.changes import form_changes, record_change
+from jobs.registry import latest_job
+from nbcrm.metrics import record_kyc_upload
 import os
 
 class KYCRecordAdminForm(forms.ModelForm):
@@ -38,9 +47,42 @@ class KYCRecordAdmin(admin.ModelAdmin):
         'file_description',
         'uploaded_by__username'
     )
-    readonly_fields = ('uploaded_at', 'get_file_preview', 'get_file_info')
+    readonly_fields = ('uploaded_at', 'get_file_preview', 'get_file_info', 'get_processing_status', 'get_similar_images')
     list_per_page = 25
     
+    class Media:
+        js = ('admin/js/kyc_account_check.js',)
+    
+    def get_urls(self):
+        urls = [
+            path(
+                'check-account/',
+                self.admin_site.admin_view(self.check_account_view),
+                name='kyc_kycrecord_check_account',
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def check_account_view(self, request):
+        """即時檢查帳戶是否已驗證於其他客戶（供表單 AJAX 使用）"""
+        # 新增記錄尚未選擇客戶或參數不是數字時，視為沒有客戶
+        customer_id = request.GET.get('customer', '').strip()
+        owners = find_other_account_owners(
+            request.GET.get('bank_code', ''),
+            request.GET.get('account', ''),
+            int(customer_id) if customer_id.isdigit() else None,
+        )[:5]
+        return JsonResponse({
+            'owners': [
+                {
+                    'id': owner.pk,
+                    'name': owner.get_display_name(),
+                    'url': reverse('admin:customers_customer_change', args=[owner.pk]),
+                }
+                for owner in owners
+            ],
+        })
+    
     def get_fieldsets(self, request, obj=None):
         """根據用戶角色和操作類型動態設置fieldsets"""
         if obj:  # 編輯現有記錄
@@ -54,7 +96,7 @@ class KYCRecordAdmin(admin.ModelAdmin):
                         'description': '銀行代碼和驗證帳戶為選填欄位'
                     }),
                     ('檔案資訊 (選填)', {
-                        'fields': ('file', 'get_file_preview', 'file_description', 'get_file_info'),
+                        'fields': ('file', 'get_file_preview', 'file_description', 'get_file_info', 'get_processing_status', 'get_similar_images'),
                         'description': '檔案上傳為選填，可只填寫銀行資訊，支援最大100MB檔案'
                     }),
                     ('上傳資訊', {
@@ -72,7 +114,7 @@ class KYCRecordAdmin(admin.ModelAdmin):
                         'description': '銀行代碼和驗證帳戶為選填欄位'
                     }),
                     ('檔案資訊 (選填)', {
-                        'fields': ('file', 'get_file_preview', 'file_description', 'get_file_info'),
+                        'fields': ('file', 'get_file_preview', 'file_description', 'get_file_info', 'get_processing_status', 'get_similar_images'),
                         'description': '檔案上傳為選填，可只填寫銀行資訊，支援最大100MB檔案'
                     }),
                     ('上傳資訊', {
@@ -180,16 +222,17 @@ class KYCRecordAdmin(admin.ModelAdmin):
                 return format_html(html, file_url, file_url, file_name)
                 
             elif obj.is_video():
+                # 有轉檔版本時播放串流友善的 MP4，連結仍指向原檔
                 html = (
                     '<div style="text-align: center;">'
-                    '<video width="100" height="60" controls style="border-radius: 5px;">'
+                    '<video width="100" height="60" controls preload="metadata" style="border-radius: 5px;">'
                     '<source src="{}" type="video/mp4">'
                     '您的瀏覽器不支援影片標籤。'
                     '</video><br>'
                     '<small><a href="{}" target="_blank">🎥 {}</a></small>'
                     '</div>'
                 )
-                return format_html(html, file_url, file_url, file_name)
+                return format_html(html, obj.get_playback_file().url, file_url, file_name)
                 
             else:
                 html = (
@@ -239,17 +282,105 @@ class KYCRecordAdmin(admin.ModelAdmin):
     
     get_file_info.short_description = '檔案資訊'
     
+    def get_similar_images(self, obj):
+        """顯示感知雜湊相近的圖片（可能是不同客戶重複使用的證件照）"""
+        fingerprint = getattr(obj, 'fingerprint', None) if obj and obj.pk else None
+        if fingerprint is None:
+            return '無圖片指紋'
+        matches = find_similar_images(to_unsigned(fingerprint.dhash), exclude_record_id=obj.pk)
+        if not matches:
+            return '沒有相似圖片'
+        items = []
+        for distance, match in matches:
+            record = match.record
+            other_customer = record.customer_id != obj.customer_id
+            items.append((
+                record.file.url,
+                reverse('admin:kyc_kycrecord_change', args=[record.pk]),
+                '#dc3545' if other_customer else '#6c757d',
+                record.customer.get_display_name(),
+                distance,
+            ))
+        return format_html(
+            '<div style="display: flex; flex-wrap: wrap; gap: 8px;">{}</div>',
+            format_html_join(
+                '',
+                '<div style="text-align: center;">'
+                '<img src="{}" style="max-width: 80px; max-height: 80px; border-radius: 3px;" /><br>'
+                '<small><a href="{}" target="_blank" style="color: {};">{}</a><br>距離 {}</small>'
+                '</div>',
+                items,
+            ),
+        )
+    
+    get_similar_images.short_description = '相似圖片'
+    
+    def get_processing_status(self, obj):
+        """顯示上傳檔案最近一次背景處理（正規化、指紋、影片轉檔）的狀態"""
+        if not obj or not obj.pk:
+            return "-"
+        job = latest_job(obj)
+        if job is None:
+            return "-"
+        labels = {PROCESS_MEDIA_TASK: '檔案處理', TRANSCODE_VIDEO_TASK: '影片轉檔'}
+        colors = {'queued': '#6c757d', 'running': '#007cba', 'succeeded': '#28a745', 'failed': '#dc3545'}
+        detail = f'第 {job.attempts}/{job.max_attempts} 次'
+        if job.status == 'queued' and job.attempts:
+            detail += f'，{job.run_at:%m-%d %H:%M} 重試'
+        error = job.last_error.strip().splitlines()[-1] if job.last_error.strip() else ''
+        return format_html(
+            '{}：<span style="color: {}; font-weight: bold;">{}</span> <small>{}</small>'
+            '<div style="color: #dc3545; font-size: 12px;">{}</div>',
+            labels.get(job.task, job.task), colors.get(job.status, '#6c757d'), job.get_status_display(), detail,
+            error if job.status != 'succeeded' else '',
+        )
+    
+    get_processing_status.short_description = '檔案處理狀態'
+    
     def save_model(self, request, obj, form, change):
         """保存模型時的處理"""
+        changes = form_changes(form)
         if not change:  # 新增時
             obj.uploaded_by = request.user
         elif not request.user.is_admin():
             obj.uploaded_by = obj.uploaded_by
         super().save_model(request, obj, form, change)
+        record_change(request.user, obj, 'update' if change else 'create', changes)
+        
+        if 'file' in form.changed_data:
+            enqueue_file_processing(obj)
+            if obj.file:
+                record_kyc_upload(obj, request.user)
+        
+        if obj.verification_account:
+            warning = account_conflict_message(obj.bank_code, obj.verification_account, obj.customer_id)
+            if warning:
+                messages.warning(request, warning)
+        
+        # 同步驗證帳戶索引（改換客戶時，原客戶也要同步）
+        sync_customer_accounts(obj.customer)
+        previous_customer_id = form.initial.get('customer')
+        if previous_customer_id and previous_customer_id != obj.customer_id:
+            previous_customer = Customer.objects.filter(pk=previous_customer_id).first()
+            if previous_customer:
+                sync_customer_accounts(previous_customer)
+    
+    def delete_model(self, request, obj):
+        """刪除 KYC 記錄後同步驗證帳戶索引"""
+        customer = obj.customer
+        super().delete_model(request, obj)
+        sync_customer_accounts(customer)
+    
+    def delete_queryset(self, request, queryset):
+        """批次刪除 KYC 記錄後同步相關客戶的驗證帳戶索引"""
+        customer_ids = set(queryset.values_list('customer_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for customer in Customer.objects.filter(pk__in=customer_ids):
+            sync_customer_accounts(customer)
     
     def get_readonly_fields(self, request, obj=None):
         """根據用戶角色動態設置唯讀欄位"""
-        base_readonly = ['uploaded_at', 'get_file_preview', 'get_file_info']
+        base_readonly = ['uploaded_at', 'get_file_preview', 'get_file_info', 'get_processing_status', 'get_similar_images']
         
         if obj and not request.user.is_admin():
             return base_readonly + ['uploaded_by']
@@ -266,4 +397,20 @@ class KYCRecordAdmin(admin.ModelAdmin):
     
     def has_delete_permission(self, request, obj=None):
         """允許所有用戶刪除 KYC 記錄"""
-        return True
\ No newline at end of file
+        return True
+
+
+@admin.register(ArchivedMedia)
+class ArchivedMediaAdmin(admin.ModelAdmin):
+    """冷儲存檔案（唯讀，由 archive_kyc_files 指令建立）"""
+    list_display = ('path', 'record', 'compression', 'original_size', 'stored_size', 'archived_at', 'last_accessed_at', 'access_count')
+    list_filter = ('compression', 'archived_at')
+    search_fields = ('path',)
+    raw_id_fields = ('record',)
+    readonly_fields = [field.name for field in ArchivedMedia._meta.fields]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,154 @@
+"""
+KYC 冷儲存分層
+久未開啟的檔案以 gzip 壓縮移到冷儲存後端（本機目錄或 S3 相容儲存），釋放 MEDIA_ROOT 所在的磁碟；
+開啟時解壓到本機 LRU 快取，網址與權限檢查不變；設定 MEDIA_ENCRYPTION_KEYS 時快取檔案也加密存放
+"""
+
+import gzip
+import hashlib
+import logging
+import tempfile
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db.models import F
+from django.utils import timezone
+
+from nbcrm.utils.disk_cache import DiskLRUCache
+from nbcrm.utils.encryption import EncryptingReader, is_encrypted
+
+from .models import ArchivedMedia
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+# 壓縮後仍大於原檔此比例（已壓縮的 JPEG、MP4 等）時直接存原檔，省下解壓時間
+MIN_COMPRESSION_RATIO = 0.95
+
+
+class ArchiveVerificationError(Exception):
+    pass
+
+
+def get_cold_storage():
+    if not settings.STORAGES['kyc_cold'].get('OPTIONS'):
+        raise ImproperlyConfigured('未設定 KYC_COLD_STORAGE_OPTIONS（冷儲存位置）')
+    return storages['kyc_cold']
+
+
+@lru_cache(maxsize=None)
+def get_rehydrate_cache():
+    return DiskLRUCache(settings.KYC_REHYDRATE_CACHE_DIR, settings.KYC_REHYDRATE_CACHE_MAX_MB * 1024 * 1024)
+
+
+def _copy_hashed(source, destination):
+    """複製串流並計算 SHA-256，回傳 (hex, 位元組數)"""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+        size += len(chunk)
+        destination.write(chunk)
+    return digest.hexdigest(), size
+
+
+class _NullWriter:
+    def write(self, data):
+        pass
+
+
+def open_cold_file(archived):
+    """開啟冷儲存中的檔案，回傳解壓後的串流"""
+    file = get_cold_storage().open(archived.cold_name, 'rb')
+    if archived.compression == 'gzip':
+        return gzip.GzipFile(fileobj=file, mode='rb')
+    return file
+
+
+def archive_record_file(record):
+    """
+    將 KYC 記錄的檔案壓縮移到冷儲存，驗證冷儲存內容的雜湊與原檔相符後才刪除原檔
+    回傳 ArchivedMedia；檔案不在 MEDIA_ROOT（已封存或遺失）時回傳 None
+    """
+    name = record.file.name
+    hot_storage = record.file.storage
+    if not name or not hot_storage.exists(name):
+        return None
+    cold_storage = get_cold_storage()
+    
+    with tempfile.TemporaryFile() as compressed:
+        with hot_storage.open(name, 'rb') as source:
+            with gzip.GzipFile(fileobj=compressed, mode='wb', compresslevel=6, mtime=0) as writer:
+                checksum, original_size = _copy_hashed(source, writer)
+        stored_size = compressed.tell()
+        compressed.seek(0)
+        if stored_size < original_size * MIN_COMPRESSION_RATIO:
+            compression = 'gzip'
+            cold_name = cold_storage.save(f'{name}.gz', File(compressed))
+        else:
+            compression = 'none'
+            stored_size = original_size
+            with hot_storage.open(name, 'rb') as source:
+                cold_name = cold_storage.save(name, File(source))
+    
+    archived = ArchivedMedia(
+        path=name, record=record, cold_name=cold_name, compression=compression,
+        original_size=original_size, stored_size=stored_size, sha256=checksum,
+    )
+    with open_cold_file(archived) as stored:
+        verified, _ = _copy_hashed(stored, _NullWriter())
+    if verified != checksum:
+        cold_storage.delete(cold_name)
+        raise ArchiveVerificationError(f'冷儲存檔案驗證失敗: {name}')
+    
+    # 同一路徑曾封存過（原檔刪除後又上傳同名檔案）時，以新的封存取代
+    previous = ArchivedMedia.objects.filter(path=name).first()
+    if previous is not None:
+        cold_storage.delete(previous.cold_name)
+        previous.delete()
+    archived.save()
+    hot_storage.delete(name)
+    
+    logger.info(
+        'KYC 記錄 #%s 檔案已封存: %s (%d bytes -> %d bytes, %s)',
+        record.pk, name, original_size, stored_size, compression
+    )
+    return archived
+
+
+def _is_encrypted_file(path):
+    try:
+        with open(path, 'rb') as file:
+            return is_encrypted(file)
+    except FileNotFoundError:
+        return False
+
+
+def rehydrate_media(path):
+    """
+    冷儲存檔案的本機快取路徑：快取中沒有時從冷儲存解壓寫入（設定加密金鑰時寫入密文，以 open_cached_media 讀取）
+    path 不是封存的檔案時回傳 None
+    """
+    archived = ArchivedMedia.objects.filter(path=path).first()
+    if archived is None:
+        return None
+    cache = get_rehydrate_cache()
+    cached = cache.get(path)
+    if cached is not None and settings.MEDIA_ENCRYPTION_KEYS and not _is_encrypted_file(cached):
+        # 啟用加密前寫入的明文快取，重新寫入加密版本
+        cached = None
+    if cached is None:
+        with open_cold_file(archived) as stored:
+            if settings.MEDIA_ENCRYPTION_KEYS:
+                stored_for_cache = EncryptingReader(stored, settings.MEDIA_ENCRYPTION_FRAME_SIZE)
+            else:
+                stored_for_cache = stored
+            cached = cache.put(path, stored_for_cache)
+        logger.info('冷儲存檔案已解壓到快取: %s', path)
+    ArchivedMedia.objects.filter(pk=archived.pk).update(
+        last_accessed_at=timezone.now(), access_count=F('access_count') + 1
+    )
+    return cached
@@ -0,0 +1,164 @@
+"""
+KYC 檔案打包下載
+邊讀取邊寫入 ZIP 並串流給瀏覽器：不使用暫存檔、不在記憶體中組出整個壓縮檔，數 GB 的打包也能立即開始下載
+"""
+
+import csv
+import hashlib
+import io
+import logging
+import posixpath
+import re
+import zipfile
+
+from django.db import router
+from django.utils import timezone
+
+from nbcrm.db_router import replica_reads
+from nbcrm.utils.media_utils import STREAM_CHUNK_SIZE, open_cached_media, open_media
+
+from .archive import rehydrate_media
+from .models import KYCRecord
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.csv'
+MANIFEST_HEADER = [
+    '客戶ID', '客戶名稱', 'KYC記錄ID', '銀行代碼', '驗證帳戶', '檔案說明',
+    '上傳客服', '上傳時間', '壓縮檔內路徑', '大小(bytes)', 'SHA-256', '狀態',
+]
+# 已壓縮的格式直接存入，避免浪費 CPU；其餘（文件等）使用 deflate
+STORED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.jfif', '.heic', '.heif',
+    '.mp4', '.mov', '.avi', '.wmv', '.flv', '.webm', '.zip', '.gz', '.pdf',
+}
+
+
+class _ChunkWriter:
+    """
+    zipfile 的輸出目標：不支援 seek / tell，zipfile 會改用資料描述區（data descriptor）寫入，
+    寫入的內容暫存到下一次 drain() 時交給回應
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _safe_component(value):
+    """壓縮檔內的目錄 / 檔名：去除路徑分隔與控制字元"""
+    value = re.sub(r'[\\/:*?"<>|\x00-\x1f]+', '_', value or '').strip(' .')
+    return value[:80] or '_'
+
+
+def _open_record_file(name):
+    """開啟 KYC 檔案（含已移到冷儲存的檔案），回傳 (檔案物件, 大小)"""
+    try:
+        file, size, _ = open_media(name)
+        return file, size
+    except FileNotFoundError:
+        cached_path = rehydrate_media(name)
+        if cached_path is None:
+            raise
+        file, size, _ = open_cached_media(cached_path)
+        return file, size
+
+
+def kyc_bundle_records(customer_ids):
+    """
+    打包的 KYC 記錄，從讀取副本讀取（請求中已寫入時仍讀主資料庫）
+    建立查詢時就決定資料庫，ZIP 串流期間寫入的稽核紀錄不影響後續讀取
+    """
+    with replica_reads():
+        database = router.db_for_read(KYCRecord)
+    return (
+        KYCRecord.objects.using(database).filter(customer_id__in=customer_ids)
+        .exclude(file='').exclude(file__isnull=True)
+        .select_related('customer', 'uploaded_by')
+        .order_by('customer_id', 'uploaded_at', 'pk')
+    )
+
+
+def iter_kyc_zip(records, on_file=None):
+    """
+    依序讀取 KYC 記錄的檔案寫入 ZIP，逐塊產生壓縮檔內容；最後加入 manifest.csv（含每個檔案的 SHA-256）
+    on_file(record, status) 在每個檔案處理後呼叫（用於稽核紀錄）
+    """
+    writer = _ChunkWriter()
+    manifest = io.StringIO()
+    manifest_writer = csv.writer(manifest)
+    manifest_writer.writerow(MANIFEST_HEADER)
+    used_names = set()
+
+    with zipfile.ZipFile(writer, 'w', allowZip64=True) as archive:
+        for record in records.iterator(chunk_size=200):
+            customer = record.customer
+            filename = _safe_component(posixpath.basename(record.file.name))
+            folder = f'{customer.pk}_{_safe_component(customer.get_display_name())}'
+            arcname = f'{folder}/{record.pk}_{filename}'
+            if arcname in used_names:
+                continue
+            used_names.add(arcname)
+
+            digest = hashlib.sha256()
+            size = 0
+            status = 'ok'
+            try:
+                file, expected_size = _open_record_file(record.file.name)
+            except FileNotFoundError:
+                status = 'missing'
+            except Exception:
+                # 解密失敗、物件儲存或冷儲存錯誤：manifest 標記錯誤，繼續打包其他檔案
+                logger.exception('KYC 記錄 #%s 檔案開啟失敗: %s', record.pk, record.file.name)
+                status = 'error'
+            else:
+                info = zipfile.ZipInfo(arcname, date_time=timezone.localtime(record.uploaded_at).timetuple()[:6])
+                extension = posixpath.splitext(filename)[1].lower()
+                info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                # 預先告知大小，超過 4GB 的檔案會自動使用 ZIP64
+                info.file_size = expected_size
+                try:
+                    with file, archive.open(info, 'w') as entry:
+                        for chunk in iter(lambda: file.read(STREAM_CHUNK_SIZE), b''):
+                            digest.update(chunk)
+                            size += len(chunk)
+                            entry.write(chunk)
+                            data = writer.drain()
+                            if data:
+                                yield data
+                except Exception:
+                    # 讀取中途失敗（I/O、解密、解壓錯誤）時壓縮檔內只會有部分內容，manifest 標記錯誤
+                    logger.exception('KYC 記錄 #%s 檔案讀取失敗: %s', record.pk, record.file.name)
+                    status = 'error'
+
+            if on_file is not None:
+                on_file(record, status)
+            manifest_writer.writerow([
+                customer.pk,
+                customer.get_display_name(),
+                record.pk,
+                record.bank_code or '',
+                record.verification_account or '',
+                record.file_description,
+                record.uploaded_by.username if record.uploaded_by else '',
+                timezone.localtime(record.uploaded_at).strftime('%Y-%m-%d %H:%M:%S'),
+                arcname if status != 'missing' else '',
+                size,
+                digest.hexdigest() if status == 'ok' else '',
+                {'ok': '已包含', 'missing': '檔案不存在', 'error': '讀取失敗'}[status],
+            ])
+
+        # UTF-8 BOM 讓 Excel 正確顯示中文
+        archive.writestr(MANIFEST_NAME, '﻿' + manifest.getvalue(), compress_type=zipfile.ZIP_DEFLATED)
+    yield writer.drain()
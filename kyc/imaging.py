@@ -0,0 +1,97 @@
+"""
+KYC 圖片處理工具（Pillow）
+"""
+
+import io
+
+from PIL import Image, ImageOps
+
+try:
+    # 選用：安裝 pillow-heif 後可處理 iPhone 的 HEIC / HEIF 照片
+    from pillow_heif import register_heif_opener
+except ImportError:
+    HEIF_SUPPORTED = False
+else:
+    register_heif_opener()
+    HEIF_SUPPORTED = True
+
+# dHash：9x8 灰階縮圖，比較相鄰像素，得到 64 位元的感知雜湊
+DHASH_SIZE = 8
+# 多索引雜湊：64 位元切成 4 段，每段 16 位元分別建索引
+HASH_BANDS = 4
+BAND_BITS = 64 // HASH_BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+
+def dhash(image):
+    """計算圖片的 dHash（0 ~ 2^64-1），先依 EXIF 轉正，旋轉過的同一張照片也能比對"""
+    image = ImageOps.exif_transpose(image)
+    small = image.convert('L').resize((DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(DHASH_SIZE):
+        offset = row * (DHASH_SIZE + 1)
+        for col in range(DHASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def dhash_file(file):
+    """從檔案物件計算 dHash"""
+    with Image.open(file) as image:
+        image.draft('L', (64, 64))  # JPEG 直接以低解析度解碼，大幅減少解碼時間
+        return dhash(image)
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+def to_signed(value):
+    """64 位元無號整數轉為有號，存入 BigIntegerField"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def hash_bands(value):
+    """切成 HASH_BANDS 段，每段 BAND_BITS 位元"""
+    return [(value >> (BAND_BITS * i)) & BAND_MASK for i in range(HASH_BANDS)]
+
+
+def band_probes(band, radius):
+    """與該段距離在 radius（0 或 1）位元內的所有值"""
+    probes = [band]
+    if radius >= 1:
+        probes += [band ^ (1 << bit) for bit in range(BAND_BITS)]
+    return probes
+
+
+def normalize_image(file, max_dimension, quality, original_size=None):
+    """
+    上傳圖片正規化：依 EXIF 轉正、移除所有中繼資料（含 GPS）、縮到 max_dimension 以內後重新編碼
+    回傳 (bytes, 副檔名)；動態 GIF 或處理後沒有變小且原本就沒有中繼資料時回傳 None
+    """
+    with Image.open(file) as image:
+        if getattr(image, 'n_frames', 1) > 1:
+            return None
+        had_metadata = bool(image.getexif()) or 'icc_profile' in image.info
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        
+        output = io.BytesIO()
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        if has_alpha:
+            # 有透明度（截圖等）保留 PNG
+            image.save(output, 'PNG', optimize=True)
+            extension = '.png'
+        else:
+            image.convert('RGB').save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+            extension = '.jpg'
+    
+    data = output.getvalue()
+    if original_size is not None and len(data) >= original_size and not had_metadata:
+        return None
+    return data, extension
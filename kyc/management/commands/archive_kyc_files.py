@@ -0,0 +1,64 @@
+"""
+將超過保存天數的 KYC 檔案移到冷儲存
+用法: python manage.py archive_kyc_files [--older-than-days 365] [--limit 1000] [--dry-run]
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from kyc.archive import archive_record_file
+from kyc.models import ArchivedMedia, KYCRecord
+
+
+class Command(BaseCommand):
+    help = '將久未使用的 KYC 檔案壓縮移到冷儲存，釋放媒體磁碟空間'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=settings.KYC_ARCHIVE_AFTER_DAYS,
+            help=f'封存上傳超過幾天的檔案（預設 {settings.KYC_ARCHIVE_AFTER_DAYS}）',
+        )
+        parser.add_argument('--limit', type=int, default=None, help='本次最多封存幾個檔案')
+        parser.add_argument('--dry-run', action='store_true', help='只列出會封存的檔案')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        records = (
+            KYCRecord.objects.filter(uploaded_at__lt=cutoff)
+            .exclude(file='').exclude(file__isnull=True)
+            .exclude(file__in=ArchivedMedia.objects.values('path'))
+            .order_by('uploaded_at')
+            .only('id', 'file', 'uploaded_at')
+        )
+        if options['limit']:
+            records = records[:options['limit']]
+
+        archived_count = failed = skipped = 0
+        freed = 0
+        for record in records.iterator(chunk_size=500):
+            if options['dry_run']:
+                self.stdout.write(f'#{record.pk} {record.file.name} ({record.uploaded_at:%Y-%m-%d})')
+                archived_count += 1
+                continue
+            try:
+                archived = archive_record_file(record)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f'#{record.pk} {record.file.name} 封存失敗: {e}'))
+                continue
+            if archived is None:
+                skipped += 1
+                continue
+            archived_count += 1
+            freed += archived.original_size
+
+        if options['dry_run']:
+            self.stdout.write(f'共 {archived_count} 個檔案會被封存')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'已封存 {archived_count} 個檔案，釋放 {freed / (1024 * 1024):.1f} MB；'
+            f'略過 {skipped} 個（檔案不存在），失敗 {failed} 個'
+        ))
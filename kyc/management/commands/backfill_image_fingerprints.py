@@ -0,0 +1,79 @@
+"""
+為既有的 KYC 圖片補算感知雜湊（dHash）
+以多個程序平行解碼圖片，主程序批次寫入資料庫
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django import db
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from kyc.imaging import dhash_file
+from kyc.models import KYCRecord
+from kyc.services import build_fingerprint, save_fingerprints
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.jfif')
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _hash_file(item):
+    """在子程序中計算單一檔案的 dHash，回傳 (record_id, hash 或 None, 錯誤訊息)"""
+    record_id, name = item
+    try:
+        with default_storage.open(name, 'rb') as file:
+            return record_id, dhash_file(file), None
+    except Exception as e:
+        return record_id, None, str(e)
+
+
+class Command(BaseCommand):
+    help = '為既有的 KYC 圖片補算感知雜湊，供相似圖片比對使用'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='平行程序數（預設為 CPU 核心數）')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批處理的記錄數（預設 500）')
+        parser.add_argument('--all', action='store_true', help='重新計算所有圖片（預設只處理尚無指紋的記錄）')
+
+    def handle(self, *args, **options):
+        records = KYCRecord.objects.exclude(file__isnull=True).exclude(file='')
+        if not options['all']:
+            records = records.filter(fingerprint__isnull=True)
+        items = [
+            (pk, name)
+            for pk, name in records.order_by('pk').values_list('pk', 'file').iterator(chunk_size=2000)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+        total = len(items)
+        self.stdout.write(f'需要處理的圖片：{total} 筆')
+        if not total:
+            return
+
+        # fork 前關閉資料庫連線，子程序不共用父程序的連線
+        db.connections.close_all()
+        started = time.monotonic()
+        done = failed = 0
+        batch = []
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            for record_id, value, error in pool.map(_hash_file, items, chunksize=options['batch_size'] // 10 or 1):
+                if value is None:
+                    failed += 1
+                    self.stderr.write(f'KYC 記錄 #{record_id} 失敗：{error}')
+                else:
+                    batch.append(build_fingerprint(record_id, value))
+                    done += 1
+                if len(batch) >= options['batch_size']:
+                    save_fingerprints(batch)
+                    batch = []
+                if (done + failed) % options['batch_size'] == 0:
+                    rate = (done + failed) / (time.monotonic() - started)
+                    self.stdout.write(f'進度 {done + failed}/{total}（{rate:.0f} 張/秒）')
+
+        if batch:
+            save_fingerprints(batch)
+        self.stdout.write(self.style.SUCCESS(f'完成：成功 {done} 筆，失敗 {failed} 筆'))
@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-19 19:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kyc', '0005_alter_kycrecord_file_description_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageFingerprint',
+            fields=[
+                ('record', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='kyc.kycrecord', verbose_name='KYC 記錄')),
+                ('dhash', models.BigIntegerField(verbose_name='dHash')),
+                ('band0', models.IntegerField(db_index=True)),
+                ('band1', models.IntegerField(db_index=True)),
+                ('band2', models.IntegerField(db_index=True)),
+                ('band3', models.IntegerField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='建立時間')),
+            ],
+            options={
+                'verbose_name': '圖片指紋',
+                'verbose_name_plural': '圖片指紋',
+            },
+        ),
+    ]
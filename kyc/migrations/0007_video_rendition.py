@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-19 19:07
+
+from django.db import migrations, models
+import kyc.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kyc', '0006_imagefingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kycrecord',
+            name='video_rendition',
+            field=models.FileField(blank=True, editable=False, help_text='背景轉檔產生的 H.264/AAC MP4，供瀏覽器串流預覽', null=True, upload_to=kyc.models.kyc_rendition_path, verbose_name='影片轉檔'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2 on 2026-10-19 19:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kyc', '0007_video_rendition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True, verbose_name='媒體路徑')),
+                ('cold_name', models.CharField(max_length=255, verbose_name='冷儲存路徑')),
+                ('compression', models.CharField(choices=[('gzip', 'gzip'), ('none', '未壓縮')], max_length=10, verbose_name='壓縮方式')),
+                ('original_size', models.BigIntegerField(verbose_name='原始大小')),
+                ('stored_size', models.BigIntegerField(verbose_name='儲存大小')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='封存時間')),
+                ('last_accessed_at', models.DateTimeField(blank=True, null=True, verbose_name='最後開啟時間')),
+                ('access_count', models.PositiveIntegerField(default=0, verbose_name='開啟次數')),
+                ('record', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_files', to='kyc.kycrecord', verbose_name='KYC 記錄')),
+            ],
+            options={
+                'verbose_name': '冷儲存檔案',
+                'verbose_name_plural': '冷儲存檔案',
+                'ordering': ['-archived_at'],
+            },
+        ),
+    ]
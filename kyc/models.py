@@ -10,6 +10,9 @@ User = get_user_model()
 def kyc_upload_path(instance, filename):
     return f'kyc/{instance.customer.id}/{filename}'
 
+def kyc_rendition_path(instance, filename):
+    return f'kyc/{instance.customer.id}/renditions/{filename}'
+
 class KYCRecord(models.Model):
     customer = models.ForeignKey(
         Customer, 
@@ -46,6 +49,14 @@ class KYCRecord(models.Model):
         null=True,
         help_text='支援圖片和影片檔案，檔案大小不超過100MB（選填）'
     )
+    video_rendition = models.FileField(
+        upload_to=kyc_rendition_path,
+        verbose_name='影片轉檔',
+        blank=True,
+        null=True,
+        editable=False,
+        help_text='背景轉檔產生的 H.264/AAC MP4，供瀏覽器串流預覽'
+    )
     file_description = models.TextField(
         blank=True,
         verbose_name='檔案說明',
@@ -84,14 +95,96 @@ class KYCRecord(models.Model):
         video_extensions = ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm']
         return self.get_file_extension() in video_extensions
     
+    def get_playback_file(self):
+        """影片預覽使用的檔案：有轉檔版本時優先使用"""
+        return self.video_rendition or self.file
+    
+    def get_archived_media(self):
+        """檔案已移到冷儲存時回傳 ArchivedMedia"""
+        if not self.file:
+            return None
+        return ArchivedMedia.objects.filter(path=self.file.name).first()
+    
     def get_file_size_display(self):
         """返回易讀的檔案大小"""
         if self.file:
-            size = self.file.size
+            suffix = ""
+            try:
+                size = self.file.size
+            except FileNotFoundError:
+                archived = self.get_archived_media()
+                if archived is None:
+                    raise
+                size = archived.original_size
+                suffix = "（冷儲存）"
             if size < 1024:
-                return f"{size} B"
+                return f"{size} B{suffix}"
             elif size < 1024 * 1024:
-                return f"{size / 1024:.1f} KB"
+                return f"{size / 1024:.1f} KB{suffix}"
             else:
-                return f"{size / (1024 * 1024):.1f} MB"
+                return f"{size / (1024 * 1024):.1f} MB{suffix}"
         return "無檔案"
+
+
+class ImageFingerprint(models.Model):
+    """
+    KYC 圖片的感知雜湊（dHash），用於找出不同客戶間重複使用的證件照片
+    64 位元雜湊切成 4 段各自建索引（多索引雜湊），漢明距離查詢只需幾次索引查找
+    """
+    record = models.OneToOneField(
+        KYCRecord,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='fingerprint',
+        verbose_name='KYC 記錄'
+    )
+    dhash = models.BigIntegerField(verbose_name='dHash')
+    band0 = models.IntegerField(db_index=True)
+    band1 = models.IntegerField(db_index=True)
+    band2 = models.IntegerField(db_index=True)
+    band3 = models.IntegerField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='建立時間')
+    
+    class Meta:
+        verbose_name = '圖片指紋'
+        verbose_name_plural = '圖片指紋'
+    
+    def __str__(self):
+        return f"{self.record_id}: {self.dhash & 0xFFFFFFFFFFFFFFFF:016x}"
+
+
+class ArchivedMedia(models.Model):
+    """
+    已移到冷儲存的 KYC 檔案
+    path 與 KYCRecord.file.name 相同，網址不變；開啟時由 serve_secure_media 解壓到本機快取提供
+    """
+    COMPRESSION_CHOICES = [
+        ('gzip', 'gzip'),
+        ('none', '未壓縮'),
+    ]
+    
+    path = models.CharField(max_length=255, unique=True, verbose_name='媒體路徑')
+    record = models.ForeignKey(
+        KYCRecord,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='archived_files',
+        verbose_name='KYC 記錄'
+    )
+    cold_name = models.CharField(max_length=255, verbose_name='冷儲存路徑')
+    compression = models.CharField(max_length=10, choices=COMPRESSION_CHOICES, verbose_name='壓縮方式')
+    original_size = models.BigIntegerField(verbose_name='原始大小')
+    stored_size = models.BigIntegerField(verbose_name='儲存大小')
+    sha256 = models.CharField(max_length=64, verbose_name='SHA-256')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name='封存時間')
+    last_accessed_at = models.DateTimeField(null=True, blank=True, verbose_name='最後開啟時間')
+    access_count = models.PositiveIntegerField(default=0, verbose_name='開啟次數')
+    
+    class Meta:
+        verbose_name = '冷儲存檔案'
+        verbose_name_plural = '冷儲存檔案'
+        ordering = ['-archived_at']
+    
+    def __str__(self):
+        return self.path
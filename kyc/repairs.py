@@ -0,0 +1,72 @@
+"""
+KYC 資料修復（python manage.py run_repair <名稱>）
+"""
+
+from django.contrib.auth import get_user_model
+
+from customers.bank_accounts import normalize_account, sync_customer_accounts
+from customers.models import Customer
+from jobs.repair import Repair, register_repair
+
+from .models import KYCRecord
+
+
+@register_repair
+class FillUploadedBy(Repair):
+    """取代 direct_fix_kyc_data.py：uploaded_by 為空的記錄補上指定使用者"""
+    name = 'kyc_uploaded_by'
+    help = 'uploaded_by 為空的 KYC 記錄補上上傳者（--param user=帳號，預設為第一個管理員）'
+    batch_size = 5000
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        User = get_user_model()
+        username = params.get('user')
+        if username:
+            self.user = User.objects.get(**{User.USERNAME_FIELD: username})
+        else:
+            self.user = (
+                User.objects.filter(is_superuser=True).order_by('pk').first()
+                or User.objects.filter(is_staff=True).order_by('pk').first()
+            )
+        if self.user is None:
+            raise ValueError('沒有管理員帳號可設為上傳者，請先執行 createsuperuser 或指定 --param user=帳號')
+
+    def get_queryset(self):
+        return KYCRecord.objects.filter(uploaded_by__isnull=True).only('pk')
+
+    def repair_batch(self, rows, dry_run):
+        if dry_run:
+            return len(rows)
+        # 再次限定 uploaded_by 為空，批次讀取後才被填上的記錄不覆蓋
+        return KYCRecord.objects.filter(pk__in=[row.pk for row in rows], uploaded_by__isnull=True).update(
+            uploaded_by=self.user
+        )
+
+
+@register_repair
+class NormalizeVerificationAccount(Repair):
+    """驗證帳號去除空白與分隔符號，並同步受影響客戶的帳戶索引"""
+    name = 'kyc_verification_account'
+    help = 'KYC 驗證帳號去除空白與分隔符號，無效的銀行代碼清空，並重新同步帳戶索引'
+    batch_size = 2000
+
+    def get_queryset(self):
+        return KYCRecord.objects.exclude(verification_account='').filter(
+            verification_account__isnull=False
+        ).only('pk', 'customer_id', 'bank_code', 'verification_account')
+
+    def repair_batch(self, rows, dry_run):
+        changed = []
+        for row in rows:
+            account = normalize_account(row.bank_code, row.verification_account)
+            if account is None or account == (row.bank_code or '', row.verification_account):
+                continue
+            row.bank_code = account[0] or None
+            row.verification_account = account[1]
+            changed.append(row)
+        if changed and not dry_run:
+            KYCRecord.objects.bulk_update(changed, ['bank_code', 'verification_account'])
+            for customer in Customer.objects.filter(pk__in={row.customer_id for row in changed}):
+                sync_customer_accounts(customer)
+        return len(changed)
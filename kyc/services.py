@@ -0,0 +1,220 @@
+"""
+KYC 檔案上傳後的處理流程
+"""
+
+import logging
+import os
+import tempfile
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db.models import Q
+
+from .imaging import (
+    HASH_BANDS,
+    HEIF_SUPPORTED,
+    band_probes,
+    dhash_file,
+    hamming_distance,
+    hash_bands,
+    normalize_image,
+    to_signed,
+    to_unsigned,
+)
+from nbcrm.utils.media_utils import local_copy
+
+from .models import ImageFingerprint
+from .video import ffmpeg_available, transcode_to_mp4
+
+logger = logging.getLogger(__name__)
+
+# 上傳後會正規化的圖片格式（GIF 可能是動畫，不處理）
+NORMALIZE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.jfif'}
+if HEIF_SUPPORTED:
+    NORMALIZE_EXTENSIONS |= {'.heic', '.heif'}
+
+
+def normalize_record_image(record):
+    """
+    圖片上傳後：轉正、移除 EXIF/GPS、限制解析度並重新壓縮，取代原檔
+    KYC_KEEP_ORIGINAL_IMAGES 開啟時原檔移到 originals/ 子目錄保留
+    """
+    if not settings.KYC_IMAGE_NORMALIZE or record.get_file_extension() not in NORMALIZE_EXTENSIONS:
+        return False
+    
+    storage = record.file.storage
+    original_name = record.file.name
+    try:
+        original_size = record.file.size
+        with record.file.open('rb') as file:
+            result = normalize_image(
+                file,
+                max_dimension=settings.KYC_IMAGE_MAX_DIMENSION,
+                quality=settings.KYC_IMAGE_JPEG_QUALITY,
+                original_size=original_size,
+            )
+    except Exception as e:
+        logger.warning('無法正規化 KYC 記錄 #%s 的圖片: %s', record.pk, e)
+        return False
+    if result is None:
+        return False
+    
+    data, extension = result
+    stem = os.path.splitext(os.path.basename(original_name))[0]
+    if settings.KYC_KEEP_ORIGINAL_IMAGES:
+        with storage.open(original_name, 'rb') as file:
+            storage.save(
+                f'{os.path.dirname(original_name)}/originals/{os.path.basename(original_name)}',
+                file,
+            )
+    record.file.save(f'{stem}{extension}', ContentFile(data), save=False)
+    record.save(update_fields=['file'])
+    storage.delete(original_name)
+    
+    logger.info(
+        'KYC 記錄 #%s 圖片已正規化: %s (%d bytes) -> %s (%d bytes)',
+        record.pk, original_name, original_size, record.file.name, len(data)
+    )
+    return True
+
+
+def update_image_fingerprint(record):
+    """計算並保存圖片記錄的 dHash；非圖片或已移除檔案時刪除舊指紋"""
+    if not record.is_image():
+        ImageFingerprint.objects.filter(record=record).delete()
+        return None
+    try:
+        with record.file.open('rb') as file:
+            value = dhash_file(file)
+    except Exception as e:
+        logger.warning('無法計算 KYC 記錄 #%s 的圖片指紋: %s', record.pk, e)
+        return None
+    return save_fingerprint(record.pk, value)
+
+
+def build_fingerprint(record_id, value):
+    """建立（未儲存的）圖片指紋物件"""
+    bands = hash_bands(value)
+    return ImageFingerprint(
+        record_id=record_id,
+        dhash=to_signed(value),
+        band0=bands[0],
+        band1=bands[1],
+        band2=bands[2],
+        band3=bands[3],
+    )
+
+
+def save_fingerprints(fingerprints):
+    """批次寫入圖片指紋，已存在的記錄直接更新"""
+    ImageFingerprint.objects.bulk_create(
+        fingerprints,
+        update_conflicts=True,
+        unique_fields=['record'],
+        update_fields=['dhash', 'band0', 'band1', 'band2', 'band3'],
+    )
+
+
+def save_fingerprint(record_id, value):
+    """保存（或更新）一筆 dHash"""
+    fingerprint = build_fingerprint(record_id, value)
+    save_fingerprints([fingerprint])
+    return fingerprint
+
+
+def find_similar_images(value, max_distance=None, exclude_record_id=None, limit=20):
+    """
+    找出漢明距離在 max_distance 內的圖片，回傳 [(距離, ImageFingerprint)]，由近到遠
+    多索引雜湊：距離 d 分散在 4 段時，至少有一段差異不超過 d // 4 位元，
+    因此只需查詢每段「相同或差 1 位元」的值（max_distance 最大支援 7）
+    """
+    if max_distance is None:
+        max_distance = settings.KYC_SIMILAR_IMAGE_MAX_DISTANCE
+    radius = min(max_distance // HASH_BANDS, 1)
+    conditions = [
+        Q(**{f'band{index}__in': band_probes(band, radius)})
+        for index, band in enumerate(hash_bands(value))
+    ]
+    candidates = ImageFingerprint.objects.filter(reduce(or_, conditions)).select_related(
+        'record', 'record__customer'
+    )
+    if exclude_record_id:
+        candidates = candidates.exclude(record_id=exclude_record_id)
+
+    matches = []
+    for fingerprint in candidates:
+        distance = hamming_distance(value, to_unsigned(fingerprint.dhash))
+        if distance <= max_distance:
+            matches.append((distance, fingerprint))
+    matches.sort(key=lambda item: item[0])
+    return matches[:limit]
+
+
+def delete_video_rendition(record):
+    """刪除舊的影片轉檔（原檔更換或刪除後即失效）"""
+    if not record.video_rendition:
+        return
+    record.video_rendition.delete(save=False)
+    record.save(update_fields=['video_rendition'])
+
+
+def video_transcode_enabled():
+    return settings.KYC_VIDEO_TRANSCODE and ffmpeg_available(settings.FFMPEG_BINARY)
+
+
+def transcode_record_video(record):
+    """
+    以 ffmpeg 將影片轉為 H.264/AAC MP4（faststart、限制位元率），與原檔並存於 renditions/
+    轉檔失敗時拋出 TranscodeError，由背景工作重試
+    """
+    if not record.is_video():
+        return False
+    
+    stem = os.path.splitext(os.path.basename(record.file.name))[0]
+    with local_copy(record.file, suffix=record.get_file_extension()) as source, \
+            tempfile.NamedTemporaryFile(suffix='.mp4') as output:
+        transcode_to_mp4(
+            settings.FFMPEG_BINARY,
+            source,
+            output.name,
+            max_bitrate_kbps=settings.KYC_VIDEO_MAX_BITRATE_KBPS,
+            max_height=settings.KYC_VIDEO_MAX_HEIGHT,
+            timeout=settings.KYC_VIDEO_TRANSCODE_TIMEOUT,
+        )
+        if record.video_rendition:
+            record.video_rendition.delete(save=False)
+        with open(output.name, 'rb') as file:
+            record.video_rendition.save(f'{stem}.mp4', File(file), save=False)
+    record.save(update_fields=['video_rendition'])
+    
+    logger.info(
+        'KYC 記錄 #%s 影片已轉檔: %s (%d bytes) -> %s (%d bytes)',
+        record.pk, record.file.name, record.file.size, record.video_rendition.name, record.video_rendition.size
+    )
+    return True
+
+
+def process_uploaded_file(record):
+    """
+    KYC 檔案新增或變更後的處理：先正規化圖片，再以正規化後的圖片計算指紋
+    影片另外排入轉檔工作（耗時較長，獨立重試）
+    """
+    delete_video_rendition(record)
+    normalize_record_image(record)
+    update_image_fingerprint(record)
+    if record.is_video() and video_transcode_enabled():
+        from jobs.registry import enqueue
+        from .tasks import TRANSCODE_VIDEO_TASK
+
+        enqueue(TRANSCODE_VIDEO_TASK, {'record_id': record.pk}, obj=record)
+
+
+def enqueue_file_processing(record):
+    """將上傳檔案的處理排入背景工作，避免大檔案拖慢 admin 儲存"""
+    from jobs.registry import enqueue
+    from .tasks import PROCESS_MEDIA_TASK
+
+    return enqueue(PROCESS_MEDIA_TASK, {'record_id': record.pk}, obj=record)
@@ -0,0 +1,29 @@
+"""
+KYC 背景工作
+"""
+
+from jobs.registry import task
+
+from .models import KYCRecord
+from .services import process_uploaded_file, transcode_record_video
+
+PROCESS_MEDIA_TASK = 'kyc.process_media'
+TRANSCODE_VIDEO_TASK = 'kyc.transcode_video'
+
+
+@task(PROCESS_MEDIA_TASK, max_attempts=3, retry_delay=60, concurrency=2)
+def process_media(record_id):
+    """上傳檔案的處理（正規化、指紋），記錄已刪除或已無檔案時略過"""
+    record = KYCRecord.objects.filter(pk=record_id).first()
+    if record is None:
+        return
+    process_uploaded_file(record)
+
+
+@task(TRANSCODE_VIDEO_TASK, max_attempts=3, retry_delay=300, concurrency=1)
+def transcode_video(record_id):
+    """影片轉檔（CPU 密集，所有 worker 合計同時只執行一個）"""
+    record = KYCRecord.objects.filter(pk=record_id).first()
+    if record is None or not record.file:
+        return
+    transcode_record_video(record)
@@ -0,0 +1,46 @@
+"""
+KYC 影片轉檔（使用本機 ffmpeg）
+轉成 H.264/AAC MP4，moov 移到檔頭（faststart），瀏覽器不需下載整個檔案即可開始播放
+"""
+
+import shutil
+import subprocess
+
+
+class TranscodeError(Exception):
+    pass
+
+
+def ffmpeg_available(binary):
+    return shutil.which(binary) is not None
+
+
+def transcode_command(binary, source, destination, max_bitrate_kbps, max_height):
+    """組出 ffmpeg 參數：CRF 畫質搭配 maxrate / bufsize 限制位元率上限，並移除中繼資料（含 GPS）"""
+    return [
+        binary, '-nostdin', '-hide_banner', '-loglevel', 'error', '-y',
+        '-i', source,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
+        '-maxrate', f'{max_bitrate_kbps}k', '-bufsize', f'{max_bitrate_kbps * 2}k',
+        # 高度不超過 max_height，寬度取偶數；yuv420p 確保各瀏覽器都能播放
+        '-vf', f"scale=-2:'min({max_height},ih)'", '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-b:a', '128k', '-ac', '2',
+        '-map_metadata', '-1',
+        '-movflags', '+faststart',
+        destination,
+    ]
+
+
+def transcode_to_mp4(binary, source, destination, max_bitrate_kbps=2000, max_height=720, timeout=1800):
+    """將 source 轉為串流友善的 MP4 寫入 destination，失敗時拋出 TranscodeError"""
+    command = transcode_command(binary, source, destination, max_bitrate_kbps, max_height)
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=timeout)
+    except FileNotFoundError:
+        raise TranscodeError(f'找不到 ffmpeg: {binary}')
+    except subprocess.TimeoutExpired:
+        raise TranscodeError(f'轉檔超過 {timeout} 秒')
+    if result.returncode != 0:
+        message = result.stderr.decode('utf-8', 'replace').strip()[-1000:]
+        raise TranscodeError(f'ffmpeg 結束代碼 {result.returncode}: {message}')
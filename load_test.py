@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+混合流量壓力測試：同時發送 Admin 頁面請求與 KYC 媒體下載
+用來比較不同 gunicorn worker 設定下的吞吐量
+
+範例：
+    gunicorn nbcrm.wsgi:application -c gunicorn.conf.py
+    python load_test.py --base-url http://127.0.0.1:8000 --username admin --password secret \\
+        --media kyc/1/video.mov --duration 30 --concurrency 32 --media-ratio 0.2
+"""
+
+import argparse
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_ADMIN_PATHS = [
+    '/admin/',
+    '/admin/customers/customer/',
+    '/admin/kyc/kycrecord/',
+    '/admin/transactions/transaction/',
+]
+
+
+def login(base_url, username, password):
+    """透過 Admin 登入頁取得已登入的 session"""
+    session = requests.Session()
+    login_url = f'{base_url}/admin/login/'
+    session.get(login_url)
+    response = session.post(
+        login_url,
+        data={
+            'username': username,
+            'password': password,
+            'csrfmiddlewaretoken': session.cookies.get('csrftoken', ''),
+            'next': '/admin/',
+        },
+        headers={'Referer': login_url},
+    )
+    if 'sessionid' not in session.cookies:
+        raise SystemExit(f'❌ 登入失敗（HTTP {response.status_code}）')
+    return session
+
+
+class Stats:
+    """各類請求的延遲與流量統計"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {'admin': [], 'media': []}
+        self.bytes = {'admin': 0, 'media': 0}
+        self.errors = {'admin': 0, 'media': 0}
+
+    def record(self, kind, latency, size, ok):
+        with self.lock:
+            self.latencies[kind].append(latency)
+            self.bytes[kind] += size
+            if not ok:
+                self.errors[kind] += 1
+
+
+def run_client(session, base_url, admin_paths, media_paths, media_ratio, deadline, stats):
+    cookies = session.cookies.copy()
+    client = requests.Session()
+    client.cookies.update(cookies)
+    while time.monotonic() < deadline:
+        if media_paths and random.random() < media_ratio:
+            kind, path = 'media', '/media/' + random.choice(media_paths)
+        else:
+            kind, path = 'admin', random.choice(admin_paths)
+        started = time.monotonic()
+        size = 0
+        ok = True
+        try:
+            with client.get(base_url + path, stream=True, timeout=600) as response:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    size += len(chunk)
+                ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        stats.record(kind, time.monotonic() - started, size, ok)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Admin + 媒體混合流量壓力測試')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--media', action='append', default=[], help='MEDIA_ROOT 下的檔案路徑，可重複指定')
+    parser.add_argument('--admin-path', action='append', default=[], help='額外的 Admin 路徑，可重複指定')
+    parser.add_argument('--duration', type=int, default=30, help='測試秒數')
+    parser.add_argument('--concurrency', type=int, default=16, help='同時連線數')
+    parser.add_argument('--media-ratio', type=float, default=0.2, help='媒體請求比例（0~1）')
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip('/')
+    admin_paths = args.admin_path or DEFAULT_ADMIN_PATHS
+    session = login(base_url, args.username, args.password)
+    stats = Stats()
+
+    print(f'🚀 {args.concurrency} 個連線，{args.duration} 秒，媒體比例 {args.media_ratio:.0%}')
+    started = time.monotonic()
+    deadline = started + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for _ in range(args.concurrency):
+            pool.submit(run_client, session, base_url, admin_paths, args.media,
+                        args.media_ratio, deadline, stats)
+    elapsed = time.monotonic() - started
+
+    print('=' * 60)
+    total = 0
+    for kind in ('admin', 'media'):
+        latencies = stats.latencies[kind]
+        total += len(latencies)
+        if not latencies:
+            continue
+        print(
+            f'{kind:>6}: {len(latencies):6d} 次  {len(latencies) / elapsed:8.1f} req/s  '
+            f'p50 {statistics.median(latencies) * 1000:7.1f}ms  '
+            f'p95 {percentile(latencies, 95) * 1000:7.1f}ms  '
+            f'{stats.bytes[kind] / elapsed / (1024 * 1024):7.2f} MB/s  '
+            f'錯誤 {stats.errors[kind]}'
+        )
+    print(f'  合計: {total} 次，{total / elapsed:.1f} req/s')
+
+
+if __name__ == '__main__':
+    main()
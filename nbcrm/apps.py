@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+class NbcrmConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'nbcrm'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .metrics import record_connection_created
+
+        connection_created.connect(record_connection_created, dispatch_uid='nbcrm_metrics_connection_created')
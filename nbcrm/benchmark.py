@@ -0,0 +1,424 @@
+"""
+Admin 熱門路徑的效能基準測試
+generate_benchmark_data 產生大量客戶、KYC 記錄與交易，benchmark_admin 量測各頁面的延遲、查詢數與記憶體
+結果輸出為 JSON，可比較不同 commit 之間的差異
+"""
+
+import io
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+# 壓測資料的標記：客戶信箱網域與客服帳號，清除時只刪除這些資料
+BENCHMARK_EMAIL_DOMAIN = 'benchmark.invalid'
+BENCHMARK_USERNAME = 'benchmark_cs'
+BENCHMARK_MEDIA_DIR = 'benchmark'
+
+SURNAMES = '陳林黃張李王吳劉蔡楊許鄭謝洪郭邱曾廖賴徐周葉蘇莊呂江何蕭羅高潘簡朱鍾彭游詹胡施沈余盧梁趙顏柯翁魏孫戴'
+GIVEN_NAME_CHARS = '志明俊傑家豪建宏怡君雅婷淑芬美玲宗翰承恩冠宇佳穎欣怡子晴宥廷柏翰詩涵思妤品妍'
+BANK_CODES = ('004', '005', '006', '007', '008', '009', '012', '013', '017', '808', '812', '822')
+
+
+def benchmark_customers():
+    from customers.models import Customer
+
+    return Customer.objects.filter(n8_email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}')
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """暫時關閉 auto_now / auto_now_add，讓 bulk_create 使用產生的時間（模擬多年的資料分布）"""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def ensure_sample_media(video_mb=8):
+    """
+    在預設儲存建立壓測用的樣本檔案（圖片、PDF、影片），回傳 {副檔名: 檔案名稱}
+    所有壓測 KYC 記錄共用這幾個檔案，不會佔用大量空間；已存在時直接沿用
+    """
+    from PIL import Image
+
+    image = io.BytesIO()
+    Image.effect_mandelbrot((1600, 1200), (-2, -1.2, 1, 1.2), 64).convert('RGB').save(image, 'JPEG', quality=85)
+    samples = {
+        '.jpg': image.getvalue(),
+        '.pdf': b'%PDF-1.4\n1 0 obj << /Type /Catalog >> endobj\ntrailer << /Root 1 0 R >>\n%%EOF\n',
+        # 下載測試只在意位元組數，內容不需要是可播放的影片
+        '.mp4': random.Random(0).randbytes(video_mb * 1024 * 1024),
+    }
+    names = {}
+    for extension, data in samples.items():
+        name = f'{BENCHMARK_MEDIA_DIR}/sample{extension}'
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(data))
+        names[extension] = name
+    return names
+
+
+def _random_name(rng):
+    return '壓測' + rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_NAME_CHARS) for _ in range(2))
+
+
+def generate_benchmark_data(customers, kyc_per_customer=2, transactions_per_customer=10,
+                            batch_size=2000, seed=42, days=730, video_mb=8, progress=None):
+    """
+    以 bulk_create 分批產生壓測資料，回傳各表新增的筆數
+    KYC 記錄的帳號同時寫入驗證帳戶索引，與實際資料一樣可用「帳號:」搜尋
+    """
+    from django.contrib.auth import get_user_model
+    from django.db import transaction as db_transaction
+
+    from customers.models import Customer, VerifiedAccount
+    from kyc.models import KYCRecord
+    from transactions.models import Transaction
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    user, _ = get_user_model().objects.get_or_create(
+        username=BENCHMARK_USERNAME,
+        defaults={'first_name': '壓測客服', 'role': 'cs', 'is_active': False},
+    )
+    media = ensure_sample_media(video_mb)
+    media_names = list(media.values())
+    start_index = benchmark_customers().count()
+    counts = {'customers': 0, 'kyc_records': 0, 'verified_accounts': 0, 'transactions': 0}
+
+    with explicit_timestamps(Customer, KYCRecord, Transaction):
+        for offset in range(0, customers, batch_size):
+            size = min(batch_size, customers - offset)
+            with db_transaction.atomic():
+                batch = []
+                for i in range(size):
+                    index = start_index + offset + i
+                    created_at = now - timedelta(seconds=rng.randrange(days * 86400))
+                    batch.append(Customer(
+                        name=_random_name(rng),
+                        line_nickname=f'line_{index}',
+                        n8_nickname=f'n8_{index}',
+                        n8_phone=f'09{rng.randrange(10 ** 8):08d}',
+                        n8_email=f'user{index}@{BENCHMARK_EMAIL_DOMAIN}',
+                        notes='壓測資料' if rng.random() < 0.3 else '',
+                        created_at=created_at,
+                        updated_at=min(now, created_at + timedelta(seconds=rng.randrange(86400 * 30))),
+                    ))
+                batch = Customer.objects.bulk_create(batch)
+                if batch[0].pk is None:
+                    # 不支援 RETURNING 的資料庫（MySQL）重新讀回主鍵
+                    emails = [customer.n8_email for customer in batch]
+                    pks = dict(Customer.objects.filter(n8_email__in=emails).values_list('n8_email', 'pk'))
+                    for customer in batch:
+                        customer.pk = pks[customer.n8_email]
+
+                records, accounts, transactions = [], [], []
+                for customer in batch:
+                    # 客戶建立到現在的秒數，交易與 KYC 時間都落在這段期間內，不會產生未來的資料
+                    age_seconds = int((now - customer.created_at).total_seconds()) or 1
+                    for k in range(kyc_per_customer):
+                        bank_code = rng.choice(BANK_CODES)
+                        account_number = f'{customer.pk:011d}{k}'
+                        records.append(KYCRecord(
+                            customer=customer,
+                            uploaded_by=user,
+                            bank_code=bank_code,
+                            verification_account=account_number,
+                            file=rng.choice(media_names),
+                            file_description='壓測資料',
+                            uploaded_at=customer.created_at + timedelta(
+                                seconds=rng.randrange(min(age_seconds, 86400 * 7))
+                            ),
+                        ))
+                        accounts.append(VerifiedAccount(
+                            customer=customer, bank_code=bank_code, account_number=account_number, source='kyc'
+                        ))
+                    for _ in range(transactions_per_customer):
+                        n8_amount = Decimal(rng.randrange(10 ** 4, 10 ** 11)) / Decimal(10 ** 8)
+                        transactions.append(Transaction(
+                            customer=customer,
+                            cs_user=user,
+                            transaction_type=rng.choice(('sell', 'buy')),
+                            n8_amount=n8_amount,
+                            twd_amount=(n8_amount * Decimal(rng.randrange(28000, 36000))).quantize(Decimal('0.01')),
+                            quick_reply=rng.random() < 0.8,
+                            created_at=customer.created_at + timedelta(seconds=rng.randrange(age_seconds)),
+                        ))
+                KYCRecord.objects.bulk_create(records, batch_size=batch_size)
+                VerifiedAccount.objects.bulk_create(accounts, batch_size=batch_size, ignore_conflicts=True)
+                Transaction.objects.bulk_create(transactions, batch_size=batch_size)
+
+            counts['customers'] += len(batch)
+            counts['kyc_records'] += len(records)
+            counts['verified_accounts'] += len(accounts)
+            counts['transactions'] += len(transactions)
+            if progress:
+                progress(counts)
+    return counts
+
+
+def purge_benchmark_data(batch_size=1000, progress=None):
+    """分批刪除壓測客戶（連同其 KYC 記錄、驗證帳戶與交易）及壓測客服帳號，回傳刪除的客戶數"""
+    from django.contrib.auth import get_user_model
+
+    from customers.models import Customer
+    from transactions.models import Transaction
+
+    deleted = 0
+    while True:
+        ids = list(benchmark_customers().order_by().values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        # 交易沒有關聯物件，先以單一 DELETE 刪除，避免逐筆收集
+        Transaction.objects.filter(customer_id__in=ids).delete()
+        Customer.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+        if progress:
+            progress(deleted)
+    get_user_model().objects.filter(username=BENCHMARK_USERNAME).delete()
+    return deleted
+
+
+class Scenario:
+    """一個量測情境：以 GET 請求某個網址，expected_status 以外的狀態碼視為失敗"""
+
+    def __init__(self, name, url, headers=None, expected_status=200):
+        self.name = name
+        self.url = url
+        self.headers = headers or {}
+        self.expected_status = expected_status
+
+
+def _changelist(app_label, model_name, **params):
+    url = reverse(f'admin:{app_label}_{model_name}_changelist')
+    if params:
+        from urllib.parse import urlencode
+
+        url = f'{url}?{urlencode(params)}'
+    return url
+
+
+def _middle_page(model, per_page=100):
+    """位於中間的分頁，用來量測較深的 OFFSET"""
+    pages = (model.objects.count() + per_page - 1) // per_page
+    return max(pages // 2, 1)
+
+
+def build_scenarios(video_range_bytes=1024 * 1024):
+    """
+    依資料庫目前的資料建立量測情境；找不到資料的情境略過
+    優先使用壓測資料，讓不同資料庫上的結果可以互相比較
+    """
+    from customers.models import Customer, VerifiedAccount
+    from kyc.models import KYCRecord
+    from transactions.models import Transaction
+
+    customers = benchmark_customers()
+    if not customers.exists():
+        customers = Customer.objects.all()
+    customer_ids = customers.order_by().values('pk')
+    records = KYCRecord.objects.filter(customer_id__in=customer_ids).order_by('pk')
+    record = records.first()
+    customer = record.customer if record else customers.order_by('pk').first()
+    transaction = Transaction.objects.filter(customer_id__in=customer_ids).order_by('pk').first()
+    account = VerifiedAccount.objects.filter(customer_id__in=customer_ids).order_by('pk').first()
+
+    scenarios = []
+    if customer:
+        search_term = customer.name[:3]
+        scenarios += [
+            Scenario('customer_changelist', _changelist('customers', 'customer')),
+            Scenario('customer_changelist_middle_page', _changelist('customers', 'customer', p=_middle_page(Customer))),
+            Scenario('customer_search_name', _changelist('customers', 'customer', q=search_term)),
+            Scenario('customer_search_phone', _changelist('customers', 'customer', q=customer.n8_phone or customer.name)),
+            Scenario('customer_change', reverse('admin:customers_customer_change', args=[customer.pk])),
+        ]
+        if account:
+            scenarios.append(Scenario(
+                'customer_search_account',
+                _changelist('customers', 'customer', q=f'帳號:{account.bank_code}-{account.account_number}'),
+            ))
+    if record:
+        scenarios += [
+            Scenario('kyc_changelist', _changelist('kyc', 'kycrecord')),
+            Scenario('kyc_changelist_middle_page', _changelist('kyc', 'kycrecord', p=_middle_page(KYCRecord, 25))),
+            Scenario('kyc_search_name', _changelist('kyc', 'kycrecord', q=record.customer.name[:3])),
+            Scenario('kyc_search_account', _changelist('kyc', 'kycrecord', q=record.verification_account or record.customer.name)),
+            Scenario('kyc_change', reverse('admin:kyc_kycrecord_change', args=[record.pk])),
+        ]
+    if transaction:
+        scenarios += [
+            Scenario('transaction_changelist', _changelist('transactions', 'transaction')),
+            Scenario('transaction_changelist_middle_page', _changelist('transactions', 'transaction', p=_middle_page(Transaction))),
+            Scenario('transaction_filter_type', _changelist('transactions', 'transaction', transaction_type='buy')),
+            Scenario('transaction_search_name', _changelist('transactions', 'transaction', q=transaction.customer.name[:3])),
+            Scenario('transaction_change', reverse('admin:transactions_transaction_change', args=[transaction.pk])),
+        ]
+
+    media_url = reverse('serve_secure_media', kwargs={'path': ''})
+    for extension in ('.jpg', '.mp4'):
+        media = records.filter(file__endswith=extension).values_list('file', flat=True).first()
+        if not media:
+            continue
+        kind = 'image' if extension == '.jpg' else 'video'
+        scenarios.append(Scenario(f'media_download_{kind}', media_url + media))
+        if kind == 'video':
+            scenarios.append(Scenario(
+                'media_range_video',
+                media_url + media,
+                headers={'HTTP_RANGE': f'bytes=0-{video_range_bytes - 1}'},
+                expected_status=206,
+            ))
+    return scenarios
+
+
+@contextmanager
+def capture_all_queries():
+    """同時擷取所有資料庫連線（含讀取副本）的查詢"""
+    with ExitStack() as stack:
+        yield [stack.enter_context(CaptureQueriesContext(connection)) for connection in connections.all()]
+
+
+def _consume(response):
+    """讀完回應內容（串流回應需要逐塊讀取），回傳位元組數"""
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    response.close()
+    return size
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round((len(ordered) - 1) * pct / 100)))
+    return ordered[index]
+
+
+def run_scenario(client, scenario, repeat=20, warmup=2):
+    """
+    量測單一情境：先暖機，再重複請求計算延遲分布與查詢數
+    記憶體峰值另外以 tracemalloc 量測一次（tracemalloc 本身會拖慢請求，不計入延遲）
+    """
+    def request():
+        return client.get(scenario.url, secure=True, **scenario.headers)
+
+    for _ in range(warmup):
+        _consume(request())
+
+    latencies, query_counts = [], []
+    status = size = None
+    for _ in range(repeat):
+        with capture_all_queries() as contexts:
+            started = time.perf_counter()
+            response = request()
+            size = _consume(response)
+            latencies.append((time.perf_counter() - started) * 1000)
+        query_counts.append(sum(len(context.captured_queries) for context in contexts))
+        status = response.status_code
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        _consume(request())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'url': scenario.url,
+        'status': status,
+        'ok': status == scenario.expected_status,
+        'bytes': size,
+        'latency_ms': {
+            'min': round(min(latencies), 2),
+            'mean': round(statistics.fmean(latencies), 2),
+            'p50': round(statistics.median(latencies), 2),
+            'p95': round(_percentile(latencies, 95), 2),
+            'max': round(max(latencies), 2),
+        },
+        'queries': int(statistics.median(query_counts)),
+        'queries_max': max(query_counts),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def _git_revision():
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return revision, dirty
+
+
+def environment_info():
+    """結果檔的環境資訊：commit、資料量與影響效能的設定"""
+    from customers.models import Customer
+    from kyc.models import KYCRecord
+    from transactions.models import Transaction
+
+    revision, dirty = _git_revision()
+    return {
+        'git_commit': revision,
+        'git_dirty': dirty,
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connections['default'].vendor,
+        'replica': 'replica' in settings.DATABASES,
+        'media_storage': settings.MEDIA_STORAGE,
+        'media_encrypted': bool(settings.MEDIA_ENCRYPTION_KEYS),
+        'media_async_streaming': settings.MEDIA_ASYNC_STREAMING,
+        'rows': {
+            'customers': Customer.objects.count(),
+            'kyc_records': KYCRecord.objects.count(),
+            'transactions': Transaction.objects.count(),
+        },
+    }
+
+
+def compare_results(baseline, current, threshold=1.25):
+    """
+    比較兩份結果，回傳 [(情境, 指標, 舊值, 新值, 是否退步)]
+    延遲以 p50 比較，超過 threshold 倍視為退步；查詢數增加一律視為退步
+    """
+    rows = []
+    for name, result in current['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        old, new = previous['latency_ms']['p50'], result['latency_ms']['p50']
+        rows.append((name, 'p50_ms', old, new, old > 0 and new / old > threshold))
+        old, new = previous['queries'], result['queries']
+        rows.append((name, 'queries', old, new, new > old))
+        old, new = previous['peak_memory_kb'], result['peak_memory_kb']
+        rows.append((name, 'peak_memory_kb', old, new, old > 0 and new / old > threshold))
+    return rows
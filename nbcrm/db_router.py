@@ -0,0 +1,76 @@
+"""
+資料庫讀寫分離路由
+列表頁、搜尋、報表與匯出的讀取走讀取副本（replica），
+寫入一律走主資料庫，且同一個請求中寫入後的讀取也固定回主資料庫
+"""
+
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+
+PRIMARY_DB_ALIAS = 'default'
+REPLICA_DB_ALIAS = 'replica'
+
+# 可以讀取副本的 app（sessions、auth 等登入相關資料一律讀主資料庫）
+REPLICA_APP_LABELS = {'customers', 'kyc', 'transactions'}
+
+_state = Local()
+
+
+def replica_configured():
+    """是否有設定讀取副本"""
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def reset_routing_state():
+    """每個請求開始與結束時重設路由狀態"""
+    _state.use_replica = False
+    _state.pinned = False
+
+
+def route_reads_to_replica():
+    """本次請求的讀取改走讀取副本（尚未寫入前）"""
+    _state.use_replica = True
+
+
+def pin_to_primary():
+    """本次請求之後的讀取都固定走主資料庫（寫入後讀取）"""
+    _state.pinned = True
+
+
+@contextmanager
+def replica_reads():
+    """區塊內的讀取改走讀取副本，用於報表和匯出"""
+    previous = getattr(_state, 'use_replica', False)
+    _state.use_replica = True
+    try:
+        yield
+    finally:
+        _state.use_replica = previous
+
+
+class PrimaryReplicaRouter:
+    """主資料庫 / 讀取副本路由"""
+
+    def db_for_read(self, model, **hints):
+        if (
+            model._meta.app_label in REPLICA_APP_LABELS
+            and replica_configured()
+            and getattr(_state, 'use_replica', False)
+            and not getattr(_state, 'pinned', False)
+        ):
+            return REPLICA_DB_ALIAS
+        return PRIMARY_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return PRIMARY_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 副本是主資料庫的複本，兩邊的物件可以互相關聯
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的結構由資料庫複寫（或 sync_sqlite_replica）同步，不直接 migrate
+        return db == PRIMARY_DB_ALIAS
@@ -0,0 +1,93 @@
+"""
+Admin 列表頁、編輯頁、搜尋與媒體下載的效能基準測試
+用法: python manage.py benchmark_admin [--repeat 20] [--output bench.json] [--compare baseline.json]
+先以 generate_benchmark_data 產生資料；建議使用獨立的資料庫（DATABASE_URL）
+"""
+
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from nbcrm.benchmark import build_scenarios, compare_results, environment_info, run_scenario
+
+
+class Command(BaseCommand):
+    help = '量測 Admin 熱門路徑的延遲、查詢數與記憶體，輸出 JSON 以比較不同 commit'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='以此帳號登入（預設為第一個超級使用者）')
+        parser.add_argument('--repeat', type=int, default=20, help='每個情境的量測次數')
+        parser.add_argument('--warmup', type=int, default=2, help='每個情境的暖機次數')
+        parser.add_argument('--only', help='只執行指定的情境（逗號分隔，可用前綴，例如 customer_,media_）')
+        parser.add_argument('--output', help='將結果寫入 JSON 檔案')
+        parser.add_argument('--json', action='store_true', help='以 JSON 輸出結果')
+        parser.add_argument('--compare', help='與先前的結果 JSON 比較')
+        parser.add_argument('--threshold', type=float, default=1.25, help='延遲或記憶體超過此倍數視為退步')
+        parser.add_argument('--fail-on-regression', action='store_true', help='有退步時以錯誤結束（CI 用）')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(is_active=True)
+        if options['username']:
+            user = users.filter(username=options['username']).first()
+        else:
+            user = users.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('找不到可登入的使用者，請先建立超級使用者或指定 --username')
+
+        scenarios = build_scenarios()
+        if options['only']:
+            prefixes = tuple(name.strip() for name in options['only'].split(',') if name.strip())
+            scenarios = [scenario for scenario in scenarios if scenario.name.startswith(prefixes)]
+        if not scenarios:
+            raise CommandError('沒有可執行的情境，請先執行 generate_benchmark_data')
+
+        # 伺服器錯誤記錄為 HTTP 500，不中斷其他情境
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for scenario in scenarios:
+                result = run_scenario(client, scenario, repeat=options['repeat'], warmup=options['warmup'])
+                results[scenario.name] = result
+                if not options['json']:
+                    latency = result['latency_ms']
+                    self.stdout.write(
+                        f"{scenario.name:<36} p50 {latency['p50']:8.1f}ms  p95 {latency['p95']:8.1f}ms  "
+                        f"查詢 {result['queries']:4d}  記憶體 {result['peak_memory_kb']:9.0f}KB"
+                        + ('' if result['ok'] else self.style.ERROR(f"  HTTP {result['status']}"))
+                    )
+
+        report = {
+            'meta': {**environment_info(), 'user': user.username, 'repeat': options['repeat'], 'warmup': options['warmup']},
+            'scenarios': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+
+        failed = [name for name, result in results.items() if not result['ok']]
+        regressions = self._compare(options, report) if options['compare'] else []
+        if failed:
+            raise CommandError(f"情境回應狀態異常: {', '.join(failed)}")
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"效能退步: {', '.join(regressions)}")
+
+    def _compare(self, options, report):
+        with open(options['compare'], encoding='utf-8') as file:
+            baseline = json.load(file)
+        rows = compare_results(baseline, report, threshold=options['threshold'])
+        if not options['json']:
+            self.stdout.write('')
+            self.stdout.write(
+                f"與 {baseline['meta'].get('git_commit') or options['compare']} 比較"
+                f"（門檻 {options['threshold']}x）:"
+            )
+            for name, metric, old, new, regressed in rows:
+                line = f'{name:<36} {metric:<15} {old:>10} -> {new:<10}'
+                self.stdout.write(self.style.ERROR(line + '  退步') if regressed else line)
+        return sorted({f'{name}.{metric}' for name, metric, _, _, regressed in rows if regressed})
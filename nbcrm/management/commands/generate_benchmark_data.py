@@ -0,0 +1,62 @@
+"""
+產生效能基準測試用的大量資料（客戶、KYC 記錄、驗證帳戶、交易）
+用法: python manage.py generate_benchmark_data [--customers 100000] [--kyc-per-customer 2] [--transactions-per-customer 10]
+清除: python manage.py generate_benchmark_data --purge
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nbcrm.benchmark import generate_benchmark_data, purge_benchmark_data
+
+
+class Command(BaseCommand):
+    help = '產生壓測資料（客戶信箱為 @benchmark.invalid，可用 --purge 清除）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=100000, help='客戶數')
+        parser.add_argument('--kyc-per-customer', type=int, default=2, help='每位客戶的 KYC 記錄數')
+        parser.add_argument('--transactions-per-customer', type=int, default=10, help='每位客戶的交易數')
+        parser.add_argument('--days', type=int, default=730, help='資料時間分布的天數')
+        parser.add_argument('--batch-size', type=int, default=2000, help='每批寫入的客戶數')
+        parser.add_argument('--seed', type=int, default=42, help='亂數種子（相同參數產生相同資料）')
+        parser.add_argument('--video-mb', type=int, default=8, help='樣本影片檔大小（MB）')
+        parser.add_argument('--purge', action='store_true', help='刪除所有壓測資料後結束')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['purge']:
+            deleted = purge_benchmark_data(
+                progress=lambda count: self.stdout.write(f'已刪除 {count} 位客戶', ending='\r')
+            )
+            self.stdout.write(self.style.SUCCESS(f'已刪除 {deleted} 位壓測客戶（{time.monotonic() - started:.0f} 秒）'))
+            return
+
+        if options['customers'] <= 0 or options['batch_size'] <= 0:
+            raise CommandError('--customers 與 --batch-size 必須大於 0')
+
+        def progress(counts):
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"客戶 {counts['customers']}/{options['customers']}，交易 {counts['transactions']}"
+                f"（{counts['customers'] / elapsed:.0f} 客戶/秒）",
+                ending='\r',
+            )
+
+        counts = generate_benchmark_data(
+            options['customers'],
+            kyc_per_customer=options['kyc_per_customer'],
+            transactions_per_customer=options['transactions_per_customer'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            days=options['days'],
+            video_mb=options['video_mb'],
+            progress=progress,
+        )
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"已建立 {counts['customers']} 位客戶、{counts['kyc_records']} 筆 KYC 記錄、"
+            f"{counts['verified_accounts']} 筆驗證帳戶、{counts['transactions']} 筆交易"
+            f"（{time.monotonic() - started:.0f} 秒）"
+        ))
@@ -0,0 +1,40 @@
+"""
+本機讀取副本替身：把主 SQLite 檔案複製到副本 SQLite 檔案
+模擬 Postgres 的串流複寫，用於本機開發與測試讀寫分離
+"""
+
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from nbcrm.db_router import PRIMARY_DB_ALIAS, REPLICA_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = '將主 SQLite 資料庫同步到讀取副本 SQLite 檔案（本機替身）'
+
+    def handle(self, *args, **options):
+        if REPLICA_DB_ALIAS not in settings.DATABASES:
+            raise CommandError('未設定 REPLICA_DATABASE_URL，沒有讀取副本可以同步')
+
+        primary = settings.DATABASES[PRIMARY_DB_ALIAS]
+        replica = settings.DATABASES[REPLICA_DB_ALIAS]
+        for db in (primary, replica):
+            if db['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError('只有兩個資料庫都是 SQLite 時才能使用此指令')
+        if str(primary['NAME']) == str(replica['NAME']):
+            raise CommandError('主資料庫和讀取副本指向同一個檔案')
+
+        # 使用 SQLite 線上備份 API，主資料庫使用中也能取得一致的快照
+        source = sqlite3.connect(str(primary['NAME']))
+        target = sqlite3.connect(str(replica['NAME']))
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"已同步 {primary['NAME']} -> {replica['NAME']}"
+        ))
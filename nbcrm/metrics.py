@@ -0,0 +1,138 @@
+"""
+Prometheus 指標
+單一行程時使用 prometheus_client 的預設 registry；gunicorn 多個 worker 時設定 PROMETHEUS_MULTIPROC_DIR，
+各 worker 將數值寫入該目錄，/metrics 讀取時再彙總（gunicorn.conf.py 負責清理目錄與標記結束的 worker）
+未安裝 prometheus_client 或 METRICS_ENABLED 關閉時，所有記錄函式都不做事
+"""
+
+import os
+import time
+
+from django.conf import settings
+
+try:
+    # 選用：安裝 prometheus-client 後才會收集指標
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+        multiprocess,
+    )
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+else:
+    PROMETHEUS_AVAILABLE = True
+
+# Admin 頁面與媒體首位元組的延遲分布（秒）
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1, 5)
+
+
+class _NoopMetric:
+    """未安裝 prometheus_client 時的替代物件"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def observe(self, amount):
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # 多行程模式下建立指標時就會寫入檔案，目錄必須先存在（manage.py、run_worker 也會載入此模組）
+        os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+    REQUEST_LATENCY = Histogram(
+        'nbcrm_http_request_duration_seconds', '請求處理時間（至回應產生，不含串流傳輸）',
+        ['view', 'method', 'status'], buckets=LATENCY_BUCKETS,
+    )
+    REQUESTS_IN_PROGRESS = Gauge(
+        'nbcrm_http_requests_in_progress', '處理中的請求數', multiprocess_mode='livesum',
+    )
+    MEDIA_REQUESTS = Counter('nbcrm_media_requests_total', '媒體文件請求數', ['outcome'])
+    MEDIA_BYTES = Counter('nbcrm_media_bytes_served_total', '媒體文件回應的位元組數（Content-Length）', ['source', 'status'])
+    KYC_UPLOADS = Counter('nbcrm_kyc_uploads_total', 'KYC 檔案上傳數（新增或更換檔案）', ['agent', 'kind'])
+    TRANSACTIONS_CREATED = Counter('nbcrm_transactions_created_total', '新增的交易數', ['agent', 'transaction_type'])
+    DB_QUERY_LATENCY = Histogram(
+        'nbcrm_db_query_duration_seconds', '請求中的 SQL 執行時間', ['database'], buckets=QUERY_BUCKETS,
+    )
+    DB_CONNECTIONS_OPENED = Counter('nbcrm_db_connections_opened_total', '建立的資料庫連線數', ['database'])
+else:
+    REQUEST_LATENCY = REQUESTS_IN_PROGRESS = MEDIA_REQUESTS = MEDIA_BYTES = _NoopMetric()
+    KYC_UPLOADS = TRANSACTIONS_CREATED = DB_QUERY_LATENCY = DB_CONNECTIONS_OPENED = _NoopMetric()
+
+
+def metrics_enabled():
+    return PROMETHEUS_AVAILABLE and settings.METRICS_ENABLED
+
+
+def record_media_request(outcome):
+    if metrics_enabled():
+        MEDIA_REQUESTS.labels(outcome=outcome).inc()
+
+
+def record_media_bytes(length, status, source='storage'):
+    """source: storage（預設儲存）或 cold（冷儲存解壓的快取）"""
+    if metrics_enabled():
+        MEDIA_BYTES.labels(source=source, status=str(status)).inc(length)
+
+
+def record_kyc_upload(record, user):
+    if metrics_enabled():
+        if record.is_image():
+            kind = 'image'
+        elif record.is_video():
+            kind = 'video'
+        else:
+            kind = 'other'
+        KYC_UPLOADS.labels(agent=user.get_username(), kind=kind).inc()
+
+
+def record_transaction_created(transaction):
+    if metrics_enabled():
+        TRANSACTIONS_CREATED.labels(
+            agent=transaction.cs_user.get_username(), transaction_type=transaction.transaction_type
+        ).inc()
+
+
+def record_connection_created(sender, connection, **kwargs):
+    """connection_created 訊號的接收函式"""
+    if metrics_enabled():
+        DB_CONNECTIONS_OPENED.labels(database=connection.alias).inc()
+
+
+class QueryTimer:
+    """掛在資料庫連線上的 execute_wrapper，記錄每個查詢的執行時間"""
+
+    def __init__(self, alias):
+        self.histogram = DB_QUERY_LATENCY.labels(database=alias)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.histogram.observe(time.perf_counter() - started)
+
+
+def multiprocess_mode():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def render_metrics():
+    """回傳 (內容, Content-Type)；多行程模式下彙總所有 worker 的數值"""
+    if multiprocess_mode():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        from prometheus_client import REGISTRY as registry
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,270 @@
+"""
+專案共用的中介軟體
+皆繼承 MiddlewareMixin，同時支援 WSGI 與 ASGI
+"""
+
+import cProfile
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+
+from .db_router import replica_configured, reset_routing_state, route_reads_to_replica
+from .metrics import REQUEST_LATENCY, REQUESTS_IN_PROGRESS, QueryTimer, metrics_enabled
+
+# 以 admin 的 URL 名稱判斷是否為讀取為主的頁面（列表頁、自動完成搜尋）
+REPLICA_URL_NAME_SUFFIXES = ('_changelist', 'autocomplete')
+
+perf_logger = logging.getLogger('nbcrm.perf')
+
+# 查詢指紋：IN (%s, %s, ...) 視為相同，數字與字串常值以 ? 取代
+_IN_LIST_RE = re.compile(r'\bIN \((?:%s|\?)(?:, ?(?:%s|\?))*\)', re.IGNORECASE)
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+# 日誌中省略 SELECT 的欄位清單，保留 FROM / WHERE 方便辨識
+_SELECT_LIST_RE = re.compile(r'^SELECT .*? FROM ', re.DOTALL)
+# 日誌中每筆重複查詢保留的 SQL 長度
+FINGERPRINT_SQL_LENGTH = 200
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """GET 的列表頁、搜尋頁讀取走讀取副本；寫入後的讀取由路由器固定回主資料庫"""
+
+    def process_request(self, request):
+        reset_routing_state()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not replica_configured() or request.method not in ('GET', 'HEAD'):
+            return None
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        if url_name and url_name.endswith(REPLICA_URL_NAME_SUFFIXES):
+            route_reads_to_replica()
+        return None
+
+    def process_response(self, request, response):
+        reset_routing_state()
+        return response
+
+
+def query_fingerprint(sql):
+    """將 SQL 正規化為指紋，參數不同但結構相同的查詢（例如 N+1）會得到相同指紋"""
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _LITERAL_RE.sub('?', sql)
+    return ' '.join(sql.split())
+
+
+class QueryMetrics:
+    """
+    單一請求的 SQL 統計，以 connection.execute_wrapper 掛在所有資料庫連線上
+    只保留每個指紋的次數與累計時間，不保存參數
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = defaultdict(lambda: [0, 0.0])
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            entry = self.fingerprints[query_fingerprint(sql)]
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def duplicates(self, threshold):
+        """執行次數達 threshold 的指紋，依次數由多到少"""
+        rows = [
+            {
+                'fingerprint': hashlib.sha1(fingerprint.encode()).hexdigest()[:12],
+                'sql': _SELECT_LIST_RE.sub('SELECT ... FROM ', fingerprint)[:FINGERPRINT_SQL_LENGTH],
+                'count': count,
+                'ms': round(duration * 1000, 2),
+            }
+            for fingerprint, (count, duration) in self.fingerprints.items()
+            if count >= threshold
+        ]
+        rows.sort(key=lambda row: row['count'], reverse=True)
+        return rows
+
+
+class QueryMetricsMiddleware(MiddlewareMixin):
+    """
+    記錄每個請求的 SQL 查詢數、資料庫時間、重複查詢（N+1）與 view 時間
+    以 Server-Timing 標頭（僅限 staff）與 nbcrm.perf 日誌輸出
+    依 PERF_SAMPLE_RATE 抽樣；未抽中的請求只計時，超過 PERF_SLOW_REQUEST_MS 時仍會記錄
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERF_METRICS:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        request._perf_started = time.perf_counter()
+        request._perf_view_started = None
+        request._perf_metrics = None
+        if random.random() < settings.PERF_SAMPLE_RATE:
+            metrics = QueryMetrics()
+            for connection in connections.all():
+                connection.execute_wrappers.append(metrics)
+            request._perf_metrics = metrics
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._perf_view_started = time.perf_counter()
+
+    def process_response(self, request, response):
+        started = getattr(request, '_perf_started', None)
+        if started is None:
+            return response
+        finished = time.perf_counter()
+        metrics = request._perf_metrics
+        if metrics is not None:
+            for connection in connections.all():
+                if metrics in connection.execute_wrappers:
+                    connection.execute_wrappers.remove(metrics)
+
+        total_ms = (finished - started) * 1000
+        view_ms = (finished - request._perf_view_started) * 1000 if request._perf_view_started else None
+        slow = total_ms >= settings.PERF_SLOW_REQUEST_MS
+        if metrics is None and not slow:
+            return response
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        user = getattr(request, 'user', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': resolver_match.view_name if resolver_match else None,
+            'status': response.status_code,
+            'user_id': user.pk if user is not None and user.is_authenticated else None,
+            'total_ms': round(total_ms, 2),
+            'view_ms': round(view_ms, 2) if view_ms is not None else None,
+            'sampled': metrics is not None,
+        }
+        if metrics is not None:
+            duplicates = metrics.duplicates(settings.PERF_DUPLICATE_QUERY_THRESHOLD)
+            record.update({
+                'queries': metrics.count,
+                'db_ms': round(metrics.duration * 1000, 2),
+                'duplicate_queries': sum(row['count'] for row in duplicates),
+                'duplicates': duplicates[:5],
+            })
+        level = logging.WARNING if slow or record.get('duplicates') else logging.INFO
+        perf_logger.log(level, json.dumps(record, ensure_ascii=False))
+
+        if settings.PERF_SERVER_TIMING and user is not None and user.is_authenticated and user.is_staff:
+            response['Server-Timing'] = self.server_timing(record)
+        return response
+
+    @staticmethod
+    def server_timing(record):
+        """瀏覽器開發者工具的 Network > Timing 會顯示這些項目"""
+        metrics = [f"total;dur={record['total_ms']}"]
+        if record['view_ms'] is not None:
+            metrics.append(f"view;dur={record['view_ms']}")
+        if record['sampled']:
+            metrics.append(f"db;dur={record['db_ms']};desc=\"{record['queries']} queries\"")
+            if record['duplicate_queries']:
+                metrics.append(f"dup;desc=\"{record['duplicate_queries']} duplicate queries\"")
+        return ', '.join(metrics)
+
+
+class PrometheusMetricsMiddleware(MiddlewareMixin):
+    """
+    記錄各 view 的延遲分布與處理中的請求數，並計時請求中的每個 SQL 查詢
+    METRICS_ENABLED 關閉或未安裝 prometheus_client 時不啟用
+    """
+
+    def __init__(self, get_response):
+        if not metrics_enabled():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        REQUESTS_IN_PROGRESS.inc()
+        request._metrics_started = time.perf_counter()
+        request._metrics_timers = []
+        for connection in connections.all():
+            timer = QueryTimer(connection.alias)
+            connection.execute_wrappers.append(timer)
+            request._metrics_timers.append((connection, timer))
+
+    def process_response(self, request, response):
+        started = getattr(request, '_metrics_started', None)
+        if started is None:
+            return response
+        for connection, timer in request._metrics_timers:
+            if timer in connection.execute_wrappers:
+                connection.execute_wrappers.remove(timer)
+        REQUESTS_IN_PROGRESS.dec()
+        # 以 URL 名稱作為標籤，避免路徑中的 ID 造成標籤數量爆增
+        resolver_match = getattr(request, 'resolver_match', None)
+        REQUEST_LATENCY.labels(
+            view=resolver_match.view_name if resolver_match else 'unresolved',
+            method=request.method,
+            status=f'{response.status_code // 100}xx',
+        ).observe(time.perf_counter() - started)
+        return response
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """
+    剖析慢請求：超過 PROFILING_THRESHOLD_MS 的請求保存統計取樣的呼叫堆疊
+    staff 在網址加上 PROFILING_QUERY_PARAM（例如 ?_profile=1）時，該請求改以 cProfile 完整剖析並一律保存
+    剖析檔列於 /admin/profiles/（僅限超級使用者）
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        from .profiling import sampler
+
+        request._profiling_started = time.perf_counter()
+        request._profiler = None
+        request._profiling_thread = None
+        if settings.PROFILING_QUERY_PARAM in request.GET and request.user.is_authenticated and request.user.is_staff:
+            # 移除參數，避免 admin 列表頁把它當成篩選條件
+            request.GET = request.GET.copy()
+            del request.GET[settings.PROFILING_QUERY_PARAM]
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # 同一執行緒已有其他剖析器（例如開發時的 debug 工具）
+                return
+            request._profiler = profiler
+        elif settings.PROFILING_THRESHOLD_MS > 0:
+            request._profiling_thread = threading.get_ident()
+            sampler.start(request._profiling_thread)
+
+    def process_response(self, request, response):
+        from .profiling import sampler, save_profile, write_folded
+
+        started = getattr(request, '_profiling_started', None)
+        if started is None:
+            return response
+        duration_ms = (time.perf_counter() - started) * 1000
+        if request._profiler is not None:
+            request._profiler.disable()
+            save_profile(request.method, request.path, duration_ms, 'prof', request._profiler.dump_stats)
+        elif request._profiling_thread is not None:
+            samples = sampler.stop(request._profiling_thread)
+            if samples and duration_ms >= settings.PROFILING_THRESHOLD_MS:
+                save_profile(request.method, request.path, duration_ms, 'folded', write_folded(samples))
+        return response
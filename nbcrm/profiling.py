@@ -0,0 +1,178 @@
+"""
+慢請求的效能剖析
+超過 PROFILING_THRESHOLD_MS 的請求以統計取樣（定時擷取請求執行緒的呼叫堆疊）保存為 folded stacks，
+可用 speedscope / flamegraph.pl 開啟；staff 在網址加上 PROFILING_QUERY_PARAM 時改用 cProfile 完整剖析
+剖析檔存於 PROFILING_DIR，超過 PROFILING_MAX_FILES 時刪除最舊的檔案
+"""
+
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+
+logger = logging.getLogger('nbcrm.perf')
+
+# 檔名：時間_方法_路徑_耗時ms.副檔名，列表頁從檔名解析資訊
+PROFILE_NAME_RE = re.compile(
+    r'^(?P<timestamp>\d{8}T\d{6}_\d{6})_(?P<method>[A-Z]+)_(?P<path>[\w.+-]*)_(?P<ms>\d+)ms\.(?P<kind>prof|folded)$'
+)
+# 單一堆疊保留的最大深度
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    filename = code.co_filename
+    for prefix in (str(settings.BASE_DIR) + os.sep, *(path + os.sep for path in sys.path if path)):
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):]
+            break
+    # folded 格式以 ; 分隔堆疊、以空白分隔次數，標籤中不能出現這兩個字元
+    return f'{code.co_name}({filename}:{code.co_firstlineno})'.replace(';', ':').replace(' ', '_')
+
+
+def stack_key(frame):
+    """由外到內的呼叫堆疊"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class StackSampler:
+    """
+    單一背景執行緒定時擷取已登記執行緒的呼叫堆疊
+    每個請求只在開始與結束時登記，不論同時有多少請求，額外負擔都是一個執行緒
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self, thread_id):
+        self._ensure_started()
+        with self._lock:
+            self.active[thread_id] = Counter()
+
+    def stop(self, thread_id):
+        """停止取樣，回傳 Counter({堆疊: 取樣次數})"""
+        with self._lock:
+            return self.active.pop(thread_id, Counter())
+
+    def _ensure_started(self):
+        # gunicorn preload 後會 fork，每個 worker 程序都需要自己的取樣執行緒
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self.active:
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self.active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[stack_key(frame)] += 1
+
+
+sampler = StackSampler(settings.PROFILING_SAMPLE_INTERVAL_MS / 1000)
+
+
+def profile_dir():
+    return str(settings.PROFILING_DIR)
+
+
+def profile_filename(method, path, duration_ms, kind):
+    # 路徑的 / 以 + 表示，其他特殊字元以 - 取代
+    slug = re.sub(r'[^\w.+-]+', '-', path.strip('/').replace('+', '-').replace('/', '+'))[:80]
+    timestamp = datetime.now().strftime('%Y%m%dT%H%M%S_%f')
+    return f'{timestamp}_{method}_{slug}_{int(duration_ms)}ms.{kind}'
+
+
+def rotate_profiles():
+    """只保留最新的 PROFILING_MAX_FILES 個剖析檔"""
+    names = sorted(name for name in os.listdir(profile_dir()) if PROFILE_NAME_RE.match(name))
+    for name in names[:max(len(names) - settings.PROFILING_MAX_FILES, 0)]:
+        try:
+            os.remove(os.path.join(profile_dir(), name))
+        except FileNotFoundError:
+            pass
+
+
+def save_profile(method, path, duration_ms, kind, write):
+    """以 write(file_path) 寫入剖析檔後輪替，回傳檔名；寫入失敗只記錄日誌，不影響請求"""
+    name = profile_filename(method, path, duration_ms, kind)
+    try:
+        os.makedirs(profile_dir(), exist_ok=True)
+        write(os.path.join(profile_dir(), name))
+        rotate_profiles()
+    except OSError:
+        logger.exception('無法保存剖析檔 %s', name)
+        return None
+    logger.warning('已保存剖析檔 %s（%s %s，%.0f ms）', name, method, path, duration_ms)
+    return name
+
+
+def write_folded(samples):
+    def write(file_path):
+        with open(file_path, 'w', encoding='utf-8') as file:
+            for stack, count in samples.most_common():
+                file.write(f'{stack} {count}\n')
+    return write
+
+
+def list_profiles():
+    """由新到舊列出剖析檔資訊"""
+    try:
+        names = os.listdir(profile_dir())
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        match = PROFILE_NAME_RE.match(name)
+        if not match:
+            continue
+        file_path = os.path.join(profile_dir(), name)
+        try:
+            size = os.path.getsize(file_path)
+        except FileNotFoundError:
+            continue
+        profiles.append({
+            'name': name,
+            'created_at': datetime.strptime(match['timestamp'], '%Y%m%dT%H%M%S_%f'),
+            'method': match['method'],
+            'path': '/' + match['path'].replace('+', '/'),
+            'duration_ms': int(match['ms']),
+            'kind': 'cProfile' if match['kind'] == 'prof' else '取樣',
+            'size': size,
+        })
+    profiles.sort(key=lambda profile: profile['name'], reverse=True)
+    return profiles
+
+
+def profile_path(name):
+    """下載用：檔名不符合格式（含路徑）時拋出 FileNotFoundError"""
+    if not PROFILE_NAME_RE.match(name):
+        raise FileNotFoundError(name)
+    file_path = os.path.join(profile_dir(), name)
+    if not os.path.isfile(file_path):
+        raise FileNotFoundError(name)
+    return file_path
@@ -1,7 +1,9 @@
 from pathlib import Path
 from decouple import config
 import dj_database_url
+import json
 import os
+import tempfile
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -20,15 +22,22 @@ INSTALLED_APPS = [
     'customers',
     'kyc',
     'transactions',
+    'audit',
+    'jobs',
+    'nbcrm',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'nbcrm.middleware.PrometheusMetricsMiddleware',
+    'nbcrm.middleware.QueryMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'nbcrm.middleware.ProfilingMiddleware',
+    'nbcrm.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -52,6 +61,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'nbcrm.wsgi.application'
+ASGI_APPLICATION = 'nbcrm.asgi.application'
 
 DATABASES = {
     'default': dj_database_url.config(
@@ -59,6 +69,17 @@ DATABASES = {
     )
 }
 
+# 讀取副本（選填）：列表頁、搜尋、報表與匯出的讀取改走副本
+# 本機可用兩個 SQLite 檔案替代：REPLICA_DATABASE_URL=sqlite:///db_replica.sqlite3
+# 再以 python manage.py sync_sqlite_replica 同步
+REPLICA_DATABASE_URL = config('REPLICA_DATABASE_URL', default='')
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = dj_database_url.parse(REPLICA_DATABASE_URL)
+    # 測試時副本直接指向主測試資料庫
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['nbcrm.db_router.PrimaryReplicaRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -83,7 +104,7 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # 媒體文件設定 - Render Disk 持久化存儲
 if not DEBUG:
     # 生產環境：使用 Render Disk 掛載的目錄
-    MEDIA_ROOT = '/opt/render/project/media'
+    MEDIA_ROOT = config('MEDIA_ROOT', default='/opt/render/project/media')
     # 確保媒體目錄存在
     os.makedirs(MEDIA_ROOT, exist_ok=True)
 else:
@@ -93,6 +114,54 @@ else:
 
 MEDIA_URL = '/media/'
 
+# 媒體儲存後端：local（MEDIA_ROOT）或 s3（S3 相容物件儲存，可多台 web 共用）
+MEDIA_STORAGE = config('MEDIA_STORAGE', default='local')
+# 通過權限檢查後改以短效的預簽章網址讓瀏覽器直接向物件儲存下載（僅 s3）
+MEDIA_PRESIGNED_REDIRECT = config('MEDIA_PRESIGNED_REDIRECT', default=False, cast=bool)
+MEDIA_PRESIGNED_EXPIRE = config('MEDIA_PRESIGNED_EXPIRE', default=60, cast=int)
+
+# 媒體檔案加密（AES-256-GCM 分塊）：設定金鑰後新上傳的檔案加密存放，未加密的舊檔案仍可讀取
+# 格式為「編號:base64(32 bytes)」，以逗號分隔，第一把用於加密，其餘用於解密舊檔（金鑰輪替）
+MEDIA_ENCRYPTION_KEYS = config('MEDIA_ENCRYPTION_KEYS', default='')
+MEDIA_ENCRYPTION_FRAME_SIZE = config('MEDIA_ENCRYPTION_FRAME_SIZE', default=64 * 1024, cast=int)
+
+if MEDIA_STORAGE == 's3':
+    from boto3.s3.transfer import TransferConfig
+
+    MEDIA_S3_ENDPOINT_URL = config('MEDIA_S3_ENDPOINT_URL', default=None)  # MinIO 等 S3 相容服務
+    DEFAULT_STORAGE = {
+        'BACKEND': (
+            'nbcrm.storage_backends.EncryptedS3Storage' if MEDIA_ENCRYPTION_KEYS
+            else 'storages.backends.s3.S3Storage'
+        ),
+        'OPTIONS': {
+            'bucket_name': config('MEDIA_S3_BUCKET'),
+            'endpoint_url': MEDIA_S3_ENDPOINT_URL,
+            'region_name': config('MEDIA_S3_REGION', default=None),
+            'access_key': config('MEDIA_S3_ACCESS_KEY_ID', default=None),
+            'secret_key': config('MEDIA_S3_SECRET_ACCESS_KEY', default=None),
+            'location': config('MEDIA_S3_PREFIX', default=''),
+            'addressing_style': 'path' if MEDIA_S3_ENDPOINT_URL else None,
+            'file_overwrite': False,
+            'querystring_auth': True,
+            'querystring_expire': MEDIA_PRESIGNED_EXPIRE,
+            # 大檔案分段平行上傳
+            'transfer_config': TransferConfig(
+                multipart_threshold=config('MEDIA_S3_MULTIPART_THRESHOLD_MB', default=16, cast=int) * 1024 * 1024,
+                multipart_chunksize=config('MEDIA_S3_MULTIPART_CHUNK_MB', default=8, cast=int) * 1024 * 1024,
+                max_concurrency=config('MEDIA_S3_MAX_CONCURRENCY', default=8, cast=int),
+                use_threads=True,
+            ),
+        },
+    }
+else:
+    DEFAULT_STORAGE = {
+        'BACKEND': (
+            'nbcrm.storage_backends.EncryptedFileSystemStorage' if MEDIA_ENCRYPTION_KEYS
+            else 'django.core.files.storage.FileSystemStorage'
+        ),
+    }
+
 # Admin 設定
 AUTH_USER_MODEL = 'accounts.User'
 LOGIN_URL = '/admin/login/'
@@ -104,6 +173,68 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 FILE_UPLOAD_MAX_MEMORY_SIZE = 100 * 1024 * 1024  # 100MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 100 * 1024 * 1024  # 100MB
 
+# KYC 圖片上傳後正規化：轉正、移除 EXIF/GPS、限制解析度並重新壓縮
+KYC_IMAGE_NORMALIZE = config('KYC_IMAGE_NORMALIZE', default=True, cast=bool)
+KYC_IMAGE_MAX_DIMENSION = config('KYC_IMAGE_MAX_DIMENSION', default=2560, cast=int)
+KYC_IMAGE_JPEG_QUALITY = config('KYC_IMAGE_JPEG_QUALITY', default=85, cast=int)
+# 是否另外保留未處理的原始檔案（存於 kyc/<客戶ID>/originals/）
+KYC_KEEP_ORIGINAL_IMAGES = config('KYC_KEEP_ORIGINAL_IMAGES', default=False, cast=bool)
+
+# KYC 相似圖片：dHash 漢明距離門檻（0~7，越小越嚴格）
+KYC_SIMILAR_IMAGE_MAX_DISTANCE = config('KYC_SIMILAR_IMAGE_MAX_DISTANCE', default=6, cast=int)
+
+# KYC 影片轉檔：背景以 ffmpeg 轉為 H.264/AAC MP4（faststart），預覽優先播放轉檔版本
+KYC_VIDEO_TRANSCODE = config('KYC_VIDEO_TRANSCODE', default=False, cast=bool)
+FFMPEG_BINARY = config('FFMPEG_BINARY', default='ffmpeg')
+KYC_VIDEO_MAX_BITRATE_KBPS = config('KYC_VIDEO_MAX_BITRATE_KBPS', default=2000, cast=int)
+KYC_VIDEO_MAX_HEIGHT = config('KYC_VIDEO_MAX_HEIGHT', default=720, cast=int)
+KYC_VIDEO_TRANSCODE_TIMEOUT = config('KYC_VIDEO_TRANSCODE_TIMEOUT', default=1800, cast=int)
+
+# KYC 冷儲存：超過 KYC_ARCHIVE_AFTER_DAYS 天的檔案壓縮後移到冷儲存（python manage.py archive_kyc_files）
+# 後端預設為本機目錄，也可改用 S3 相容儲存，例如
+# KYC_COLD_STORAGE_BACKEND=storages.backends.s3.S3Storage
+# KYC_COLD_STORAGE_OPTIONS={"bucket_name": "nbcrm-cold", "endpoint_url": "http://minio:9000"}
+# 設定 MEDIA_ENCRYPTION_KEYS 時預設加密存放（S3 請改用 nbcrm.storage_backends.EncryptedS3Storage）
+KYC_ARCHIVE_AFTER_DAYS = config('KYC_ARCHIVE_AFTER_DAYS', default=365, cast=int)
+# 生產環境的專案目錄在重新部署時會清空，必須明確設定冷儲存位置，未設定時不封存
+KYC_COLD_STORAGE = {
+    'BACKEND': config(
+        'KYC_COLD_STORAGE_BACKEND',
+        default=(
+            'nbcrm.storage_backends.EncryptedFileSystemStorage' if MEDIA_ENCRYPTION_KEYS
+            else 'django.core.files.storage.FileSystemStorage'
+        ),
+    ),
+    'OPTIONS': config(
+        'KYC_COLD_STORAGE_OPTIONS',
+        default=json.dumps({'location': str(BASE_DIR / 'cold_media')} if DEBUG else {}),
+        cast=json.loads,
+    ),
+}
+STORAGES = {
+    'default': DEFAULT_STORAGE,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'kyc_cold': KYC_COLD_STORAGE,
+}
+# 冷儲存檔案被開啟時解壓到本機快取，超過上限時刪除最久未使用的檔案；設定 MEDIA_ENCRYPTION_KEYS 時快取檔案也加密
+KYC_REHYDRATE_CACHE_DIR = config(
+    'KYC_REHYDRATE_CACHE_DIR', default=os.path.join(tempfile.gettempdir(), 'nbcrm_media_cache')
+)
+KYC_REHYDRATE_CACHE_MAX_MB = config('KYC_REHYDRATE_CACHE_MAX_MB', default=1024, cast=int)
+
+# 交易記錄保存：超過 TRANSACTION_RETENTION_YEARS 年的交易每月匯出一個 gzip CSV 到 TRANSACTION_ARCHIVE_DIR，
+# 驗證後從資料庫刪除（python manage.py archive_transactions），Admin「交易封存」可查詢封存檔
+TRANSACTION_RETENTION_YEARS = config('TRANSACTION_RETENTION_YEARS', default=5, cast=int)
+# 生產環境的專案目錄在重新部署時會清空，必須明確設定封存目錄，未設定時不封存
+TRANSACTION_ARCHIVE_DIR = config(
+    'TRANSACTION_ARCHIVE_DIR', default=str(BASE_DIR / 'transaction_archive') if DEBUG else ''
+)
+
+# 交易記錄 Parquet 匯出（分析用，需安裝 pyarrow；python manage.py export_transactions_parquet）
+TRANSACTION_EXPORT_DIR = config(
+    'TRANSACTION_EXPORT_DIR', default=str(BASE_DIR / 'exports' / 'transactions') if DEBUG else ''
+)
+
 # 安全設定（生產環境）
 if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
@@ -147,8 +278,57 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        'nbcrm.perf': {
+            'handlers': ['console'],
+            'level': config('PERF_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
     },
 }
 
 # 媒體文件訪問日誌（用於安全審計）
+# 紀錄先放入有上限的佇列，再由背景執行緒批次寫入 MediaAccessLog
 MEDIA_ACCESS_LOG = config('MEDIA_ACCESS_LOG', default=True, cast=bool)
+MEDIA_ACCESS_LOG_QUEUE_SIZE = config('MEDIA_ACCESS_LOG_QUEUE_SIZE', default=10000, cast=int)
+MEDIA_ACCESS_LOG_BATCH_SIZE = config('MEDIA_ACCESS_LOG_BATCH_SIZE', default=200, cast=int)
+MEDIA_ACCESS_LOG_FLUSH_INTERVAL = config('MEDIA_ACCESS_LOG_FLUSH_INTERVAL', default=2.0, cast=float)
+# 前方可信任的反向代理層數（Render 為 1）：取 X-Forwarded-For 由右數第 N 個位址，0 表示不讀取 X-Forwarded-For
+TRUSTED_PROXY_COUNT = config('TRUSTED_PROXY_COUNT', default=1, cast=int)
+
+# 請求效能統計（nbcrm.middleware.QueryMetricsMiddleware）
+# 抽樣的請求記錄 SQL 查詢數、資料庫時間、重複查詢與 view 時間，寫入 nbcrm.perf 日誌
+PERF_METRICS = config('PERF_METRICS', default=False, cast=bool)
+PERF_SAMPLE_RATE = config('PERF_SAMPLE_RATE', default=0.1, cast=float)
+# 未抽樣的請求超過此毫秒數時仍會記錄（只有時間）
+PERF_SLOW_REQUEST_MS = config('PERF_SLOW_REQUEST_MS', default=1000, cast=int)
+# 同一指紋的查詢執行達此次數視為重複查詢（N+1）
+PERF_DUPLICATE_QUERY_THRESHOLD = config('PERF_DUPLICATE_QUERY_THRESHOLD', default=3, cast=int)
+# 對 staff 使用者回傳 Server-Timing 標頭
+PERF_SERVER_TIMING = config('PERF_SERVER_TIMING', default=True, cast=bool)
+
+# 慢請求剖析（nbcrm.middleware.ProfilingMiddleware），剖析檔列於 /admin/profiles/
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+# 超過此毫秒數的請求保存取樣的呼叫堆疊（0 表示只剖析帶查詢參數的請求）
+PROFILING_THRESHOLD_MS = config('PROFILING_THRESHOLD_MS', default=2000, cast=int)
+PROFILING_SAMPLE_INTERVAL_MS = config('PROFILING_SAMPLE_INTERVAL_MS', default=10, cast=int)
+# staff 在網址加上此參數時以 cProfile 剖析該請求
+PROFILING_QUERY_PARAM = config('PROFILING_QUERY_PARAM', default='_profile')
+PROFILING_DIR = config('PROFILING_DIR', default=os.path.join(tempfile.gettempdir(), 'nbcrm_profiles'))
+PROFILING_MAX_FILES = config('PROFILING_MAX_FILES', default=200, cast=int)
+
+# Prometheus 指標（需安裝 prometheus-client），於 /metrics 提供
+# 多個 gunicorn worker 時另外設定環境變數 PROMETHEUS_MULTIPROC_DIR（見 gunicorn.conf.py）
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+# Prometheus 抓取用的 Bearer token；未設定時只有已登入的 staff 可讀取
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# 以 ASGI（uvicorn）執行時，媒體文件改用非同步串流
+MEDIA_ASYNC_STREAMING = config('MEDIA_ASYNC_STREAMING', default=False, cast=bool)
+
+# 背景工作佇列（python manage.py run_worker）
+# JOBS_RUN_INLINE=True 時在請求結束後直接執行，適合沒有啟動 worker 的本機開發
+JOBS_RUN_INLINE = config('JOBS_RUN_INLINE', default=False, cast=bool)
+# 執行中的工作每隔 JOBS_HEARTBEAT_INTERVAL 秒更新 locked_at；超過 JOBS_LOCK_TIMEOUT 秒沒有更新視為 worker 已中斷，重新排隊
+# 長時間的工作（如影片轉檔）只要 worker 還活著就會持續更新，不會被重複執行
+JOBS_HEARTBEAT_INTERVAL = config('JOBS_HEARTBEAT_INTERVAL', default=60, cast=int)
+JOBS_LOCK_TIMEOUT = config('JOBS_LOCK_TIMEOUT', default=600, cast=int)
@@ -0,0 +1,115 @@
+"""
+加密的媒體儲存後端（AES-GCM 分塊，見 nbcrm.utils.encryption）
+上傳時邊讀邊加密；開啟時回傳可隨機讀取的解密串流；未加密的舊檔案直接以明文讀取
+"""
+
+import io
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from nbcrm.utils.encryption import DecryptingReader, EncryptingReader, is_encrypted
+
+try:
+    # 選用：django-storages 的 S3 後端
+    from storages.backends.s3 import S3Storage
+except ImportError:
+    S3Storage = None
+
+
+class EncryptedStorageMixin:
+    encrypted = True
+
+    def _save(self, name, content):
+        if hasattr(content, 'seek') and getattr(content, 'seekable', lambda: True)():
+            content.seek(0)
+        reader = EncryptingReader(content, settings.MEDIA_ENCRYPTION_FRAME_SIZE)
+        return super()._save(name, File(reader, name=name))
+
+    def _open_raw(self, name):
+        """開啟密文（可 seek、有 size 屬性的檔案物件）"""
+        return super()._open(name, 'rb')
+
+    def _open(self, name, mode='rb'):
+        if 'w' in mode or 'a' in mode or '+' in mode:
+            raise ValueError('加密儲存只能以唯讀方式開啟，寫入請使用 save()')
+        raw = self._open_raw(name)
+        if not is_encrypted(raw):
+            # 啟用加密前上傳的明文檔案
+            return raw if isinstance(raw, File) else File(raw, name=name)
+        return File(DecryptingReader(raw, raw.size), name=name)
+
+    def size(self, name):
+        with self._open(name) as file:
+            return file.size
+
+
+class EncryptedFileSystemStorage(EncryptedStorageMixin, FileSystemStorage):
+    pass
+
+
+class S3RangeReader(io.RawIOBase):
+    """以 Range 請求讀取 S3 物件的可 seek 檔案物件，每次最多預讀 buffer_size，不需下載整個物件"""
+
+    def __init__(self, storage, name, buffer_size=1024 * 1024):
+        self.client = storage.connection.meta.client
+        self.bucket = storage.bucket_name
+        self.key = storage._normalize_name(name)
+        from botocore.exceptions import ClientError
+        try:
+            self.size = self.client.head_object(Bucket=self.bucket, Key=self.key)['ContentLength']
+        except ClientError as e:
+            # 與本機儲存相同，檔案不存在時拋出 FileNotFoundError（呼叫端據此改讀冷儲存或標記為遺失）
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(name) from e
+            raise
+        self.buffer_size = buffer_size
+        self.position = 0
+        self._buffer_start = 0
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = base + offset
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        size = min(size, self.size - self.position)
+        if size <= 0:
+            return b''
+        end = self.position + size
+        buffer_end = self._buffer_start + len(self._buffer)
+        if not (self._buffer_start <= self.position and end <= buffer_end):
+            fetch_end = min(self.size, self.position + max(size, self.buffer_size)) - 1
+            response = self.client.get_object(
+                Bucket=self.bucket, Key=self.key, Range=f'bytes={self.position}-{fetch_end}'
+            )
+            self._buffer = response['Body'].read()
+            self._buffer_start = self.position
+        offset = self.position - self._buffer_start
+        data = self._buffer[offset:offset + size]
+        self.position += len(data)
+        return data
+
+    def readinto(self, target):
+        data = self.read(len(target))
+        target[:len(data)] = data
+        return len(data)
+
+
+if S3Storage is not None:
+    class EncryptedS3Storage(EncryptedStorageMixin, S3Storage):
+        def _open_raw(self, name):
+            return S3RangeReader(self, name)
@@ -0,0 +1,34 @@
+from unittest import mock
+
+from botocore.exceptions import ClientError
+from django.test import SimpleTestCase
+
+from nbcrm.storage_backends import EncryptedS3Storage
+from nbcrm.utils.media_utils import open_media
+
+
+class EncryptedS3StorageTests(SimpleTestCase):
+    def setUp(self):
+        self.storage = EncryptedS3Storage(bucket_name='nbcrm-test', access_key='x', secret_key='x')
+        self.client = mock.Mock()
+        connection = mock.Mock()
+        connection.meta.client = self.client
+        patcher = mock.patch.object(
+            EncryptedS3Storage, 'connection', new_callable=mock.PropertyMock, return_value=connection
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_missing_key_raises_file_not_found(self):
+        self.client.head_object.side_effect = ClientError(
+            {'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject'
+        )
+        with self.assertRaises(FileNotFoundError):
+            open_media('kyc/1/missing.jpg', storage=self.storage)
+
+    def test_other_errors_are_not_treated_as_missing(self):
+        self.client.head_object.side_effect = ClientError(
+            {'Error': {'Code': '403', 'Message': 'Forbidden'}}, 'HeadObject'
+        )
+        with self.assertRaises(ClientError):
+            self.storage.open('kyc/1/secret.jpg')
@@ -3,12 +3,30 @@ from django.urls import path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import redirect
-from django.http import Http404, HttpResponse
-from django.views.static import serve
-from django.utils.encoding import escape_uri_path
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
-import os
-import mimetypes
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from asgiref.sync import sync_to_async
+from audit.media_log import record_media_access
+from kyc.archive import rehydrate_media
+from nbcrm.metrics import metrics_enabled, record_media_bytes, render_metrics
+from nbcrm.profiling import list_profiles, profile_path
+from nbcrm.utils.media_utils import (
+    LimitedReader,
+    RangeNotSatisfiable,
+    aiter_file,
+    apply_secure_media_headers,
+    clean_media_name,
+    open_cached_media,
+    open_media,
+    presigned_media_url,
+    supports_presigned_urls,
+)
+import asyncio
+import hmac
 import logging
 
 # 設置管理後台標題
@@ -16,77 +34,215 @@ admin.site.site_header = '小商人客戶管理系統'
 admin.site.site_title = '小商人CRM'
 admin.site.index_title = '系統管理'
 
-# 媒體文件訪問日誌
+# 媒體文件錯誤與警告日誌（每次訪問的稽核紀錄寫入 MediaAccessLog）
 media_logger = logging.getLogger('nbcrm.media')
 
+def range_not_satisfiable(size):
+    response = HttpResponse(status=416)
+    response['Content-Range'] = f'bytes */{size}'
+    return response
+
+def media_body(file, size, byte_range):
+    """回傳 (回應內容, 狀態碼, 長度, Content-Range)；有區段時只回傳該區段（206）"""
+    if byte_range is None:
+        return file, 200, size, None
+    start, end = byte_range
+    length = end - start + 1
+    return LimitedReader(file, length), 206, length, f'bytes {start}-{end}/{size}'
+
+def metrics_view(request):
+    """
+    Prometheus 指標：帶 METRICS_TOKEN 的 Bearer token（抓取用）或已登入的 staff 才能讀取
+    未啟用時回傳 404
+    """
+    if not metrics_enabled():
+        raise Http404("未啟用指標")
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    token_ok = bool(settings.METRICS_TOKEN) and hmac.compare_digest(
+        authorization.encode(), f'Bearer {settings.METRICS_TOKEN}'.encode()
+    )
+    if not token_ok and not (request.user.is_authenticated and request.user.is_staff):
+        response = HttpResponse('未授權', status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    content, content_type = render_metrics()
+    response = HttpResponse(content, content_type=content_type)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+def request_profiles_view(request):
+    """慢請求剖析檔列表（僅限超級使用者）"""
+    if not request.user.is_superuser:
+        raise PermissionDenied
+    context = {
+        **admin.site.each_context(request),
+        'title': '請求剖析',
+        'profiles': list_profiles(),
+        'profiling_enabled': settings.PROFILING_ENABLED,
+        'threshold_ms': settings.PROFILING_THRESHOLD_MS,
+        'query_param': settings.PROFILING_QUERY_PARAM,
+    }
+    return TemplateResponse(request, 'admin/request_profiles.html', context)
+
+def request_profile_download_view(request, name):
+    """下載剖析檔：.prof 可用 snakeviz / pstats 開啟，.folded 可用 speedscope 開啟"""
+    if not request.user.is_superuser:
+        raise PermissionDenied
+    try:
+        file_path = profile_path(name)
+    except FileNotFoundError:
+        raise Http404("剖析檔不存在")
+    return FileResponse(open(file_path, 'rb'), as_attachment=True, filename=name)
+
 def redirect_to_admin(request):
     """根路徑重定向到 admin"""
     return redirect('/admin/')
 
 @login_required
 def serve_secure_media(request, path):
-    """安全地提供媒體文件服務（需要登入）"""
+    """安全地提供媒體文件服務（需要登入），透過 Django 儲存 API 讀取，支援本機與 S3 相容儲存"""
+    user = request.user
     try:
-        # 記錄訪問日誌
-        if settings.MEDIA_ACCESS_LOG:
-            media_logger.info(f"用戶 {request.user.username} 訪問媒體文件: {path}")
-        
-        # 建構完整文件路徑
-        document_root = settings.MEDIA_ROOT
-        full_path = os.path.join(document_root, path)
+        # 路徑安全檢查
+        try:
+            name = clean_media_name(path)
+        except PermissionError:
+            record_media_access(request, path, 'denied', user)
+            media_logger.warning("用戶 %s 嘗試訪問不安全路徑: %s", user.username, path)
+            raise Http404("路徑不安全")
         
-        # 安全檢查：確保路徑在允許範圍內
-        real_path = os.path.realpath(full_path)
-        real_document_root = os.path.realpath(document_root)
+        # 物件儲存（未加密）：通過權限檢查後轉址到短效預簽章網址，由瀏覽器直接下載
+        if settings.MEDIA_PRESIGNED_REDIRECT and supports_presigned_urls(default_storage) and default_storage.exists(name):
+            record_media_access(request, path, 'served', user)
+            return HttpResponseRedirect(presigned_media_url(name))
         
-        if not real_path.startswith(real_document_root + os.sep) and real_path != real_document_root:
-            media_logger.warning(f"用戶 {request.user.username} 嘗試訪問不安全路徑: {path}")
+        range_header = request.META.get('HTTP_RANGE')
+        source = 'storage'
+        try:
+            file, size, byte_range = open_media(name, range_header=range_header)
+        except PermissionError:
+            record_media_access(request, path, 'denied', user)
+            media_logger.warning("用戶 %s 嘗試訪問不安全路徑: %s", user.username, path)
             raise Http404("路徑不安全")
+        except RangeNotSatisfiable as e:
+            return range_not_satisfiable(e.size)
+        except FileNotFoundError:
+            # 已移到冷儲存的檔案解壓到本機快取後提供
+            cached_path = rehydrate_media(name)
+            if cached_path is None:
+                record_media_access(request, path, 'missing', user)
+                media_logger.warning("用戶 %s 訪問不存在的文件: %s", user.username, path)
+                raise Http404(f"文件不存在: {path}")
+            source = 'cold'
+            try:
+                file, size, byte_range = open_cached_media(cached_path, range_header)
+            except RangeNotSatisfiable as e:
+                return range_not_satisfiable(e.size)
         
-        # 檢查文件是否存在
-        if not os.path.exists(full_path) or not os.path.isfile(full_path):
-            media_logger.warning(f"用戶 {request.user.username} 訪問不存在的文件: {path}")
-            raise Http404(f"文件不存在: {path}")
+        # 逐塊串流，不會把整個檔案讀入記憶體；支援 Range（影片拖曳播放、續傳）
+        body, status, length, content_range = media_body(file, size, byte_range)
+        response = FileResponse(body, status=status)
+        response['Content-Length'] = str(length)
+        if content_range:
+            response['Content-Range'] = content_range
+        apply_secure_media_headers(response, name)
+        record_media_bytes(length, status, source)
         
-        # 額外權限檢查：只有登入用戶可以訪問
-        if not request.user.is_authenticated:
-            media_logger.warning(f"未登入用戶嘗試訪問媒體文件: {path}")
-            raise Http404("需要登入")
+        # 訪問紀錄由背景執行緒批次寫入 MediaAccessLog
+        record_media_access(request, path, 'served', user)
+        return response
         
-        # 使用 Django 的 serve 函數
-        response = serve(request, path, document_root=document_root)
+    except Http404:
+        raise
+    except Exception as e:
+        record_media_access(request, path, 'error', user)
+        media_logger.error("媒體文件服務錯誤 (用戶: %s): %s", user.username, e)
+        raise Http404(f"無法提供文件: {path}")
+
+async def serve_secure_media_async(request, path):
+    """
+    非同步版本的安全媒體文件服務（ASGI）
+    權限檢查和稽核紀錄完成後，以非同步迭代器串流檔案，下載期間不占用執行緒
+    """
+    # request.user 是惰性物件，讀取 session 需要在同步環境執行
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    if user is None:
+        record_media_access(request, path, 'denied', None)
+        media_logger.warning("未登入用戶嘗試訪問媒體文件: %s", path)
+        return redirect_to_login(request.get_full_path())
+    
+    try:
+        try:
+            name = clean_media_name(path)
+        except PermissionError:
+            record_media_access(request, path, 'denied', user)
+            media_logger.warning("用戶 %s 嘗試訪問不安全路徑: %s", user.username, path)
+            raise Http404("路徑不安全")
         
-        # 添加安全標頭
-        response['X-Content-Type-Options'] = 'nosniff'
-        response['X-Frame-Options'] = 'DENY'
-        response['Cache-Control'] = 'private, no-cache, no-store, must-revalidate'
-        response['Pragma'] = 'no-cache'
-        response['Expires'] = '0'
+        if (
+            settings.MEDIA_PRESIGNED_REDIRECT
+            and supports_presigned_urls(default_storage)
+            and await sync_to_async(default_storage.exists)(name)
+        ):
+            record_media_access(request, path, 'served', user)
+            return HttpResponseRedirect(await sync_to_async(presigned_media_url)(name))
         
-        # 添加正確的 Content-Type
-        content_type, encoding = mimetypes.guess_type(full_path)
-        if content_type:
-            response['Content-Type'] = content_type
+        range_header = request.META.get('HTTP_RANGE')
+        source = 'storage'
+        try:
+            file, size, byte_range = await sync_to_async(open_media)(name, range_header=range_header)
+        except PermissionError:
+            record_media_access(request, path, 'denied', user)
+            media_logger.warning("用戶 %s 嘗試訪問不安全路徑: %s", user.username, path)
+            raise Http404("路徑不安全")
+        except RangeNotSatisfiable as e:
+            return range_not_satisfiable(e.size)
+        except FileNotFoundError:
+            cached_path = await sync_to_async(rehydrate_media)(name)
+            if cached_path is None:
+                record_media_access(request, path, 'missing', user)
+                media_logger.warning("用戶 %s 訪問不存在的文件: %s", user.username, path)
+                raise Http404(f"文件不存在: {path}")
+            source = 'cold'
+            try:
+                file, size, byte_range = await asyncio.to_thread(open_cached_media, cached_path, range_header)
+            except RangeNotSatisfiable as e:
+                return range_not_satisfiable(e.size)
         
-        # 支援中文檔名
-        filename = os.path.basename(full_path)
-        response['Content-Disposition'] = f'inline; filename*=UTF-8''{escape_uri_path(filename)}'
+        body, status, length, content_range = media_body(file, size, byte_range)
+        response = StreamingHttpResponse(aiter_file(body), status=status)
+        response['Content-Length'] = str(length)
+        if content_range:
+            response['Content-Range'] = content_range
+        apply_secure_media_headers(response, name)
+        record_media_bytes(length, status, source)
         
-        media_logger.info(f"成功提供文件給用戶 {request.user.username}: {path}")
+        record_media_access(request, path, 'served', user)
         return response
         
+    except Http404:
+        raise
     except Exception as e:
-        media_logger.error(f"媒體文件服務錯誤 (用戶: {request.user.username if request.user.is_authenticated else '未登入'}): {e}")
+        record_media_access(request, path, 'error', user)
+        media_logger.error("媒體文件服務錯誤 (用戶: %s): %s", user.username, e)
         raise Http404(f"無法提供文件: {path}")
 
 urlpatterns = [
     path('', redirect_to_admin),
+    # 需在 admin.site.urls 之前，否則會被當成 app_label
+    path('admin/profiles/', admin.site.admin_view(request_profiles_view), name='request_profiles'),
+    path('admin/profiles/<str:name>', admin.site.admin_view(request_profile_download_view), name='request_profile_download'),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # 安全的媒體文件路由 - 需要登入才能訪問
 urlpatterns += [
-    re_path(r'^media/(?P<path>.*)$', serve_secure_media, name='serve_secure_media'),
+    re_path(
+        r'^media/(?P<path>.*)$',
+        serve_secure_media_async if settings.MEDIA_ASYNC_STREAMING else serve_secure_media,
+        name='serve_secure_media',
+    ),
 ]
 
 # 開發環境的靜態文件服務
@@ -0,0 +1,79 @@
+"""
+本機磁碟 LRU 快取
+以檔案修改時間記錄最近使用時間，總大小超過上限時從最久未使用的檔案開始刪除
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+
+COPY_CHUNK_SIZE = 256 * 1024
+
+
+class DiskLRUCache:
+    def __init__(self, root, max_bytes):
+        self.root = os.path.realpath(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def path_for(self, key):
+        """快取檔案路徑，key 為相對路徑（與 MEDIA_ROOT 下的路徑相同）"""
+        path = os.path.realpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise PermissionError(key)
+        return path
+
+    def get(self, key):
+        """取得快取檔案路徑並更新使用時間，沒有快取時回傳 None"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, fileobj):
+        """寫入快取（先寫暫存檔再原子替換，讀取中的請求不會讀到一半的檔案）"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                shutil.copyfileobj(fileobj, temp, COPY_CHUNK_SIZE)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """總大小超過上限時刪除最久未使用的檔案；回傳刪除的檔案數"""
+        with self._lock:
+            entries = []
+            total = 0
+            for directory, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    path = os.path.join(directory, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    # 已開啟的檔案在 POSIX 上仍可讀完，不影響下載中的請求
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            return removed
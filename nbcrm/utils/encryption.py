@@ -0,0 +1,236 @@
+"""
+媒體檔案加密格式（AES-256-GCM 分塊）
+
+檔頭: MAGIC(6) | 金鑰編號(1) | 分塊大小(4) | nonce 前綴(8)
+之後每個分塊為 AES-GCM 密文 + 16 bytes 驗證標籤；nonce = 前綴 + 分塊序號，
+AAD 包含檔頭、分塊序號與「是否為最後一塊」，分塊被調換、截斷或竄改都會解密失敗。
+分塊大小固定，因此可直接計算任一位置所在的分塊，支援隨機讀取（HTTP Range）。
+"""
+
+import base64
+import io
+import math
+import os
+import struct
+from functools import lru_cache
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+MAGIC = b'NBENC1'
+HEADER = struct.Struct('>6sBI8s')
+FRAME_AAD = struct.Struct('>I?')
+TAG_SIZE = 16
+DEFAULT_FRAME_SIZE = 64 * 1024
+
+
+class DecryptionError(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def parse_keys(spec):
+    """解析 MEDIA_ENCRYPTION_KEYS（「編號:base64 金鑰」以逗號分隔，第一把用於加密），回傳 (目前編號, {編號: 金鑰})"""
+    keys = {}
+    active = None
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        key_id, _, encoded = item.partition(':')
+        key = base64.b64decode(encoded)
+        if len(key) != 32:
+            raise ImproperlyConfigured(f'媒體加密金鑰 {key_id} 必須是 32 bytes（AES-256）')
+        keys[int(key_id)] = key
+        if active is None:
+            active = int(key_id)
+    if active is None:
+        raise ImproperlyConfigured('未設定 MEDIA_ENCRYPTION_KEYS')
+    return active, keys
+
+
+def active_key():
+    active, keys = parse_keys(settings.MEDIA_ENCRYPTION_KEYS)
+    return active, keys[active]
+
+
+def key_for(key_id):
+    _, keys = parse_keys(settings.MEDIA_ENCRYPTION_KEYS)
+    try:
+        return keys[key_id]
+    except KeyError:
+        raise DecryptionError(f'找不到媒體加密金鑰 {key_id}')
+
+
+def ciphertext_size(plaintext_size, frame_size):
+    frames = max(1, math.ceil(plaintext_size / frame_size))
+    return HEADER.size + plaintext_size + frames * TAG_SIZE
+
+
+def plaintext_size(ciphertext_size, frame_size):
+    body = ciphertext_size - HEADER.size
+    frames = max(1, math.ceil(body / (frame_size + TAG_SIZE)))
+    return body - frames * TAG_SIZE
+
+
+def _read_full(source, size):
+    """讀滿 size bytes（串流來源可能每次只回傳一部分），到結尾時回傳較短的內容"""
+    parts = []
+    remaining = size
+    while remaining > 0:
+        data = source.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b''.join(parts)
+
+
+class _FrameCipher:
+    def __init__(self, header, key):
+        _, _, self.frame_size, self.prefix = HEADER.unpack(header)
+        self.header = header
+        self.aead = AESGCM(key)
+
+    def _nonce_aad(self, index, last):
+        return self.prefix + struct.pack('>I', index), self.header + FRAME_AAD.pack(index, last)
+
+    def encrypt(self, index, data, last):
+        nonce, aad = self._nonce_aad(index, last)
+        return self.aead.encrypt(nonce, data, aad)
+
+    def decrypt(self, index, data, last):
+        nonce, aad = self._nonce_aad(index, last)
+        try:
+            return self.aead.decrypt(nonce, data, aad)
+        except Exception:
+            raise DecryptionError(f'第 {index} 個分塊驗證失敗（檔案損毀或遭竄改）')
+
+
+class EncryptingReader(io.RawIOBase):
+    """
+    讀取明文來源、逐塊輸出密文的串流，上傳時邊讀邊加密，不需要暫存整個檔案
+    """
+
+    def __init__(self, source, frame_size=None):
+        self.source = source
+        frame_size = frame_size or DEFAULT_FRAME_SIZE
+        key_id, key = active_key()
+        header = HEADER.pack(MAGIC, key_id, frame_size, os.urandom(8))
+        self.cipher = _FrameCipher(header, key)
+        self.frame_size = frame_size
+        self.index = 0
+        self.buffer = bytearray(header)
+        self.next_frame = _read_full(source, frame_size)
+        self.finished = False
+
+    def readable(self):
+        return True
+
+    def _fill(self):
+        frame = self.next_frame
+        self.next_frame = _read_full(self.source, self.frame_size) if len(frame) == self.frame_size else b''
+        last = not self.next_frame
+        self.buffer += self.cipher.encrypt(self.index, frame, last)
+        self.index += 1
+        self.finished = last
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            while not self.finished:
+                self._fill()
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            return data
+        while len(self.buffer) < size and not self.finished:
+            self._fill()
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def readinto(self, target):
+        data = self.read(len(target))
+        target[:len(data)] = data
+        return len(data)
+
+
+class DecryptingReader(io.RawIOBase):
+    """
+    可隨機讀取的解密串流：seek 到任一位置時只讀取並解密該位置所在的分塊
+    raw 為密文的可 seek 檔案物件，ciphertext_length 為密文總長度
+    """
+
+    def __init__(self, raw, ciphertext_length):
+        self.raw = raw
+        raw.seek(0)
+        header = _read_full(raw, HEADER.size)
+        magic, key_id, frame_size, _ = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise DecryptionError('不是加密的媒體檔案')
+        self.cipher = _FrameCipher(header, key_for(key_id))
+        self.frame_size = frame_size
+        self.size = plaintext_size(ciphertext_length, frame_size)
+        self.frames = max(1, math.ceil(self.size / frame_size))
+        self.position = 0
+        self._frame_index = None
+        self._frame = b''
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(whence)
+        if position < 0:
+            raise ValueError('負的檔案位置')
+        self.position = position
+        return position
+
+    def _load_frame(self, index):
+        if index != self._frame_index:
+            self.raw.seek(HEADER.size + index * (self.frame_size + TAG_SIZE))
+            data = _read_full(self.raw, self.frame_size + TAG_SIZE)
+            self._frame = self.cipher.decrypt(index, data, index == self.frames - 1)
+            self._frame_index = index
+        return self._frame
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        parts = []
+        while size > 0 and self.position < self.size:
+            index, offset = divmod(self.position, self.frame_size)
+            frame = self._load_frame(index)
+            data = frame[offset:offset + size]
+            parts.append(data)
+            self.position += len(data)
+            size -= len(data)
+        return b''.join(parts)
+
+    def readinto(self, target):
+        data = self.read(len(target))
+        target[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.raw.close()
+        super().close()
+
+
+def is_encrypted(raw):
+    """檢查檔案開頭是否為加密格式（會把位置移回開頭）"""
+    raw.seek(0)
+    magic = raw.read(len(MAGIC))
+    raw.seek(0)
+    return magic == MAGIC
@@ -4,11 +4,25 @@
 """
 
 import os
+import asyncio
 import mimetypes
+import posixpath
+import re
+import shutil
+import tempfile
+from contextlib import contextmanager
 from django.http import HttpResponse, Http404, FileResponse
 from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
 from django.utils.encoding import escape_uri_path
 
+from nbcrm.utils.encryption import DecryptingReader, is_encrypted
+
+# 非同步串流每次讀取的大小
+STREAM_CHUNK_SIZE = 256 * 1024
+# 單一區段的 Range 標頭
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
 def serve_protected_media(request, path):
     """
     安全地服務媒體文件
@@ -63,3 +77,205 @@ def get_media_url(file_field):
     except Exception:
         # 如果出錯，返回空
         return None
+
+@contextmanager
+def local_copy(file_field, suffix=''):
+    """
+    取得檔案在本機的路徑（供 ffmpeg 等外部程式使用）
+    本機儲存直接回傳原路徑，遠端儲存則下載到暫存檔，離開時刪除
+    """
+    try:
+        # 加密儲存的實際檔案是密文，需要解密到暫存檔
+        path = None if is_encrypted_storage(file_field.storage) else file_field.path
+    except NotImplementedError:
+        path = None
+    if path is not None:
+        yield path
+        return
+    
+    with tempfile.NamedTemporaryFile(suffix=suffix) as temp:
+        with file_field.open('rb') as source:
+            shutil.copyfileobj(source, temp, STREAM_CHUNK_SIZE)
+        temp.flush()
+        yield temp.name
+
+def clean_media_name(path):
+    """
+    將請求路徑轉為儲存後端的檔案名稱
+    含 .. 跳出媒體目錄或為絕對路徑時拋出 PermissionError
+    """
+    name = posixpath.normpath(path.replace('\\', '/'))
+    if name in ('.', '..') or name.startswith(('/', '../')):
+        raise PermissionError(path)
+    return name
+
+def is_object_storage(storage):
+    """S3 相容儲存（django-storages S3Storage）"""
+    return hasattr(storage, 'bucket_name') and hasattr(storage, 'connection')
+
+def is_encrypted_storage(storage):
+    """加密儲存（nbcrm.storage_backends），只能透過 storage.open() 取得明文"""
+    return getattr(storage, 'encrypted', False)
+
+def supports_presigned_urls(storage):
+    """可讓瀏覽器直接下載的儲存（S3 相容且未加密）"""
+    return is_object_storage(storage) and not is_encrypted_storage(storage)
+
+class RangeNotSatisfiable(Exception):
+    def __init__(self, size):
+        super().__init__(size)
+        self.size = size
+
+def parse_byte_range(header, size):
+    """
+    解析單一區段的 Range 標頭（bytes=start-end、bytes=start-、bytes=-suffix），回傳含頭尾的 (start, end)
+    沒有標頭、格式不支援（例如多個區段）時回傳 None；起點超出檔案大小時拋出 RangeNotSatisfiable
+    """
+    match = _RANGE_RE.match(header or '')
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            raise RangeNotSatisfiable(size)
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable(size)
+    return start, end
+
+def seek_range(file, size, range_header):
+    """依 Range 標頭將可 seek 的檔案定位到區段開頭，回傳 (start, end) 或 None"""
+    byte_range = parse_byte_range(range_header, size)
+    if byte_range:
+        file.seek(byte_range[0])
+    return byte_range
+
+class LimitedReader:
+    """只讀取前 length bytes（Range 回應用）"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+def open_media(name, storage=None, range_header=None):
+    """
+    以串流方式開啟媒體檔案，回傳 (檔案物件, 檔案大小, 區段)
+    有有效的 Range 標頭時檔案物件已定位到區段開頭，區段為含頭尾的 (start, end)，否則為 None
+    檔案不存在時拋出 FileNotFoundError，區段無法滿足時拋出 RangeNotSatisfiable
+    S3 相容儲存直接讀取 GetObject 的回應串流，不會先把整個物件下載到暫存檔
+    """
+    storage = storage or default_storage
+    if is_object_storage(storage) and not is_encrypted_storage(storage):
+        from botocore.exceptions import ClientError
+        parameters = {'Bucket': storage.bucket_name, 'Key': storage._normalize_name(name)}
+        if range_header and _RANGE_RE.match(range_header):
+            parameters['Range'] = range_header
+        try:
+            # _normalize_name 加上 location 前綴並防止跳出，與 storage.open() 使用相同的 key
+            response = storage.connection.meta.client.get_object(**parameters)
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            if code in ('NoSuchKey', '404'):
+                raise FileNotFoundError(name)
+            if code == 'InvalidRange':
+                raise RangeNotSatisfiable(int(e.response.get('Error', {}).get('ActualObjectSize', 0)))
+            raise
+        content_range = response.get('ContentRange')
+        if content_range:
+            # 例如 bytes 0-99/1000
+            span, _, total = content_range.split(' ', 1)[1].partition('/')
+            start, _, end = span.partition('-')
+            return response['Body'], int(total), (int(start), int(end))
+        return response['Body'], response['ContentLength'], None
+    
+    if isinstance(storage, FileSystemStorage):
+        # 本機儲存：解析符號連結後仍須位於媒體目錄內
+        real_path = os.path.realpath(storage.path(name))
+        if not real_path.startswith(os.path.realpath(storage.location) + os.sep):
+            raise PermissionError(name)
+        if not os.path.isfile(real_path):
+            raise FileNotFoundError(name)
+    file = storage.open(name, 'rb')
+    try:
+        size = file.size
+        byte_range = seek_range(file, size, range_header)
+    except BaseException:
+        file.close()
+        raise
+    return file, size, byte_range
+
+def open_cached_media(cached_path, range_header=None):
+    """開啟冷儲存解壓後的本機快取檔案（加密的快取邊讀邊解密），回傳值與 open_media 相同"""
+    file = open(cached_path, 'rb')
+    size = os.path.getsize(cached_path)
+    try:
+        if is_encrypted(file):
+            file = DecryptingReader(file, size)
+            size = file.size
+        return file, size, seek_range(file, size, range_header)
+    except BaseException:
+        file.close()
+        raise
+
+def presigned_media_url(name, storage=None, expire=None):
+    """短效的預簽章下載網址（僅 S3 相容儲存，其他儲存回傳 None）"""
+    storage = storage or default_storage
+    if not supports_presigned_urls(storage):
+        return None
+    content_type, _ = mimetypes.guess_type(name)
+    parameters = {
+        'ResponseContentDisposition': f"inline; filename*=UTF-8''{escape_uri_path(posixpath.basename(name))}",
+        'ResponseCacheControl': 'private, no-store',
+    }
+    if content_type:
+        parameters['ResponseContentType'] = content_type
+    return storage.url(name, parameters=parameters, expire=expire or settings.MEDIA_PRESIGNED_EXPIRE)
+
+def apply_secure_media_headers(response, name):
+    """為媒體回應加上安全標頭、Content-Type 和中文檔名"""
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['X-Frame-Options'] = 'DENY'
+    response['Cache-Control'] = 'private, no-cache, no-store, must-revalidate'
+    response['Pragma'] = 'no-cache'
+    response['Expires'] = '0'
+    response['Accept-Ranges'] = 'bytes'
+    
+    content_type, encoding = mimetypes.guess_type(name)
+    if content_type:
+        response['Content-Type'] = content_type
+    
+    filename = posixpath.basename(name)
+    response['Content-Disposition'] = f'inline; filename*=UTF-8\'\'{escape_uri_path(filename)}'
+    return response
+
+async def aiter_file(file, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    非同步逐塊讀取已開啟的檔案（本機檔案或物件儲存的回應串流）
+    讀取在執行緒池中進行，不會阻塞事件迴圈
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, file.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await loop.run_in_executor(None, file.close)
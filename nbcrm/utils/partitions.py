@@ -0,0 +1,201 @@
+"""
+Postgres 按月分區工具
+分區以 UTC 月份為界（Django 在 USE_TZ 下使用 UTC 連線時區）
+"""
+
+import datetime
+import logging
+import re
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def month_start(value):
+    """取得該日期所在月份的第一天"""
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """月份加減（month 需為每月第一天）"""
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+def is_partitioned(connection, table):
+    """資料表是否為分區表（非 Postgres 一律回傳 False）"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection, table):
+    """列出分區表目前掛載的分區名稱"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s ORDER BY child.relname",
+            [table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def partition_key(connection, table):
+    """分區表的分區欄位（pg_get_partkeydef 回傳如 RANGE (changed_at)）"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_get_partkeydef(%s::regclass)', [table])
+        return re.search(r'\((.+)\)', cursor.fetchone()[0]).group(1)
+
+
+def create_monthly_partition(connection, table, month):
+    """
+    建立單一月份分區（已存在時略過），回傳分區名稱
+    預設分區已收容該月份的資料時（漏跑建立分區的排程），Postgres 不允許直接建立分區；
+    此時在同一個交易中卸離預設分區、建立月份分區、把該月份的資料移過去，再掛回預設分區
+    """
+    name = partition_name(table, month)
+    default = f'{table}_default'
+    quote = connection.ops.quote_name
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+    partitions = list_partitions(connection, table)
+    if name in partitions:
+        return name
+    with connection.cursor() as cursor:
+        if default in partitions:
+            column = partition_key(connection, table)
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {quote(default)} WHERE {column} >= %s AND {column} < %s', [start, end]
+            )
+            stranded = cursor.fetchone()[0]
+            if stranded:
+                with transaction.atomic(using=connection.alias):
+                    cursor.execute(f'ALTER TABLE {quote(table)} DETACH PARTITION {quote(default)}')
+                    cursor.execute(
+                        f"CREATE TABLE {quote(name)} PARTITION OF {quote(table)} "
+                        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+                    )
+                    cursor.execute(
+                        f'INSERT INTO {quote(name)} SELECT * FROM {quote(default)} '
+                        f'WHERE {column} >= %s AND {column} < %s', [start, end]
+                    )
+                    cursor.execute(f'DELETE FROM {quote(default)} WHERE {column} >= %s AND {column} < %s', [start, end])
+                    cursor.execute(f'ALTER TABLE {quote(table)} ATTACH PARTITION {quote(default)} DEFAULT')
+                logger.warning('%s 的預設分區有 %d 筆 %s 的資料，已移到新建立的分區 %s', table, stranded, start[:7], name)
+                return name
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(table)} "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        )
+    return name
+
+
+def create_default_partition(connection, table):
+    """建立預設分區，收容尚未建立月份分區的資料"""
+    name = f'{table}_default'
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(table)} DEFAULT")
+    return name
+
+
+def ensure_monthly_partitions(connection, table, months_ahead=3, months_back=0, today=None):
+    """確保從 months_back 個月前到 months_ahead 個月後的分區都已建立"""
+    current = month_start(today or datetime.datetime.now(datetime.timezone.utc).date())
+    existing = set(list_partitions(connection, table))
+    created = []
+    for offset in range(-months_back, months_ahead + 1):
+        month = add_months(current, offset)
+        if partition_name(table, month) not in existing:
+            created.append(create_monthly_partition(connection, table, month))
+    return created
+
+
+def partition_month(table, name):
+    """由分區名稱取得月份（非月份分區時回傳 None）"""
+    prefix = f'{table}_p'
+    suffix = name[len(prefix):]
+    if not name.startswith(prefix) or len(suffix) != 6 or not suffix.isdigit():
+        return None
+    return datetime.date(int(suffix[:4]), int(suffix[4:]), 1)
+
+
+def detach_partition(connection, table, name):
+    """
+    卸離分區：資料保留在獨立的資料表中，不再出現在分區表（ORM）的查詢結果
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}')
+
+
+def convert_to_partitioned(connection, table, column, months_ahead=3):
+    """
+    將既有的一般資料表改為依 column 按月分區，回傳建立的分區名稱
+    保留欄位、預設值、identity、索引與外鍵名稱，主鍵改為 (id, column)；
+    需在交易中執行：以新資料表複製資料後取代原資料表，期間原資料表會被鎖定
+    """
+    quote = connection.ops.quote_name
+    staging = f'{table}_partitioned'
+    with connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN ("
+            "  SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype IN ('p', 'u'))",
+            [table, table],
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('f', 'c')",
+            [table],
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(f'SELECT MIN({quote(column)}) FROM {quote(table)}')
+        oldest = cursor.fetchone()[0]
+
+        cursor.execute(
+            f'CREATE TABLE {quote(staging)} ('
+            f'LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING STORAGE INCLUDING COMMENTS, '
+            f'PRIMARY KEY (id, {quote(column)})'
+            f') PARTITION BY RANGE ({quote(column)})'
+        )
+        cursor.execute(f'CREATE TABLE {quote(staging + "_default")} PARTITION OF {quote(staging)} DEFAULT')
+        current = month_start(datetime.datetime.now(datetime.timezone.utc).date())
+        months_back = 0
+        if oldest is not None:
+            first = month_start(oldest.astimezone(datetime.timezone.utc).date())
+            months_back = max((current.year - first.year) * 12 + current.month - first.month, 0)
+        for offset in range(-months_back, months_ahead + 1):
+            create_monthly_partition(connection, staging, add_months(current, offset))
+
+        cursor.execute(f'INSERT INTO {quote(staging)} SELECT * FROM {quote(table)}')
+        cursor.execute(f'DROP TABLE {quote(table)}')
+        cursor.execute(f'ALTER TABLE {quote(staging)} RENAME TO {quote(table)}')
+        # 分區名稱改為以原資料表名稱為前綴，之後由 ensure_monthly_partitions 管理
+        for name in list_partitions(connection, table):
+            cursor.execute(f'ALTER TABLE {quote(name)} RENAME TO {quote(table + name[len(staging):])}')
+        cursor.execute(f'ALTER INDEX {quote(staging + "_pkey")} RENAME TO {quote(table + "_pkey")}')
+        # 原資料表刪除後，索引與約束名稱才能沿用
+        for definition in index_definitions:
+            cursor.execute(definition)
+        for name, definition in constraints:
+            cursor.execute(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) "
+            f'FROM {quote(table)}',
+            [table],
+        )
+    return list_partitions(connection, table)
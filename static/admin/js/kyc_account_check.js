@@ -0,0 +1,75 @@
+// NBCRM KYC 帳戶重複即時檢查：輸入銀行代碼 + 驗證帳戶後，查詢是否已驗證於其他客戶
+document.addEventListener('DOMContentLoaded', function() {
+    const CHECK_URL = '/admin/kyc/kycrecord/check-account/';
+    const MIN_ACCOUNT_LENGTH = 6;
+
+    function currentCustomerId(prefix) {
+        // KYC 記錄頁：客戶下拉選單；客戶編輯頁：網址中的客戶 ID
+        const select = document.querySelector('select[name="' + prefix + 'customer"], select[name="customer"]');
+        if (select && select.value) {
+            return select.value;
+        }
+        const match = window.location.pathname.match(/\/customers\/customer\/(\d+)\/change\//);
+        return match ? match[1] : '';
+    }
+
+    function warningElement(accountInput) {
+        let element = accountInput.parentNode.querySelector('.kyc-account-warning');
+        if (!element) {
+            element = document.createElement('div');
+            element.className = 'kyc-account-warning';
+            element.style.color = '#dc3545';
+            element.style.fontSize = '12px';
+            accountInput.parentNode.appendChild(element);
+        }
+        return element;
+    }
+
+    function check(prefix) {
+        const accountInput = document.querySelector('input[name="' + prefix + 'verification_account"]');
+        const bankInput = document.querySelector('input[name="' + prefix + 'bank_code"]');
+        if (!accountInput) {
+            return;
+        }
+        const warning = warningElement(accountInput);
+        const account = accountInput.value.trim();
+        if (account.length < MIN_ACCOUNT_LENGTH) {
+            warning.textContent = '';
+            return;
+        }
+        const params = new URLSearchParams({
+            bank_code: bankInput ? bankInput.value.trim() : '',
+            account: account,
+            customer: currentCustomerId(prefix),
+        });
+        fetch(CHECK_URL + '?' + params.toString(), {credentials: 'same-origin'})
+            .then(function(response) { return response.ok ? response.json() : {owners: []}; })
+            .then(function(data) {
+                warning.textContent = '';
+                if (!data.owners.length) {
+                    return;
+                }
+                warning.appendChild(document.createTextNode('⚠️ 此帳戶已驗證於其他客戶：'));
+                data.owners.forEach(function(owner, index) {
+                    const link = document.createElement('a');
+                    link.href = owner.url;
+                    link.target = '_blank';
+                    link.textContent = owner.name + ' (#' + owner.id + ')';
+                    if (index > 0) {
+                        warning.appendChild(document.createTextNode('、'));
+                    }
+                    warning.appendChild(link);
+                });
+            })
+            .catch(function() { warning.textContent = ''; });
+    }
+
+    // 使用事件委派，inline 新增的列也適用
+    document.addEventListener('change', function(e) {
+        const name = e.target.name || '';
+        const match = name.match(/^(.*)(bank_code|verification_account)$/);
+        if (match) {
+            check(match[1]);
+        }
+    });
+});
@@ -1,8 +1,15 @@
+import datetime
+
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
 from django import forms
-from .models import Transaction
+from .archive import search_archives
+from .models import Transaction, TransactionArchive
 from customers.models import Customer
 from accounts.models import User
+from nbcrm.metrics import record_transaction_created
 
 class TransactionAdminForm(forms.ModelForm):
     """自定義交易表單"""
@@ -73,6 +80,8 @@ class TransactionAdmin(admin.ModelAdmin):
         if not change:  # 新增時
             obj.cs_user = request.user
         super().save_model(request, obj, form, change)
+        if not change:
+            record_transaction_created(obj)
 
     def get_cs_user_display(self, obj):
         """在列表中顯示客服名稱"""
@@ -83,4 +92,70 @@ class TransactionAdmin(admin.ModelAdmin):
         if full_name:
             return f"{full_name}({obj.cs_user.username})"
         else:
-            return obj.cs_user.username
\ No newline at end of file
+            return obj.cs_user.username
+
+
+@admin.register(TransactionArchive)
+class TransactionArchiveAdmin(admin.ModelAdmin):
+    """交易封存（唯讀，由 archive_transactions 指令建立），可查詢封存檔中的歷史交易"""
+    list_display = ('month', 'row_count', 'twd_total', 'status', 'deleted_count', 'size', 'file_name', 'created_at', 'purged_at')
+    list_filter = ('status',)
+    readonly_fields = [field.name for field in TransactionArchive._meta.fields]
+    change_list_template = 'admin/transactions/transactionarchive/change_list.html'
+    search_result_limit = 200
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+    def get_urls(self):
+        urls = [
+            path(
+                'search/',
+                self.admin_site.admin_view(self.search_view),
+                name='transactions_transactionarchive_search',
+            ),
+        ]
+        return urls + super().get_urls()
+    
+    def search_view(self, request):
+        """在封存檔中查詢交易：?q=客戶名稱／客服帳號／交易或客戶 ID&from=YYYY-MM&to=YYYY-MM"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        
+        def parse_month(value):
+            try:
+                return datetime.datetime.strptime(value, '%Y-%m').date()
+            except ValueError:
+                return None
+        
+        query = request.GET.get('q', '').strip()
+        start_month = parse_month(request.GET.get('from', ''))
+        end_month = parse_month(request.GET.get('to', ''))
+        searched = bool(query or start_month or end_month)
+        results, truncated, unavailable = [], False, []
+        if searched:
+            results, truncated, unavailable = search_archives(query, start_month, end_month, limit=self.search_result_limit)
+            transaction_types = dict(Transaction.TRANSACTION_TYPE_CHOICES)
+            for row in results:
+                row['transaction_type_display'] = transaction_types.get(row['transaction_type'], row['transaction_type'])
+                row['created_at'] = datetime.datetime.fromisoformat(row['created_at'])
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': '查詢封存交易',
+            'query': query,
+            'start_month': request.GET.get('from', ''),
+            'end_month': request.GET.get('to', ''),
+            'searched': searched,
+            'results': results,
+            'truncated': truncated,
+            'unavailable': unavailable,
+            'limit': self.search_result_limit,
+        }
+        return TemplateResponse(request, 'admin/transactions/transactionarchive/search.html', context)
@@ -0,0 +1,319 @@
+"""
+交易記錄封存
+超過保存年限的交易每月匯出一個 gzip CSV 到 TRANSACTION_ARCHIVE_DIR，
+逐筆比對封存檔與資料庫內容相符後，才以小批次刪除資料庫中的交易，避免長時間鎖定資料表
+"""
+
+import csv
+import datetime
+import gzip
+import hashlib
+import io
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+
+from nbcrm.utils.partitions import add_months, month_start
+
+from .models import Transaction, TransactionArchive
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+# 封存檔的欄位（values_list 的欄位名稱），標題列以 _ 取代 __
+ARCHIVE_FIELDS = (
+    'id', 'created_at', 'customer_id', 'customer__name', 'cs_user_id', 'cs_user__username',
+    'transaction_type', 'n8_amount', 'twd_amount', 'quick_reply', 'no_reply_reason',
+)
+ARCHIVE_HEADER = [field.replace('__', '_') for field in ARCHIVE_FIELDS]
+# 比對時只看交易本身的欄位；客戶名稱、客服帳號是匯出當時的快照，之後改名不影響刪除
+COMPARED_COLUMNS = [index for index, field in enumerate(ARCHIVE_FIELDS) if '__' not in field]
+
+
+class ArchiveVerificationError(Exception):
+    pass
+
+
+def archive_dir():
+    if not settings.TRANSACTION_ARCHIVE_DIR:
+        raise ImproperlyConfigured('未設定 TRANSACTION_ARCHIVE_DIR（交易封存目錄）')
+    return str(settings.TRANSACTION_ARCHIVE_DIR)
+
+
+def archive_path(file_name):
+    return os.path.join(archive_dir(), file_name)
+
+
+def month_range(month):
+    """月份的 [開始, 結束) 時間（UTC，與分區界線相同）"""
+    start = datetime.datetime.combine(month, datetime.time(), tzinfo=datetime.timezone.utc)
+    end = datetime.datetime.combine(add_months(month, 1), datetime.time(), tzinfo=datetime.timezone.utc)
+    return start, end
+
+
+def month_transactions(month):
+    start, end = month_range(month)
+    return Transaction.objects.filter(created_at__gte=start, created_at__lt=end)
+
+
+def months_to_archive(older_than_years):
+    """早於保存年限且有交易的月份（整個月份都在期限之前），由舊到新；沒有交易的月份不需封存"""
+    now = timezone.now()
+    try:
+        cutoff = now.replace(year=now.year - older_than_years)
+    except ValueError:
+        # 2 月 29 日
+        cutoff = now.replace(year=now.year - older_than_years, day=28)
+    last_month = add_months(month_start(cutoff.astimezone(datetime.timezone.utc).date()), -1)
+    oldest = Transaction.objects.aggregate(oldest=Min('created_at'))['oldest']
+    if oldest is None:
+        return []
+    month = month_start(oldest.astimezone(datetime.timezone.utc).date())
+    months = []
+    while month <= last_month:
+        if month_transactions(month).exists():
+            months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def _serialize(row):
+    """資料庫的一列轉為封存檔的一列（字串），匯出與驗證使用相同的格式"""
+    values = []
+    for value in row:
+        if value is None:
+            values.append('')
+        elif isinstance(value, bool):
+            values.append('1' if value else '0')
+        elif isinstance(value, datetime.datetime):
+            values.append(value.astimezone(datetime.timezone.utc).isoformat())
+        else:
+            values.append(str(value))
+    return values
+
+
+def _db_rows(month, last_id=None):
+    """依 ID 順序讀取月份的交易，iterator() 以伺服器端游標分段讀取，不把整個月份載入記憶體"""
+    queryset = month_transactions(month)
+    if last_id is not None:
+        queryset = queryset.filter(pk__lte=last_id)
+    rows = queryset.order_by('pk').values_list(*ARCHIVE_FIELDS).iterator(chunk_size=2000)
+    for row in rows:
+        yield _serialize(row)
+
+
+def read_archive(file_name):
+    """讀取封存檔，逐列回傳 dict"""
+    with gzip.open(archive_path(file_name), 'rt', encoding='utf-8', newline='') as file:
+        yield from csv.DictReader(file)
+
+
+def _file_rows(file_name):
+    with gzip.open(archive_path(file_name), 'rt', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        if next(reader, None) != ARCHIVE_HEADER:
+            raise ArchiveVerificationError(f'{file_name} 的欄位與目前的格式不同')
+        yield from reader
+
+
+def _same_transaction(file_row, db_row):
+    return all(file_row[index] == db_row[index] for index in COMPARED_COLUMNS)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_month(month):
+    """
+    將月份的交易匯出為 gzip CSV（先寫入暫存檔，完成後才改名），回傳 TransactionArchive
+    已開始刪除的月份不可重新匯出，否則已刪除的交易會從封存檔中消失
+    """
+    archive = TransactionArchive.objects.filter(month=month).first()
+    if archive is not None and archive.deleted_count:
+        raise ArchiveVerificationError(f'{month:%Y-%m} 已刪除 {archive.deleted_count} 筆，不可重新匯出')
+
+    os.makedirs(archive_dir(), exist_ok=True)
+    file_name = f'transactions_{month:%Y%m}.csv.gz'
+    temp_path = archive_path(file_name + '.tmp')
+    row_count = 0
+    with open(temp_path, 'wb') as raw:
+        # mtime=0：相同內容的封存檔位元組相同
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0) as compressed:
+            text = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+            writer = csv.writer(text)
+            writer.writerow(ARCHIVE_HEADER)
+            for row in _db_rows(month):
+                writer.writerow(row)
+                row_count += 1
+            text.flush()
+            text.detach()
+    os.replace(temp_path, archive_path(file_name))
+
+    summary = month_transactions(month).aggregate(first_id=Min('pk'), last_id=Max('pk'), twd_total=Sum('twd_amount'))
+    values = dict(
+        file_name=file_name,
+        row_count=row_count,
+        first_id=summary['first_id'],
+        last_id=summary['last_id'],
+        twd_total=summary['twd_total'] or 0,
+        size=os.path.getsize(archive_path(file_name)),
+        sha256=_file_sha256(archive_path(file_name)),
+        status='exported',
+        verified_at=None,
+    )
+    archive, _ = TransactionArchive.objects.update_or_create(month=month, defaults=values)
+    logger.info('已匯出 %s 的交易 %d 筆: %s', f'{month:%Y-%m}', row_count, file_name)
+    return archive
+
+
+def verify_archive(archive):
+    """
+    驗證封存檔：檔案雜湊不變、筆數相符，且資料庫中尚未刪除的每一筆交易都與封存檔的內容完全相同
+    兩邊都依 ID 排序，逐列比對，不需要載入整個月份；不相符時拋出 ArchiveVerificationError
+    """
+    path = archive_path(archive.file_name)
+    if not os.path.exists(path):
+        raise ArchiveVerificationError(f'封存檔不存在: {archive.file_name}')
+    if _file_sha256(path) != archive.sha256:
+        raise ArchiveVerificationError(f'封存檔內容已變更: {archive.file_name}')
+
+    file_rows = _file_rows(archive.file_name)
+    file_count = db_count = 0
+    for db_row in _db_rows(archive.month, archive.last_id):
+        for file_row in file_rows:
+            file_count += 1
+            if file_row[0] == db_row[0]:
+                break
+        else:
+            raise ArchiveVerificationError(f'交易 #{db_row[0]} 不在封存檔 {archive.file_name} 中')
+        if not _same_transaction(file_row, db_row):
+            raise ArchiveVerificationError(f'交易 #{db_row[0]} 在匯出後已被修改')
+        db_count += 1
+    file_count += sum(1 for _ in file_rows)
+
+    if file_count != archive.row_count:
+        raise ArchiveVerificationError(f'{archive.file_name} 有 {file_count} 筆，應為 {archive.row_count} 筆')
+    remaining = archive.row_count - archive.deleted_count
+    if db_count != remaining:
+        raise ArchiveVerificationError(f'資料庫中剩 {db_count} 筆，應為 {remaining} 筆')
+    if archive.status == 'exported':
+        archive.status = 'verified'
+        archive.verified_at = timezone.now()
+        archive.save(update_fields=['status', 'verified_at'])
+    return archive
+
+
+def purge_archived(archive, batch_size=1000, pause=0.0, progress=None):
+    """
+    分批刪除已驗證封存的交易，每批一個交易（刪除與進度一起提交），批次之間暫停 pause 秒
+    每批在同一個交易中鎖定並再次與封存檔比對，驗證之後才被修改的交易不會被刪除
+    中斷後重新執行會從剩下的交易繼續；回傳本次刪除的筆數
+    """
+    if archive.status not in ('verified', 'purged'):
+        raise ArchiveVerificationError(f'{archive.month:%Y-%m} 尚未驗證，不可刪除')
+    deleted = 0
+    if archive.row_count:
+        queryset = month_transactions(archive.month).filter(pk__lte=archive.last_id).order_by('pk')
+        # 兩邊都依 ID 排序，封存檔跟著每批往前讀
+        file_rows = _file_rows(archive.file_name)
+        while True:
+            with transaction.atomic():
+                rows = [
+                    _serialize(row)
+                    for row in queryset.select_for_update(of=('self',)).values_list(*ARCHIVE_FIELDS)[:batch_size]
+                ]
+                if not rows:
+                    break
+                for db_row in rows:
+                    for file_row in file_rows:
+                        if file_row[0] == db_row[0]:
+                            break
+                    else:
+                        raise ArchiveVerificationError(f'交易 #{db_row[0]} 不在封存檔 {archive.file_name} 中')
+                    if not _same_transaction(file_row, db_row):
+                        raise ArchiveVerificationError(f'交易 #{db_row[0]} 在驗證後已被修改，未刪除')
+                count, _ = Transaction.objects.filter(pk__in=[int(row[0]) for row in rows]).delete()
+                archive.deleted_count += count
+                TransactionArchive.objects.filter(pk=archive.pk).update(deleted_count=archive.deleted_count)
+            deleted += count
+            if progress:
+                progress(archive, deleted)
+            if pause:
+                time.sleep(pause)
+    archive.status = 'purged'
+    archive.purged_at = timezone.now()
+    archive.save(update_fields=['status', 'purged_at'])
+    logger.info('已刪除 %s 已封存的交易 %d 筆', f'{archive.month:%Y-%m}', deleted)
+    return deleted
+
+
+def search_archives(query='', start_month=None, end_month=None, limit=200):
+    """
+    在封存檔中查詢交易（歷史查詢）：query 為數字時比對交易 ID 或客戶 ID，否則比對客戶名稱或客服帳號
+    回傳 (結果列表, 是否因超過 limit 而截斷, 無法讀取封存檔的月份)
+    """
+    archives = TransactionArchive.objects.order_by('month')
+    if start_month:
+        archives = archives.filter(month__gte=start_month)
+    if end_month:
+        archives = archives.filter(month__lte=end_month)
+    query = query.strip()
+    lowered = query.lower()
+    results = []
+    unavailable = []
+    for archive in archives:
+        try:
+            for row in read_archive(archive.file_name):
+                if query:
+                    if query.isdigit():
+                        if query not in (row['id'], row['customer_id']):
+                            continue
+                    elif lowered not in row['customer_name'].lower() and lowered not in row['cs_user_username'].lower():
+                        continue
+                if len(results) >= limit:
+                    return results, True, unavailable
+                results.append(row)
+        except (OSError, EOFError, csv.Error) as e:
+            # 封存檔遺失或損毀時略過該月份，其他月份照常查詢
+            logger.error('無法讀取交易封存檔 %s: %s', archive.file_name, e)
+            unavailable.append(archive.month)
+    return results, False, unavailable
+
+
+def archive_partition(month):
+    """
+    Postgres 分區表：封存整個月份後直接卸離並刪除該月份的分區，不需逐批刪除
+    鎖定分區禁止寫入（仍可讀取）後匯出、驗證，再卸離分區；封存檔未通過驗證時不會卸離
+    """
+    from nbcrm.utils.partitions import detach_partition, partition_name
+
+    table = Transaction._meta.db_table
+    name = partition_name(table, month)
+    quote = connection.ops.quote_name
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {quote(name)} IN SHARE MODE')
+        archive = TransactionArchive.objects.filter(month=month).first()
+        if archive is None or not archive.deleted_count:
+            archive = export_month(month)
+        verify_archive(archive)
+        detach_partition(connection, table, name)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {quote(name)}')
+        archive.deleted_count = archive.row_count
+        archive.status = 'purged'
+        archive.purged_at = timezone.now()
+        archive.save(update_fields=['deleted_count', 'status', 'purged_at'])
+    logger.info('已封存並移除分區 %s（%d 筆）', name, archive.row_count)
+    return archive
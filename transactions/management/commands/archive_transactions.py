@@ -0,0 +1,67 @@
+"""
+封存並刪除超過保存年限的交易記錄
+用法: python manage.py archive_transactions [--older-than-years 5] [--batch-size 1000] [--pause 0.1] [--no-purge] [--dry-run]
+每個月份依序：匯出 gzip CSV → 逐筆比對驗證 → 分批刪除；中斷後重新執行會從未完成的步驟繼續
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.archive import (
+    ArchiveVerificationError,
+    export_month,
+    month_transactions,
+    months_to_archive,
+    purge_archived,
+    verify_archive,
+)
+from transactions.models import TransactionArchive
+
+
+class Command(BaseCommand):
+    help = '將超過保存年限的交易匯出為每月的 gzip CSV，驗證後分批從資料庫刪除'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-years', type=int, default=settings.TRANSACTION_RETENTION_YEARS,
+            help=f'封存超過幾年的交易（預設 {settings.TRANSACTION_RETENTION_YEARS}）',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批刪除的筆數（預設 1000）')
+        parser.add_argument('--pause', type=float, default=0.1, help='每批刪除後暫停的秒數，降低對線上查詢的影響')
+        parser.add_argument('--no-purge', action='store_true', help='只匯出與驗證，不刪除資料庫中的交易')
+        parser.add_argument('--dry-run', action='store_true', help='只列出會封存的月份與筆數')
+
+    def handle(self, *args, **options):
+        if options['older_than_years'] < 1:
+            raise CommandError('--older-than-years 至少為 1')
+        months = months_to_archive(options['older_than_years'])
+        archives = {archive.month: archive for archive in TransactionArchive.objects.filter(month__in=months)}
+        exported = purged = failed = 0
+
+        for month in months:
+            label = f'{month:%Y-%m}'
+            archive = archives.get(month)
+            if archive is not None and archive.status == 'purged':
+                continue
+            if options['dry_run']:
+                self.stdout.write(f'{label}：{month_transactions(month).count()} 筆')
+                continue
+            try:
+                if archive is None or not archive.deleted_count:
+                    archive = export_month(month)
+                    exported += 1
+                    self.stdout.write(f'{label}：已匯出 {archive.row_count} 筆到 {archive.file_name}')
+                verify_archive(archive)
+                if options['no_purge']:
+                    continue
+                count = purge_archived(archive, batch_size=options['batch_size'], pause=options['pause'])
+            except ArchiveVerificationError as e:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f'{label}：驗證失敗，未刪除: {e}'))
+                continue
+            purged += count
+            self.stdout.write(f'{label}：已驗證並刪除 {count} 筆')
+
+        if options['dry_run']:
+            return
+        self.stdout.write(self.style.SUCCESS(f'完成：匯出 {exported} 個月份，刪除 {purged} 筆交易；驗證失敗 {failed} 個月份'))
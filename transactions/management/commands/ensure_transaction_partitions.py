@@ -0,0 +1,77 @@
+"""
+交易記錄資料表的月份分區（Postgres）
+第一次以 --convert 將既有資料表改為按 created_at 月份分區，之後建議每天或每月排程執行一次：
+預先建立未來月份的分區，並以 --detach-older-than 封存過舊的月份（匯出並驗證封存檔，與 archive_transactions 相同）
+後卸離、刪除該月份的分區
+"""
+
+import datetime
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from nbcrm.utils.partitions import (
+    add_months,
+    convert_to_partitioned,
+    ensure_monthly_partitions,
+    is_partitioned,
+    list_partitions,
+    month_start,
+    partition_month,
+)
+from transactions.archive import ArchiveVerificationError, archive_dir, archive_partition
+from transactions.models import Transaction
+
+
+class Command(BaseCommand):
+    help = '建立交易記錄資料表的月份分區，並封存、移除過舊的分區'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help='將既有資料表改為分區表（複製全部資料，期間鎖定資料表）')
+        parser.add_argument('--months-ahead', type=int, default=3, help='往後建立幾個月的分區（預設 3）')
+        parser.add_argument('--detach-older-than', type=int, default=None, metavar='MONTHS',
+                            help='封存早於 N 個月前的分區（匯出到 TRANSACTION_ARCHIVE_DIR 並驗證）後卸離刪除')
+
+    def handle(self, *args, **options):
+        table = Transaction._meta.db_table
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(f'{table} 僅 Postgres 支援分區，略過'))
+            return
+
+        if not is_partitioned(connection, table):
+            if not options['convert']:
+                raise CommandError(f'{table} 不是分區表，請先以 --convert 轉換')
+            with transaction.atomic():
+                partitions = convert_to_partitioned(
+                    connection, table, 'created_at', months_ahead=options['months_ahead']
+                )
+            self.stdout.write(self.style.SUCCESS(f'已轉換為分區表，共 {len(partitions)} 個分區'))
+
+        created = ensure_monthly_partitions(connection, table, months_ahead=options['months_ahead'])
+        for name in created:
+            self.stdout.write(f'已建立分區 {name}')
+
+        detached = failed = 0
+        if options['detach_older_than'] is not None:
+            try:
+                archive_dir()
+            except ImproperlyConfigured as e:
+                raise CommandError(f'{e}；分區必須先封存才能卸離')
+            current = month_start(datetime.datetime.now(datetime.timezone.utc).date())
+            cutoff = add_months(current, -max(options['detach_older_than'], 1))
+            for name in list_partitions(connection, table):
+                month = partition_month(table, name)
+                if month is None or month >= cutoff:
+                    continue
+                try:
+                    archive = archive_partition(month)
+                except ArchiveVerificationError as e:
+                    failed += 1
+                    self.stderr.write(self.style.ERROR(f'{name} 封存驗證失敗，未卸離: {e}'))
+                    continue
+                detached += 1
+                self.stdout.write(f'已封存並移除分區 {name}（{archive.row_count} 筆，封存檔 {archive.file_name}）')
+        self.stdout.write(self.style.SUCCESS(
+            f'完成，新增 {len(created)} 個分區，封存並移除 {detached} 個分區；驗證失敗 {failed} 個'
+        ))
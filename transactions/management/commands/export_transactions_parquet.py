@@ -0,0 +1,40 @@
+"""
+增量匯出交易記錄為 Parquet（分析用，需安裝 pyarrow）
+用法: python manage.py export_transactions_parquet [--output-dir DIR] [--row-group-size 100000] [--full]
+每次只匯出上次之後新增的交易，寫成目錄中的一個新 part 檔；DuckDB 可直接查詢 'DIR/*.parquet'
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.parquet_export import export_dir, export_transactions, read_watermark
+
+
+class Command(BaseCommand):
+    help = '將新增的交易記錄增量匯出為 Parquet（decimal 金額、字典編碼名稱）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=None, help='匯出目錄（預設 TRANSACTION_EXPORT_DIR）')
+        parser.add_argument('--row-group-size', type=int, default=100000, help='每個 row group 的筆數（預設 100000）')
+        parser.add_argument('--lag-seconds', type=int, default=300,
+                            help='只匯出幾秒之前建立的交易，避免漏掉尚未提交的交易（預設 300）')
+        parser.add_argument('--compression', default='zstd', choices=['zstd', 'snappy', 'gzip', 'none'],
+                            help='壓縮方式（預設 zstd）')
+        parser.add_argument('--full', action='store_true', help='清除既有的匯出檔與 watermark，重新匯出全部交易')
+
+    def handle(self, *args, **options):
+        try:
+            directory = options['output_dir'] or export_dir()
+            file_name, rows = export_transactions(
+                directory,
+                row_group_size=options['row_group_size'],
+                lag_seconds=options['lag_seconds'],
+                full=options['full'],
+                compression=options['compression'],
+            )
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        if file_name is None:
+            self.stdout.write(f'沒有新的交易（已匯出至交易 #{read_watermark(directory)}）')
+            return
+        self.stdout.write(self.style.SUCCESS(f'已匯出 {rows} 筆交易到 {directory}/{file_name}'))
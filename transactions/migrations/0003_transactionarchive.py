@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-19 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0002_transaction_time_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='月份')),
+                ('file_name', models.CharField(max_length=255, verbose_name='封存檔')),
+                ('row_count', models.PositiveIntegerField(verbose_name='筆數')),
+                ('first_id', models.BigIntegerField(blank=True, null=True, verbose_name='起始交易 ID')),
+                ('last_id', models.BigIntegerField(blank=True, null=True, verbose_name='結束交易 ID')),
+                ('twd_total', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='台幣金額合計')),
+                ('size', models.BigIntegerField(verbose_name='檔案大小')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256')),
+                ('status', models.CharField(choices=[('exported', '已匯出'), ('verified', '已驗證'), ('purged', '已刪除')], default='exported', max_length=10, verbose_name='狀態')),
+                ('deleted_count', models.PositiveIntegerField(default=0, verbose_name='已刪除筆數')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='匯出時間')),
+                ('verified_at', models.DateTimeField(blank=True, null=True, verbose_name='驗證時間')),
+                ('purged_at', models.DateTimeField(blank=True, null=True, verbose_name='刪除完成時間')),
+            ],
+            options={
+                'verbose_name': '交易封存',
+                'verbose_name_plural': '交易封存',
+                'ordering': ['-month'],
+            },
+        ),
+    ]
@@ -23,6 +23,10 @@ class Transaction(models.Model):
         verbose_name = '交易記錄'
         verbose_name_plural = '交易記錄'
         ordering = ['-created_at']
+        indexes = [
+            # 列表依時間排序；Postgres 分區後每個月份分區各有一份
+            models.Index(fields=['created_at'], name='transaction_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.customer.name} - {self.get_transaction_type_display()} - {self.n8_amount}"
@@ -31,3 +35,37 @@ class Transaction(models.Model):
         from django.core.exceptions import ValidationError
         if not self.quick_reply and not self.no_reply_reason:
             raise ValidationError('未快速回覆時必須填寫原因')
+
+
+class TransactionArchive(models.Model):
+    """
+    已匯出的月份交易（python manage.py archive_transactions）
+    每月一個 gzip CSV，驗證內容與資料庫相符後才分批刪除資料庫中的交易
+    """
+    STATUS_CHOICES = [
+        ('exported', '已匯出'),
+        ('verified', '已驗證'),
+        ('purged', '已刪除'),
+    ]
+
+    month = models.DateField(unique=True, verbose_name='月份')
+    file_name = models.CharField(max_length=255, verbose_name='封存檔')
+    row_count = models.PositiveIntegerField(verbose_name='筆數')
+    first_id = models.BigIntegerField(null=True, blank=True, verbose_name='起始交易 ID')
+    last_id = models.BigIntegerField(null=True, blank=True, verbose_name='結束交易 ID')
+    twd_total = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name='台幣金額合計')
+    size = models.BigIntegerField(verbose_name='檔案大小')
+    sha256 = models.CharField(max_length=64, verbose_name='SHA-256')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='exported', verbose_name='狀態')
+    deleted_count = models.PositiveIntegerField(default=0, verbose_name='已刪除筆數')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='匯出時間')
+    verified_at = models.DateTimeField(null=True, blank=True, verbose_name='驗證時間')
+    purged_at = models.DateTimeField(null=True, blank=True, verbose_name='刪除完成時間')
+
+    class Meta:
+        verbose_name = '交易封存'
+        verbose_name_plural = '交易封存'
+        ordering = ['-month']
+
+    def __str__(self):
+        return f'{self.month:%Y-%m}（{self.row_count} 筆）'
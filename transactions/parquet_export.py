@@ -0,0 +1,171 @@
+"""
+交易記錄的 Parquet 匯出（分析用，pandas / DuckDB 可直接讀取目錄下所有 .parquet）
+以 iterator() 的伺服器端游標分段讀取，每段寫成一個 row group；金額為 decimal128，
+客戶名稱、客服帳號與交易類型以字典編碼儲存。匯出為增量：目錄中的 watermark 檔記錄已匯出的最大交易 ID，
+每次只把新的交易寫成一個新的 part 檔
+"""
+
+import datetime
+import json
+import os
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Max
+from django.utils import timezone
+
+from nbcrm.db_router import replica_reads
+
+from .models import Transaction
+
+try:
+    # 選用：安裝 pyarrow 後才能匯出 Parquet
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    PYARROW_AVAILABLE = False
+else:
+    PYARROW_AVAILABLE = True
+
+WATERMARK_FILE = '_watermark.json'
+# (values_list 欄位, Parquet 欄位名稱)
+EXPORT_FIELDS = (
+    ('id', 'id'),
+    ('created_at', 'created_at'),
+    ('customer_id', 'customer_id'),
+    ('customer__name', 'customer_name'),
+    ('cs_user_id', 'cs_user_id'),
+    ('cs_user__username', 'cs_user_username'),
+    ('transaction_type', 'transaction_type'),
+    ('n8_amount', 'n8_amount'),
+    ('twd_amount', 'twd_amount'),
+    ('quick_reply', 'quick_reply'),
+    ('no_reply_reason', 'no_reply_reason'),
+)
+
+
+def export_schema():
+    def decimal_type(field_name):
+        field = Transaction._meta.get_field(field_name)
+        return pa.decimal128(field.max_digits, field.decimal_places)
+
+    names = pa.dictionary(pa.int32(), pa.string())
+    types = {
+        'id': pa.int64(),
+        'created_at': pa.timestamp('us', tz='UTC'),
+        'customer_id': pa.int64(),
+        'customer_name': names,
+        'cs_user_id': pa.int64(),
+        'cs_user_username': names,
+        'transaction_type': names,
+        'n8_amount': decimal_type('n8_amount'),
+        'twd_amount': decimal_type('twd_amount'),
+        'quick_reply': pa.bool_(),
+        'no_reply_reason': pa.string(),
+    }
+    return pa.schema([(name, types[name]) for _, name in EXPORT_FIELDS])
+
+
+def export_dir():
+    if not settings.TRANSACTION_EXPORT_DIR:
+        raise ImproperlyConfigured('未設定 TRANSACTION_EXPORT_DIR（Parquet 匯出目錄）')
+    return str(settings.TRANSACTION_EXPORT_DIR)
+
+
+def read_watermark(directory):
+    """已匯出的最大交易 ID（尚未匯出過時為 0）"""
+    try:
+        with open(os.path.join(directory, WATERMARK_FILE), encoding='utf-8') as file:
+            return json.load(file)['last_id']
+    except FileNotFoundError:
+        return 0
+
+
+def write_watermark(directory, last_id, rows, file_name):
+    path = os.path.join(directory, WATERMARK_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump({
+            'last_id': last_id,
+            'rows': rows,
+            'file': file_name,
+            'exported_at': timezone.now().isoformat(),
+        }, file)
+    os.replace(path + '.tmp', path)
+
+
+def _record_batch(rows, schema):
+    columns = list(zip(*rows))
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export_transactions(directory=None, row_group_size=100000, lag_seconds=300, full=False, compression='zstd'):
+    """
+    匯出 watermark 之後的交易為一個新的 Parquet 檔，回傳 (檔名, 筆數)；沒有新交易時回傳 (None, 0)
+    只匯出 lag_seconds 秒之前建立的交易：尚未提交的交易可能已取得較小的 ID，留待下次匯出才不會漏掉
+    full=True 時清除 watermark 與既有的 part 檔，重新匯出全部交易
+    """
+    if not PYARROW_AVAILABLE:
+        raise ImproperlyConfigured('匯出 Parquet 需要安裝 pyarrow')
+    directory = directory or export_dir()
+    os.makedirs(directory, exist_ok=True)
+    if full:
+        for name in os.listdir(directory):
+            if (name.startswith('transactions_') and name.endswith('.parquet')) or name == WATERMARK_FILE:
+                os.remove(os.path.join(directory, name))
+
+    last_id = read_watermark(directory)
+    cutoff = timezone.now() - datetime.timedelta(seconds=lag_seconds)
+    # 匯出的讀取都走讀取副本；副本落後時只是延後到下次匯出，watermark 不會跳過交易
+    with replica_reads():
+        upper_id = (
+            Transaction.objects.filter(pk__gt=last_id, created_at__lt=cutoff)
+            .aggregate(upper=Max('pk'))['upper']
+        )
+    if upper_id is None:
+        return None, 0
+
+    queryset = (
+        Transaction.objects.filter(pk__gt=last_id, pk__lte=upper_id)
+        .order_by('pk')
+        .values_list(*(field for field, _ in EXPORT_FIELDS))
+    )
+    schema = export_schema()
+    prefix = f'transactions_{last_id + 1:012d}_'
+    # 上次寫完檔案、尚未更新 watermark 就中斷時，同一段會重新匯出，先移除舊檔避免重複
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith('.parquet'):
+            os.remove(os.path.join(directory, name))
+    file_name = f'{prefix}{upper_id:012d}.parquet'
+    temp_path = os.path.join(directory, file_name + '.tmp')
+    total = 0
+    rows = []
+    writer = pq.ParquetWriter(
+        temp_path, schema, compression=compression,
+        use_dictionary=['customer_name', 'cs_user_username', 'transaction_type'],
+    )
+    try:
+        with replica_reads():
+            for row in queryset.iterator(chunk_size=min(row_group_size, 10000)):
+                rows.append(row)
+                if len(rows) >= row_group_size:
+                    writer.write_batch(_record_batch(rows, schema), row_group_size=row_group_size)
+                    total += len(rows)
+                    rows = []
+        if rows:
+            writer.write_batch(_record_batch(rows, schema), row_group_size=row_group_size)
+            total += len(rows)
+    except BaseException:
+        writer.close()
+        os.remove(temp_path)
+        raise
+    writer.close()
+    os.replace(temp_path, os.path.join(directory, file_name))
+    # 檔案完成後才推進 watermark，中斷時下次會重新匯出同一段
+    write_watermark(directory, upper_id, total, file_name)
+    return file_name, total
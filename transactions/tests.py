@@ -0,0 +1,69 @@
+import datetime
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from accounts.models import User
+from customers.models import Customer
+
+from .archive import ArchiveVerificationError, export_month, purge_archived, search_archives, verify_archive
+from .models import Transaction, TransactionArchive
+
+
+class ArchiveTransactionsTests(TestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        settings_override = override_settings(TRANSACTION_ARCHIVE_DIR=self.archive_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user('agent', password='x')
+        self.customer = Customer.objects.create(name='王小明')
+
+    def create_transaction(self, year, month, day=10):
+        transaction = Transaction.objects.create(
+            customer=self.customer, cs_user=self.user, transaction_type='buy',
+            n8_amount=Decimal('1.50000000'), twd_amount=Decimal('100.00'),
+        )
+        # created_at 為 auto_now_add，建立後再改為指定時間
+        created_at = datetime.datetime(year, month, day, tzinfo=datetime.timezone.utc)
+        Transaction.objects.filter(pk=transaction.pk).update(created_at=created_at)
+        return transaction
+
+    def test_month_without_transactions_is_skipped(self):
+        self.create_transaction(2015, 3)
+        self.create_transaction(2015, 5)
+        call_command('archive_transactions', older_than_years=1, pause=0, stdout=open(os.devnull, 'w'))
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(
+            list(TransactionArchive.objects.order_by('month').values_list('month', 'status')),
+            [(datetime.date(2015, 3, 1), 'purged'), (datetime.date(2015, 5, 1), 'purged')],
+        )
+
+    def test_empty_archive_is_marked_purged(self):
+        archive = verify_archive(export_month(datetime.date(2015, 4, 1)))
+        self.assertEqual(purge_archived(archive), 0)
+        self.assertEqual(archive.status, 'purged')
+
+    def test_row_changed_after_verification_is_not_deleted(self):
+        transaction = self.create_transaction(2015, 3)
+        archive = verify_archive(export_month(datetime.date(2015, 3, 1)))
+        Transaction.objects.filter(pk=transaction.pk).update(twd_amount=Decimal('200.00'))
+        with self.assertRaises(ArchiveVerificationError):
+            purge_archived(archive)
+        self.assertTrue(Transaction.objects.filter(pk=transaction.pk).exists())
+
+    def test_search_skips_missing_archive_file(self):
+        self.create_transaction(2015, 3)
+        self.create_transaction(2015, 4)
+        export_month(datetime.date(2015, 3, 1))
+        missing = export_month(datetime.date(2015, 4, 1))
+        os.remove(os.path.join(self.archive_dir, missing.file_name))
+        results, truncated, unavailable = search_archives('王小明')
+        self.assertEqual(len(results), 1)
+        self.assertFalse(truncated)
+        self.assertEqual(unavailable, [datetime.date(2015, 4, 1)])